@@ -0,0 +1,8 @@
+import hashlib
+
+
+def make_etag(request, *parts):
+    """Строгий ETag из счетчиков ревизий; формат ответа учитывается, чтобы JSON и browsable API не совпадали."""
+    renderer = getattr(request, 'accepted_renderer', None)
+    raw = ':'.join(str(part) for part in (*parts, renderer.format if renderer else ''))
+    return hashlib.md5(raw.encode()).hexdigest()
@@ -0,0 +1,76 @@
+from django.db.models import F
+
+
+class RevisionModelMixin:
+    """Увеличивает поле revision в БД при каждом сохранении существующей записи.
+
+    Значение не берется из памяти, чтобы сохранение устаревшего экземпляра не откатило ревизию назад.
+    """
+    def save(self, *args, **kwargs):
+        if not self._state.adding:
+            self.revision = F('revision') + 1
+            if kwargs.get('update_fields') is not None:
+                kwargs['update_fields'] = {*kwargs['update_fields'], 'revision'}
+
+        super().save(*args, **kwargs)
+
+        if not isinstance(self.revision, int):
+            self.refresh_from_db(fields=['revision'])
+
+
+class DirtyFieldsModelMixin:
+    """Запоминает значения полей, загруженные из БД, и сохраняет только изменившиеся поля.
+
+    save() существующей записи без явных update_fields пишет одним UPDATE лишь измененные поля,
+    а если изменений нет — не обращается к БД вовсе.
+    """
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._remember_loaded_values()
+        return instance
+
+    def _remember_loaded_values(self, fields=None):
+        loaded = dict(self.get_loaded_values())
+        for field in self._meta.concrete_fields:
+            if fields is not None and field.name not in fields and field.attname not in fields:
+                continue
+            if field.attname not in self.__dict__:
+                continue
+            value = self.__dict__[field.attname]
+            if hasattr(value, 'resolve_expression'):
+                loaded.pop(field.attname, None)
+            else:
+                loaded[field.attname] = value
+        self.__dict__['_loaded_values'] = loaded
+
+    def get_loaded_values(self):
+        """Значения полей на момент загрузки (или последнего сохранения) по attname."""
+        return self.__dict__.get('_loaded_values', {})
+
+    def get_dirty_fields(self):
+        loaded = self.get_loaded_values()
+        dirty = [
+            field.name for field in self._meta.concrete_fields
+            if not field.primary_key and field.attname in self.__dict__
+            and (field.attname not in loaded or self.__dict__[field.attname] != loaded[field.attname])
+        ]
+        if dirty:
+            dirty += [field.name for field in self._meta.concrete_fields
+                      if getattr(field, 'auto_now', False) and field.name not in dirty]
+        return dirty
+
+    def refresh_from_db(self, using=None, fields=None):
+        super().refresh_from_db(using=using, fields=fields)
+        self._remember_loaded_values(fields)
+
+    def save(self, *args, **kwargs):
+        if (not args and not self._state.adding and kwargs.get('update_fields') is None
+                and not kwargs.get('force_insert') and '_loaded_values' in self.__dict__):
+            dirty = self.get_dirty_fields()
+            if not dirty:
+                return
+            kwargs['update_fields'] = dirty
+
+        super().save(*args, **kwargs)
+        self._remember_loaded_values(kwargs.get('update_fields'))
@@ -1,4 +1,5 @@
 import os
+import tempfile
 from datetime import timedelta
 from pathlib import Path
 
@@ -157,6 +158,9 @@ MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
 
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
+# Тесты без тега benchmark; бенчмарки: python manage.py test --tag benchmark.
+TEST_RUNNER = 'TutorToolkit.test_runner.TestRunner'
+
 REST_FRAMEWORK = {
     'DEFAULT_RENDERER_CLASSES': [
         'rest_framework.renderers.JSONRenderer',
@@ -233,6 +237,60 @@ CELERY_BROKER_URL = os.environ.get('CELERY_BROKER_URL')
 CELERY_RESULT_BACKEND = os.environ.get('CELERY_BROKER_URL')
 CELERY_IMPORTS = ['apps.notifications.tasks', 'apps.education_plan.tasks']
 CELERY_BEAT_SCHEDULER = 'django_celery_beat.schedulers:DatabaseScheduler'
+CELERY_BEAT_SCHEDULE = {
+    'truncate-board-changes': {
+        'task': 'apps.education_plan.tasks.truncate_board_changes',
+        'schedule': timedelta(days=1),
+    },
+    'sweep-due-repetitions': {
+        'task': 'apps.education_plan.tasks.sweep_due_repetitions',
+        'schedule': timedelta(minutes=1),
+    },
+    'expire-file-uploads': {
+        'task': 'apps.education_plan.tasks.expire_file_uploads',
+        'schedule': timedelta(hours=1),
+    },
+}
+
+# Сколько дней хранится журнал изменений досок для дельта-синхронизации.
+BOARD_CHANGES_RETENTION_DAYS = 30
+
+# Сколько карточек переводится в to_repeat одним UPDATE задачей sweep_due_repetitions.
+REPETITION_SWEEP_BATCH_SIZE = int(os.environ.get('REPETITION_SWEEP_BATCH_SIZE', 500))
+
+# Порядок карточек и модулей: 'index' - сдвиг индексов соседей, 'rank' - строковые ключи (одна запись на перемещение).
+# Перед включением 'rank' ключи существующих досок заполняются командой rebalance_ranks --from-index.
+BOARD_ORDERING = os.environ.get('BOARD_ORDERING', 'index')
+RANK_REBALANCE_LENGTH = int(os.environ.get('RANK_REBALANCE_LENGTH', 24))
+
+# Модули и планы с большим числом карточек копируются задачей clone_modules с отчетом о прогрессе.
+BOARD_CLONE_ASYNC_CARDS = int(os.environ.get('BOARD_CLONE_ASYNC_CARDS', 500))
+
+# Конфигурация полнотекстового поиска PostgreSQL для поисковых документов карточек.
+SEARCH_CONFIG = os.environ.get('SEARCH_CONFIG', 'russian')
+
+# Каждая N-я версия текста раздела хранится целиком, остальные - дельтой к предыдущей версии.
+SECTION_REVISION_SNAPSHOT_INTERVAL = int(os.environ.get('SECTION_REVISION_SNAPSHOT_INTERVAL', 20))
+
+
+# ----Cache----
+# Без REDIS_CACHE_URL используется locmem, с ним - redis (кэш досок общий для всех воркеров).
+REDIS_CACHE_URL = os.environ.get('REDIS_CACHE_URL')
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+    'boards': {
+        'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+        'LOCATION': REDIS_CACHE_URL,
+    } if REDIS_CACHE_URL else {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'boards',
+    },
+}
+BOARD_CACHE_ALIAS = 'boards'
+# Отрисованные разделы карточек содержат подписанные ссылки на файлы (по умолчанию живут час).
+SECTION_CACHE_TIMEOUT = int(os.environ.get('SECTION_CACHE_TIMEOUT', 60 * 30))
 
 
 # ----Yandex s3----
@@ -245,6 +303,22 @@ AWS_ACCESS_KEY_ID = os.environ.get('AWS_ACCESS_KEY_ID')
 AWS_S3_ENDPOINT_URL = 'https://storage.yandexcloud.net'
 AWS_S3_REGION_NAME = 'storage'
 
+# Прямая загрузка файлов в хранилище по подписанной ссылке: 's3' - presigned PUT в бакет,
+# 'local' - подписанная ссылка на само приложение (для разработки и тестов с FileSystemStorage).
+DIRECT_UPLOAD_BACKEND = os.environ.get('DIRECT_UPLOAD_BACKEND', 's3')
+# Сколько секунд действует ссылка на загрузку.
+DIRECT_UPLOAD_EXPIRE = int(os.environ.get('DIRECT_UPLOAD_EXPIRE', 60 * 15))
+# Загрузка по частям: размер части и временный каталог, в котором части лежат до сборки файла.
+CHUNKED_UPLOAD_CHUNK_SIZE = int(os.environ.get('CHUNKED_UPLOAD_CHUNK_SIZE', 1024 * 1024))
+CHUNKED_UPLOAD_ROOT = os.environ.get('CHUNKED_UPLOAD_ROOT', os.path.join(tempfile.gettempdir(), 'tutortoolkit_chunks'))
+# Через сколько часов без активности незавершенная загрузка удаляется задачей expire_file_uploads.
+FILE_UPLOAD_EXPIRE_HOURS = int(os.environ.get('FILE_UPLOAD_EXPIRE_HOURS', 24))
+# Превью файлов (WebP, задача generate_file_previews): наибольшая сторона миниатюры и первой страницы PDF
+# в пикселях и качество сжатия.
+FILE_THUMBNAIL_SIZE = int(os.environ.get('FILE_THUMBNAIL_SIZE', 320))
+FILE_PREVIEW_SIZE = int(os.environ.get('FILE_PREVIEW_SIZE', 1280))
+FILE_PREVIEW_QUALITY = int(os.environ.get('FILE_PREVIEW_QUALITY', 80))
+
 
 # LOGGING = {
 #     'version': 1,
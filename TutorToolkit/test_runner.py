@@ -0,0 +1,11 @@
+from django.test.runner import DiscoverRunner
+
+
+class TestRunner(DiscoverRunner):
+    """Бенчмарки (тег benchmark) долгие и зависят от машины, поэтому запускаются только явно:
+    python manage.py test --tag benchmark.
+    """
+    def __init__(self, *args, tags=None, exclude_tags=None, **kwargs):
+        if not tags or 'benchmark' not in tags:
+            exclude_tags = {*(exclude_tags or ()), 'benchmark'}
+        super().__init__(*args, tags=tags, exclude_tags=exclude_tags, **kwargs)
@@ -3,6 +3,7 @@ from django.contrib.auth.models import AbstractUser, BaseUserManager
 from django.core.exceptions import ValidationError
 from django.db import models
 from apps.education_plan.services import StudentInvitationService
+from TutorToolkit.mixins import RevisionModelMixin
 
 
 class UserManager(BaseUserManager):
@@ -74,7 +75,7 @@ class User(AbstractUser):
     objects = UserManager()
 
 
-class UserProfile(models.Model):
+class UserProfile(RevisionModelMixin, models.Model):
     ROLE_CHOICES = [
         ('tutor', 'Tutor'),
         ('student', 'Student'),
@@ -88,6 +89,7 @@ class UserProfile(models.Model):
     telegram_id = models.IntegerField(blank=True, null=True)
     device_id = models.CharField(blank=True)
     receive_email_notifications = models.BooleanField(default=True)
+    revision = models.PositiveIntegerField(default=0, editable=False)
 
     def __str__(self):
         return f'{self.last_name} {self.first_name}'
@@ -0,0 +1,23 @@
+from django.db.models import F, Q
+
+
+class ProfileRevisionService:
+    """Увеличение ревизии профилей, данные которых показываются в списках (планы, уроки, уведомления)."""
+    @staticmethod
+    def bump_profiles(profile_ids):
+        from .models import UserProfile
+        profile_ids = {profile_id for profile_id in profile_ids if profile_id is not None}
+        if profile_ids:
+            UserProfile.objects.filter(id__in=profile_ids).update(revision=F('revision') + 1)
+
+    @staticmethod
+    def bump_plan_members(plan):
+        ProfileRevisionService.bump_profiles([plan.tutor_id, plan.student_id])
+
+    @staticmethod
+    def bump_linked_profiles(profile_id):
+        """Увеличение ревизии учеников и учителей, связанных с профилем через образовательные планы."""
+        from .models import UserProfile
+        UserProfile.objects.filter(
+            Q(student_plans__tutor_id=profile_id) | Q(tutor_plans__student_id=profile_id)
+        ).update(revision=F('revision') + 1)
@@ -0,0 +1,20 @@
+from django.db.models.signals import post_save
+from django.dispatch import receiver
+from apps.account.models import User, UserProfile
+from apps.account.services import ProfileRevisionService
+
+
+@receiver(post_save, sender=UserProfile)
+def bump_linked_profiles_on_profile_change(sender, instance, created, **kwargs):
+    if not created:
+        ProfileRevisionService.bump_linked_profiles(instance.pk)
+
+
+@receiver(post_save, sender=User)
+def bump_profiles_on_user_change(sender, instance, created, **kwargs):
+    if created:
+        return
+    profile_id = UserProfile.objects.filter(user=instance).values_list('id', flat=True).first()
+    if profile_id:
+        ProfileRevisionService.bump_profiles([profile_id])
+        ProfileRevisionService.bump_linked_profiles(profile_id)
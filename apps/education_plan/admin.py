@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import EducationPlan, Module, Card, Label, File, CardContent, SectionContent
+from .models import EducationPlan, Module, Card, Label, File, CardContent, SectionContent, BoardChange
 
 admin.site.register(EducationPlan)
 admin.site.register(Card)
@@ -8,3 +8,4 @@ admin.site.register(Module)
 admin.site.register(File)
 admin.site.register(CardContent)
 admin.site.register(SectionContent)
+admin.site.register(BoardChange)
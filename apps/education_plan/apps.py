@@ -4,3 +4,6 @@ from django.apps import AppConfig
 class EducationPlanConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'apps.education_plan'
+
+    def ready(self):
+        from apps.education_plan import signals  # noqa: F401
@@ -0,0 +1,285 @@
+import json
+import math
+import os
+import random
+import tempfile
+import time
+from django.contrib.auth import get_user_model
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.test import override_settings
+from django.urls import reverse
+
+User = get_user_model()
+
+BASELINE_PATH = os.path.join(os.path.dirname(__file__), 'baseline.json')
+RESULTS_PATH = os.environ.get('BENCHMARK_RESULTS',
+                              os.path.join(tempfile.gettempdir(), 'tutortoolkit_benchmark_results.json'))
+
+# Допуски: число запросов не должно расти вовсе, время - не более чем в TIME_TOLERANCE раз
+# (и не меньше чем на TIME_FLOOR_MS, чтобы не ловить шум), размер ответа - не более чем в SIZE_TOLERANCE раз.
+# Время базовой линии зависит от машины, на которой она записана, поэтому в тестах проверяется только
+# при BENCHMARK_CHECK_TIME=1 (например, на выделенной машине CI); benchmark_report показывает его всегда.
+CHECK_TIME = os.environ.get('BENCHMARK_CHECK_TIME') == '1'
+QUERIES_TOLERANCE = int(os.environ.get('BENCHMARK_QUERIES_TOLERANCE', 0))
+TIME_TOLERANCE = float(os.environ.get('BENCHMARK_TIME_TOLERANCE', 3.0))
+TIME_FLOOR_MS = float(os.environ.get('BENCHMARK_TIME_FLOOR_MS', 50))
+SIZE_TOLERANCE = float(os.environ.get('BENCHMARK_SIZE_TOLERANCE', 1.1))
+
+
+class EndpointCase:
+    def __init__(self, name, method, url, data=None, user='tutor', format='json'):
+        self.name = name
+        self.method = method
+        self.url = url
+        self.data = data
+        self.user = user
+        self.format = format
+
+
+def get_endpoint_cases(dataset):
+    """Все маршруты API; изменяющие запросы идут после читающих, удаления - в конце."""
+    plan, module, card, label = dataset.plan, dataset.module, dataset.card, dataset.label
+    pdf = SimpleUploadedFile('benchmark.pdf', b'%PDF-1.4 benchmark', content_type='application/pdf')
+    return [
+        EndpointCase('education_plan-list', 'get', reverse('education_plan-list')),
+        EndpointCase('education_plan-list (expand)', 'get', f"{reverse('education_plan-list')}?expand={plan.id}"),
+        EndpointCase('education_plan-detail (cold)', 'get', reverse('education_plan-detail', args=[plan.id])),
+        EndpointCase('education_plan-detail (warm)', 'get', reverse('education_plan-detail', args=[plan.id])),
+        EndpointCase('education_plan-detail (student)', 'get', reverse('education_plan-detail', args=[plan.id]),
+                     user='student'),
+        EndpointCase('education_plan-changes', 'get', f"{reverse('education_plan-changes', args=[plan.id])}?since=0"),
+        EndpointCase('card-templates', 'get', reverse('card-templates')),
+        EndpointCase('search', 'get', f"{reverse('search')}?q=Template"),
+        EndpointCase('card_content-detail', 'get', reverse('card_content-detail', args=[card.id])),
+        EndpointCase('card_content-detail (student)', 'get', reverse('card_content-detail', args=[card.id]),
+                     user='student'),
+        EndpointCase('card_content-list', 'get', f"{reverse('card_content-list')}?module_id={card.module_id}"),
+        EndpointCase('card_content-list (student)', 'get',
+                     f"{reverse('card_content-list')}?module_id={card.module_id}", user='student'),
+        EndpointCase('label-list', 'get', reverse('label-list')),
+        EndpointCase('invite_info', 'get', f'/api/education_plan/invite_info/{dataset.open_plan.invite_code}/',
+                     user=None),
+        EndpointCase('get_users_data', 'get', reverse('get_users_data')),
+        EndpointCase('get_users_data (student)', 'get', reverse('get_users_data'), user='student'),
+        EndpointCase('tutor-files', 'get', reverse('tutor-files')),
+        EndpointCase('lesson-list', 'get', reverse('lesson-list')),
+        EndpointCase('lesson-list (student)', 'get', reverse('lesson-list'), user='student'),
+        EndpointCase('notifications-list', 'get', reverse('notifications-list'), user='student'),
+
+        EndpointCase('education_plan-create', 'post', reverse('education_plan-list'),
+                     {'discipline': 'Физика', 'student_first_name': 'first_name', 'student_last_name': 'last_name',
+                      'email': 'benchmark_new_student@gmail.com'}),
+        EndpointCase('education_plan-clone', 'post', reverse('education_plan-clone', args=[plan.id]),
+                     {'discipline': 'Физика', 'student_first_name': 'first_name', 'student_last_name': 'last_name',
+                      'email': 'benchmark_clone_student@gmail.com'}),
+        EndpointCase('module-clone', 'post', reverse('module-clone', args=[module.id]), {'plan_id': plan.id}),
+        EndpointCase('module-create', 'post', reverse('module-list'), {'title': 'New module', 'plan_id': plan.id}),
+        EndpointCase('module-update', 'patch', reverse('module-detail', args=[module.id]), {'title': 'Module'}),
+        EndpointCase('education_plan-schedule-repetitions', 'post',
+                     reverse('education_plan-schedule-repetitions', args=[plan.id])),
+        EndpointCase('card-create', 'post', reverse('card-list'),
+                     {'title': 'New card', 'module_id': module.id, 'labels': [label.id]}),
+        EndpointCase('card-update', 'patch', reverse('card-detail', args=[card.id]),
+                     {'title': 'Card', 'status': 'in_progress'}),
+        EndpointCase('card-create-template', 'post', reverse('card-create-template', args=[card.id])),
+        EndpointCase('card-create-card-from-template', 'post',
+                     reverse('card-create-card-from-template', args=[dataset.template.id]), {'module_id': module.id}),
+        EndpointCase('card-instantiate', 'post', reverse('card-instantiate', args=[dataset.template.id]),
+                     {'module_ids': [module.id for module in dataset.modules]}),
+        EndpointCase('card_content-update-section', 'patch',
+                     reverse('card_content-update-section', args=[card.id, 'homework']), {'text': 'Новый текст'}),
+        EndpointCase('label-create', 'post', reverse('label-list'), {'title': 'New label', 'color': '#00FF00'}),
+        EndpointCase('label-update', 'patch', reverse('label-detail', args=[label.id]), {'title': 'Label'}),
+        EndpointCase('move_element (card)', 'post', reverse('move_element'),
+                     {'element_type': 'task', 'element_id': card.id, 'destination_id': module.id,
+                      'destination_index': dataset.cards_count - 1}),
+        EndpointCase('move_element (module)', 'post', reverse('move_element'),
+                     {'element_type': 'board', 'element_id': module.id,
+                      'destination_index': dataset.modules_count - 1}),
+        EndpointCase('move_elements', 'post', reverse('move_elements'), {'moves': [
+            {'element_type': 'task', 'element_id': str(card.id), 'destination_id': str(module.id),
+             'destination_index': 0},
+            {'element_type': 'board', 'element_id': str(module.id), 'destination_index': 0},
+        ]}),
+        EndpointCase('tutor-files-upload', 'post', reverse('tutor-files'), {'file': pdf, 'name': 'benchmark.pdf'},
+                     format='multipart'),
+        EndpointCase('file-uploads', 'post', reverse('file-uploads'), {'name': 'benchmark.pdf', 'size': 1024}),
+        EndpointCase('lesson-create', 'post', reverse('lesson-list'),
+                     {'title': 'New lesson', 'plan_id': plan.id, 'date_start': '2030-01-01T10:00:00Z',
+                      'date_end': '2030-01-01T11:00:00Z'}),
+        EndpointCase('lesson-update', 'patch', reverse('lesson-detail', args=[dataset.lesson.id]),
+                     {'title': 'Lesson'}),
+        EndpointCase('invite_authorized_student', 'post', reverse('invite_authorized_student'),
+                     {'invite_code': dataset.open_plan.invite_code}, user='student'),
+        EndpointCase('set-telegram-id', 'post', reverse('set-telegram-id'),
+                     {'code': plan.invite_code, 'role': 'tutor', 'telegram_id': 123456}, user=None),
+        EndpointCase('register', 'post', reverse('register'),
+                     {'email': 'benchmark_new_tutor@gmail.com', 'password': 'Benchmark-password-1', 'role': 'tutor',
+                      'first_name': 'first_name', 'last_name': 'last_name'}, user=None),
+        EndpointCase('token_obtain_pair', 'post', reverse('token_obtain_pair'),
+                     {'email': 'benchmark_tutor@gmail.com', 'password': 'testpassword'}, user=None),
+
+        EndpointCase('lesson-delete', 'delete', reverse('lesson-detail', args=[dataset.lesson_to_cancel.id])),
+        EndpointCase('notifications-delete', 'delete', reverse('notifications-detail', args=[dataset.notification.id]),
+                     user='student'),
+        EndpointCase('tutor-file-delete', 'delete', reverse('tutor-file-delete', args=[dataset.files[-1].id])),
+        EndpointCase('label-delete', 'delete', reverse('label-detail', args=[dataset.labels[-1].id])),
+        EndpointCase('card-delete', 'delete', reverse('card-detail', args=[dataset.card_to_delete.id])),
+        EndpointCase('module-delete', 'delete', reverse('module-detail', args=[dataset.empty_module.id])),
+    ]
+
+
+def measure(client, dataset, case):
+    users = {'tutor': dataset.tutor_user, 'student': dataset.student_user}
+    # Пользователь загружается заново, как при аутентификации по токену.
+    user = User.objects.get(pk=users[case.user].pk) if case.user else None
+    client.force_authenticate(user=user)
+
+    with CaptureQueriesContext(connection) as context:
+        start = time.perf_counter()
+        response = getattr(client, case.method)(case.url, case.data, format=case.format)
+        # Потоковый ответ выполняет запросы при чтении, поэтому читается внутри замера.
+        content = b''.join(response.streaming_content) if response.streaming else response.content
+        elapsed = time.perf_counter() - start
+
+    return {
+        'status': response.status_code,
+        'queries': len(context.captured_queries),
+        'time_ms': round(elapsed * 1000, 2),
+        'size': len(content),
+    }
+
+
+def run_benchmark(client, dataset):
+    return {case.name: measure(client, dataset, case) for case in get_endpoint_cases(dataset)}
+
+
+def run_move_benchmark(module, moves, ordering):
+    """Перемещения карточек внутри модуля в заданном режиме BOARD_ORDERING: время, запросы и число
+    измененных строк карточек (по сравнению снимков модуля до и после каждого перемещения)."""
+    from apps.education_plan.models import Card
+    from apps.education_plan.services import MoveElementService
+
+    def snapshot():
+        return set(Card.objects.filter(module=module).values_list('id', 'index', 'rank'))
+
+    generator = random.Random(0)
+    card_ids = list(Card.objects.filter(module=module).values_list('id', flat=True))
+    queries = rows = 0
+    elapsed = 0.0
+    with override_settings(BOARD_ORDERING=ordering):
+        for _ in range(moves):
+            card = Card.objects.select_related('module').get(pk=generator.choice(card_ids))
+            destination_index = generator.randrange(len(card_ids))
+            before = snapshot()
+            with CaptureQueriesContext(connection) as context:
+                start = time.perf_counter()
+                MoveElementService.move_card(card, destination_index, module)
+                elapsed += time.perf_counter() - start
+            queries += len(context.captured_queries)
+            rows += len(before - snapshot())
+
+    return {
+        'moves': moves,
+        'cards': len(card_ids),
+        'queries_per_move': round(queries / moves, 2),
+        'rows_per_move': round(rows / moves, 2),
+        'time_ms_per_move': round(elapsed * 1000 / moves, 2),
+    }
+
+
+def run_schedule_benchmark(plan):
+    """Пересчет расписания повторений всех карточек плана: время, запросы и число карточек."""
+    from apps.education_plan.models import Card
+    from apps.education_plan.services import RepetitionService
+
+    with CaptureQueriesContext(connection) as context:
+        start = time.perf_counter()
+        scheduled = RepetitionService.schedule(Card.objects.filter(module__plan=plan))['scheduled']
+        elapsed = time.perf_counter() - start
+
+    return {
+        'cards': scheduled,
+        'queries': len(context.captured_queries),
+        'time_ms': round(elapsed * 1000, 2),
+    }
+
+
+def run_search_benchmark(client, queries):
+    """Поиск по каждому запросу из queries через API: 95-й перцентиль и максимум времени ответа, время первого
+    (холодного) поиска и число запросов к БД. Холодный поиск входит в перцентиль, как на рабочем сервере."""
+    times = []
+    db_queries = 0
+    for query in queries:
+        with CaptureQueriesContext(connection) as context:
+            start = time.perf_counter()
+            response = client.get(reverse('search'), {'q': query})
+            times.append((time.perf_counter() - start) * 1000)
+        assert response.status_code == 200, response.content
+        db_queries = max(db_queries, len(context.captured_queries))
+
+    cold_ms = times[0]
+    times.sort()
+    return {
+        'searches': len(times),
+        'p95_ms': round(times[math.ceil(len(times) * 0.95) - 1], 2),
+        'max_ms': round(times[-1], 2),
+        'cold_ms': round(cold_ms, 2),
+        'queries': db_queries,
+    }
+
+
+def load_json(path):
+    if not os.path.exists(path):
+        return {}
+    with open(path) as file:
+        return json.load(file)
+
+
+def save_json(path, data):
+    with open(path, 'w') as file:
+        json.dump(data, file, indent=2, ensure_ascii=False, sort_keys=True)
+        file.write('\n')
+
+
+def find_regressions(results, baseline, check_time=CHECK_TIME):
+    """Сравнение результатов с базовой линией того же масштаба; новые эндпоинты регрессией не считаются."""
+    regressions = []
+    for name, current in sorted(results.items()):
+        base = baseline.get(name)
+        if base is None:
+            continue
+        if current['status'] != base['status']:
+            regressions.append(f"{name}: статус {base['status']} -> {current['status']}")
+        if current['queries'] > base['queries'] + QUERIES_TOLERANCE:
+            regressions.append(f"{name}: запросов {base['queries']} -> {current['queries']}")
+        if check_time and current['time_ms'] > max(base['time_ms'] * TIME_TOLERANCE, base['time_ms'] + TIME_FLOOR_MS):
+            regressions.append(f"{name}: время {base['time_ms']} -> {current['time_ms']} мс")
+        if current['size'] > base['size'] * SIZE_TOLERANCE:
+            regressions.append(f"{name}: размер ответа {base['size']} -> {current['size']} байт")
+    return regressions
+
+
+def format_report(results, baseline):
+    """Таблица изменений по каждому эндпоинту относительно базовой линии."""
+    def delta(current, base):
+        if base is None:
+            return f'{current}'
+        diff = round(current - base, 2)
+        return f'{current} ({diff:+})' if diff else f'{current}'
+
+    rows = [('endpoint', 'status', 'queries', 'time_ms', 'size')]
+    for name, current in sorted(results.items()):
+        base = baseline.get(name, {})
+        rows.append((
+            name,
+            str(current['status']),
+            delta(current['queries'], base.get('queries')),
+            delta(current['time_ms'], base.get('time_ms')),
+            delta(current['size'], base.get('size')),
+        ))
+
+    widths = [max(len(row[column]) for row in rows) for column in range(len(rows[0]))]
+    return '\n'.join('  '.join(value.ljust(width) for value, width in zip(row, widths)) for row in rows)
@@ -0,0 +1,128 @@
+import os
+import uuid
+from datetime import timedelta
+from django.contrib.auth import get_user_model
+from django.utils import timezone
+from apps.account.models import UserProfile
+from apps.education_plan.models import EducationPlan, Module, Card, Label, File, CardContent, SectionContent
+from apps.education_plan.ranking import initial_ranks
+from apps.education_plan.services import SearchService
+from apps.notifications.models import Notification
+from apps.schedule.models import Lesson
+
+User = get_user_model()
+
+
+class BenchmarkDataset:
+    """Учитель с plans учениками, в каждом плане modules модулей по cards карточек с метками, файлами,
+    уроками и уведомлениями. Данные создаются через bulk_create, поэтому сигналы и save() не вызываются."""
+    LABELS_COUNT = 10
+    FILES_COUNT = 5
+    LESSONS_PER_PLAN = 5
+    NOTIFICATIONS_PER_PLAN = 5
+    TEMPLATES_COUNT = 10
+    BATCH_SIZE = 5000
+
+    def __init__(self, plans=3, modules=4, cards=10):
+        self.plans_count = plans
+        self.modules_count = modules
+        self.cards_count = cards
+
+    @classmethod
+    def from_env(cls):
+        """Размер задается переменной BENCHMARK_SCALE вида "200x20x50" (планы x модули x карточки)."""
+        scale = os.environ.get('BENCHMARK_SCALE')
+        if not scale:
+            return cls()
+        plans, modules, cards = (int(value) for value in scale.lower().split('x'))
+        return cls(plans, modules, cards)
+
+    @property
+    def scale(self):
+        return f'{self.plans_count}x{self.modules_count}x{self.cards_count}'
+
+    def seed(self):
+        now = timezone.now()
+        self.tutor_user = User.objects.create_user(email='benchmark_tutor@gmail.com', password='testpassword',
+                                                   role='tutor', first_name='first_name', last_name='last_name')
+        self.tutor = self.tutor_user.userprofile
+
+        self.labels = Label.objects.bulk_create(
+            Label(title=f'Label {i}', color='#FF0000', tutor=self.tutor) for i in range(self.LABELS_COUNT))
+        self.label = self.labels[0]
+        self.files = File.objects.bulk_create(
+            File(file=f'uploads/benchmark/file_{i}.pdf', name=f'file_{i}.pdf', extension='pdf', size=1024,
+                 tutor=self.tutor)
+            for i in range(self.FILES_COUNT))
+
+        student_users = User.objects.bulk_create(
+            User(email=f'benchmark_student_{i}@gmail.com', password='!') for i in range(self.plans_count))
+        students = UserProfile.objects.bulk_create(
+            UserProfile(user=user, role='student', first_name='first_name', last_name=f'last_name_{i}')
+            for i, user in enumerate(student_users))
+        self.student_user = student_users[0]
+
+        self.plans = EducationPlan.objects.bulk_create(
+            EducationPlan(tutor=self.tutor, student=student, invite_code=uuid.uuid4().hex[:8].upper(),
+                          discipline='Математика', student_first_name='first_name',
+                          student_last_name=student.last_name, student_email=f'benchmark_student_{i}@gmail.com',
+                          status='active', modules_count=self.modules_count)
+            for i, student in enumerate(students))
+        self.plan = self.plans[0]
+        self.open_plan = EducationPlan.objects.create(tutor=self.tutor, discipline='Физика',
+                                                      student_first_name='first_name', student_last_name='last_name')
+
+        module_ranks = initial_ranks(self.modules_count + 1)
+        card_ranks = initial_ranks(self.cards_count)
+        modules = Module.objects.bulk_create(
+            (Module(title=f'Module {i}', plan=plan, index=i, rank=module_ranks[i], cards_count=self.cards_count)
+             for plan in self.plans for i in range(self.modules_count)),
+            batch_size=self.BATCH_SIZE)
+        self.modules, self.module = modules, modules[0]
+        self.empty_module = Module.objects.create(title='Empty module', plan=self.plan, index=self.modules_count,
+                                                  rank=module_ranks[-1])
+
+        cards = Card.objects.bulk_create(
+            (Card(title=f'Card {i}', description='description', module=module, index=i, rank=card_ranks[i],
+                  plan_time=timedelta(minutes=30), date_start=now)
+             for module in modules for i in range(self.cards_count)),
+            batch_size=self.BATCH_SIZE)
+        templates = Card.objects.bulk_create(
+            Card(title=f'Template {i}', is_template=True, owner=self.tutor) for i in range(self.TEMPLATES_COUNT))
+        self.card, self.card_to_delete, self.template = cards[0], cards[-1], templates[0]
+
+        Card.labels.through.objects.bulk_create(
+            (Card.labels.through(card_id=card.id, label_id=self.labels[(i + shift) % self.LABELS_COUNT].id)
+             for i, card in enumerate(cards + templates) for shift in range(2)),
+            batch_size=self.BATCH_SIZE)
+
+        self._seed_card_contents(cards + templates)
+        SearchService.update_cards([card.pk for card in cards + templates])
+        self._seed_schedule(now)
+        return self
+
+    def _seed_card_contents(self, cards):
+        sections = SectionContent.objects.bulk_create(
+            (SectionContent(text='Текст задания') for _ in cards), batch_size=self.BATCH_SIZE)
+        SectionContent.files.through.objects.bulk_create(
+            (SectionContent.files.through(sectioncontent_id=section.id, file_id=self.files[i % self.FILES_COUNT].id)
+             for i, section in enumerate(sections)),
+            batch_size=self.BATCH_SIZE)
+        CardContent.objects.bulk_create(
+            (CardContent(card=card, homework=section) for card, section in zip(cards, sections)),
+            batch_size=self.BATCH_SIZE)
+
+    def _seed_schedule(self, now):
+        lessons = Lesson.objects.bulk_create(
+            Lesson(title=f'Lesson {i}', education_plan=plan, card=self.card, date_start=now + timedelta(days=i + 1),
+                   date_end=now + timedelta(days=i + 1, hours=1))
+            for plan in self.plans for i in range(self.LESSONS_PER_PLAN))
+        self.lesson = lessons[0]
+        self.lesson_to_cancel = lessons[1]
+
+        notifications = Notification.objects.bulk_create(
+            Notification(text=f'Notification {i}', type='homework_info', education_plan=plan,
+                         lesson=lessons[plan_index * self.LESSONS_PER_PLAN + i % self.LESSONS_PER_PLAN],
+                         recipient_id=plan.student_id)
+            for plan_index, plan in enumerate(self.plans) for i in range(self.NOTIFICATIONS_PER_PLAN))
+        self.notification = notifications[0]
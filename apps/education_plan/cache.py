@@ -0,0 +1,98 @@
+import time
+import uuid
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction
+
+
+class BoardCache:
+    """Кэш отрисованных досок по ключу (plan_id, revision) поверх бэкенда settings.BOARD_CACHE_ALIAS.
+
+    Одновременные промахи по одному плану схлопываются в одну пересборку через атомарный cache.add.
+    """
+    key_prefix = 'board'
+    timeout = 60 * 60 * 24
+    lock_timeout = 30
+    wait_timeout = 10
+    poll_interval = 0.05
+
+    def __init__(self, alias=None):
+        self.cache = caches[alias or settings.BOARD_CACHE_ALIAS]
+
+    def make_key(self, plan_id, revision):
+        return f'{self.key_prefix}:{plan_id}:{revision}'
+
+    def get(self, plan_id, revision):
+        return self.cache.get(self.make_key(plan_id, revision))
+
+    def set(self, plan_id, revision, content):
+        self.cache.set(self.make_key(plan_id, revision), content, self.timeout)
+
+    def get_or_build(self, plan_id, revision, builder):
+        """Возвращает байты доски из кэша, при промахе собирает их через builder() не более одного раза."""
+        key = self.make_key(plan_id, revision)
+        content = self.cache.get(key)
+        if content is not None:
+            return content
+
+        lock_key = f'{key}:lock'
+        token = uuid.uuid4().hex
+        if self.cache.add(lock_key, token, self.lock_timeout):
+            try:
+                content = builder()
+                self.cache.set(key, content, self.timeout)
+                return content
+            finally:
+                if self.cache.get(lock_key) == token:
+                    self.cache.delete(lock_key)
+
+        deadline = time.monotonic() + self.wait_timeout
+        while time.monotonic() < deadline:
+            time.sleep(self.poll_interval)
+            content = self.cache.get(key)
+            if content is not None:
+                return content
+            if self.cache.get(lock_key) is None:
+                break
+
+        content = self.cache.get(key)
+        if content is not None:
+            return content
+
+        # Сборщик не успел или упал: собираем сами, чтобы не оставлять запрос без ответа.
+        content = builder()
+        self.cache.set(key, content, self.timeout)
+        return content
+
+
+class SectionCache:
+    """Кэш отрисованных разделов содержимого карточек (SectionContentSerializer) по id раздела.
+
+    Запись сбрасывается сигналами при изменении текста или файлов раздела. Срок хранения меньше срока
+    действия подписанных ссылок на файлы в хранилище.
+    """
+    key_prefix = 'section'
+
+    def __init__(self, alias=None):
+        self.cache = caches[alias or settings.BOARD_CACHE_ALIAS]
+        self.timeout = settings.SECTION_CACHE_TIMEOUT
+
+    def make_key(self, section_id):
+        return f'{self.key_prefix}:{section_id}'
+
+    def get_many(self, section_ids):
+        keys = {self.make_key(section_id): section_id for section_id in section_ids}
+        return {keys[key]: payload for key, payload in self.cache.get_many(keys).items()}
+
+    def set_many(self, payloads):
+        self.cache.set_many({self.make_key(section_id): payload for section_id, payload in payloads.items()},
+                            self.timeout)
+
+    def invalidate(self, section_ids):
+        """Сбрасывает записи сразу и после коммита: иначе параллельный запрос может успеть
+        положить в кэш данные, прочитанные до коммита."""
+        keys = [self.make_key(section_id) for section_id in section_ids]
+        if not keys:
+            return
+        self.cache.delete_many(keys)
+        transaction.on_commit(lambda: self.cache.delete_many(keys))
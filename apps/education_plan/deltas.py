@@ -0,0 +1,42 @@
+from difflib import SequenceMatcher
+
+# Дольше этой длины измененная середина текста не сравнивается посимвольно (квадратичная сложность)
+# и сохраняется одной заменой.
+MAX_DIFF_LENGTH = 4000
+
+
+def make_delta(old, new):
+    """Разница между версиями текста: список замен [начало, конец, текст] в координатах old.
+
+    Общие начало и конец отбрасываются, поэтому размер дельты пропорционален изменению, а не тексту.
+    """
+    prefix = 0
+    limit = min(len(old), len(new))
+    while prefix < limit and old[prefix] == new[prefix]:
+        prefix += 1
+    suffix = 0
+    while suffix < limit - prefix and old[len(old) - suffix - 1] == new[len(new) - suffix - 1]:
+        suffix += 1
+
+    old_middle = old[prefix:len(old) - suffix]
+    new_middle = new[prefix:len(new) - suffix]
+    if not old_middle and not new_middle:
+        return []
+    if not old_middle or not new_middle or max(len(old_middle), len(new_middle)) > MAX_DIFF_LENGTH:
+        return [[prefix, prefix + len(old_middle), new_middle]]
+
+    matcher = SequenceMatcher(None, old_middle, new_middle, autojunk=False)
+    return [[prefix + i1, prefix + i2, new_middle[j1:j2]]
+            for tag, i1, i2, j1, j2 in matcher.get_opcodes() if tag != 'equal']
+
+
+def apply_delta(old, delta):
+    """Текст новой версии по старой и дельте make_delta."""
+    parts = []
+    position = 0
+    for start, end, text in delta:
+        parts.append(old[position:start])
+        parts.append(text)
+        position = end
+    parts.append(old[position:])
+    return ''.join(parts)
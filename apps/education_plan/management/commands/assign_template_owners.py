@@ -0,0 +1,23 @@
+from django.core.management.base import BaseCommand, CommandError
+from apps.account.models import UserProfile
+from apps.education_plan.services import CardService
+
+
+class Command(BaseCommand):
+    help = ('Назначает владельцев шаблонам, созданным до появления Card.owner, по преподавателю их меток '
+            'или файлов: без владельца шаблон не виден в библиотеке.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--default-owner', help='Идентификатор профиля для шаблонов без меток и файлов.')
+
+    def handle(self, *args, **options):
+        default_owner = None
+        if options['default_owner']:
+            default_owner = UserProfile.objects.filter(pk=options['default_owner'], role='tutor').first()
+            if default_owner is None:
+                raise CommandError('Преподаватель не найден.')
+        assigned, left = CardService.assign_template_owners(default_owner)
+        self.stdout.write(self.style.SUCCESS(f'Назначено владельцев: {assigned}.'))
+        if left:
+            self.stdout.write(self.style.WARNING(
+                f'Без владельца осталось шаблонов: {left}, укажите --default-owner.'))
@@ -0,0 +1,49 @@
+from django.core.management.base import BaseCommand, CommandError
+from apps.education_plan.benchmarks.runner import load_json, save_json, find_regressions, format_report, \
+    BASELINE_PATH, RESULTS_PATH
+
+
+class Command(BaseCommand):
+    help = 'Печатает изменения числа запросов, времени и размера ответа по эндпоинтам относительно базовой линии.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--results', default=RESULTS_PATH, help='Файл с результатами последнего прогона.')
+        parser.add_argument('--update-baseline', action='store_true',
+                            help='Записать результаты в базовую линию для их масштаба.')
+
+    def handle(self, *args, **options):
+        data = load_json(options['results'])
+        if 'results' not in data:
+            raise CommandError('Результатов нет, сначала запустите: python manage.py test --tag benchmark')
+
+        scale, results = data['scale'], data['results']
+        baselines = load_json(BASELINE_PATH)
+        baseline = baselines.get(scale, {})
+
+        self.stdout.write(f'Масштаб {scale} (планы x модули x карточки)')
+        self.stdout.write(format_report(results, baseline))
+
+        for regression in find_regressions(results, baseline, check_time=True):
+            self.stdout.write(self.style.ERROR(regression))
+
+        for ordering, moves in sorted(data.get('moves', {}).items()):
+            self.stdout.write(
+                f"Перемещения ({ordering}, {moves['cards']} карточек): {moves['time_ms_per_move']} мс, "
+                f"{moves['queries_per_move']} запросов, {moves['rows_per_move']} строк на перемещение")
+
+        schedule = data.get('schedule')
+        if schedule:
+            self.stdout.write(f"Расписание повторений ({schedule['cards']} карточек): {schedule['time_ms']} мс, "
+                              f"{schedule['queries']} запросов")
+
+        search = data.get('search')
+        if search:
+            self.stdout.write(f"Поиск ({search['cards']} карточек, {search['searches']} запросов): "
+                              f"p95 {search['p95_ms']} мс, максимум {search['max_ms']} мс, "
+                              f"первый (холодный) {search.get('cold_ms', '-')} мс, "
+                              f"{search['queries']} запросов к БД")
+
+        if options['update_baseline']:
+            baselines[scale] = results
+            save_json(BASELINE_PATH, baselines)
+            self.stdout.write(self.style.SUCCESS(f'Базовая линия для {scale} обновлена.'))
@@ -0,0 +1,19 @@
+from django.core.management.base import BaseCommand
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce, Greatest
+from apps.education_plan.models import EducationPlan, Module, Card, next_child_index
+
+
+def count_children(children, parent_field):
+    counts = children.filter(**{parent_field: OuterRef('pk')}).order_by().values(parent_field) \
+        .annotate(count=Count('pk')).values('count')
+    return Greatest(Coalesce(Subquery(counts), 0), next_child_index(children, parent_field))
+
+
+class Command(BaseCommand):
+    help = 'Заполняет счетчики modules_count планов и cards_count модулей по существующим записям.'
+
+    def handle(self, *args, **options):
+        plans = EducationPlan.objects.update(modules_count=count_children(Module.objects, 'plan_id'))
+        modules = Module.objects.update(cards_count=count_children(Card.objects, 'module_id'))
+        self.stdout.write(self.style.SUCCESS(f'Обновлено планов: {plans}, модулей: {modules}.'))
@@ -0,0 +1,20 @@
+from django.core.management.base import BaseCommand
+from apps.education_plan.models import EducationPlan, Module
+from apps.education_plan.services import RankService
+
+
+class Command(BaseCommand):
+    help = 'Пересчитывает ключи rank (и index) модулей и карточек всех досок.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--from-index', action='store_true',
+                            help='Брать текущий порядок из index, а не из rank (перед включением BOARD_ORDERING=rank).')
+
+    def handle(self, *args, **options):
+        order_by = 'index' if options['from_index'] else 'rank'
+        modules = cards = 0
+        for plan_id in EducationPlan.objects.values_list('id', flat=True).iterator():
+            modules += RankService.rebalance_parent('module', plan_id, order_by)
+        for module_id in Module.objects.values_list('id', flat=True).iterator():
+            cards += RankService.rebalance_parent('card', module_id, order_by)
+        self.stdout.write(self.style.SUCCESS(f'Пересчитано модулей: {modules}, карточек: {cards}.'))
@@ -0,0 +1,24 @@
+from django.core.management.base import BaseCommand
+from apps.education_plan.models import Card
+from apps.education_plan.services import RepetitionService
+
+
+class Command(BaseCommand):
+    help = 'Пересчитывает по SM-2 даты повторения карточек (всех или одного плана/модуля).'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--plan', help='Идентификатор образовательного плана.')
+        parser.add_argument('--module', help='Идентификатор модуля.')
+        parser.add_argument('--reschedule-pending', action='store_true',
+                            help='Отсчитать заново от текущего момента даты карточек, уже ожидающих повторения.')
+
+    def handle(self, *args, **options):
+        cards = Card.objects.filter(is_template=False)
+        if options['plan']:
+            cards = cards.filter(module__plan_id=options['plan'])
+        if options['module']:
+            cards = cards.filter(module_id=options['module'])
+        result = RepetitionService.schedule(cards, reschedule_pending=options['reschedule_pending'])
+        self.stdout.write(self.style.SUCCESS(
+            f"Пересчитано карточек: {result['scheduled']}, перенесено ожидающих: {result['rescheduled']}, "
+            f"оставлено ожидающих: {result['pending']}."))
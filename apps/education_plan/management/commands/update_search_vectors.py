@@ -0,0 +1,19 @@
+from django.core.management.base import BaseCommand
+from apps.education_plan.models import Card
+from apps.education_plan.services import SearchService
+
+
+class Command(BaseCommand):
+    help = 'Пересчитывает поисковые документы карточек (по умолчанию только еще не заполненные).'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--all', action='store_true', help='Пересчитать документы всех карточек.')
+        parser.add_argument('--batch-size', type=int, default=1000, help='Карточек в одном UPDATE.')
+
+    def handle(self, *args, **options):
+        cards = Card.objects.all() if options['all'] else Card.objects.filter(search_vector__isnull=True)
+        card_ids = list(cards.values_list('id', flat=True))
+        batch_size = options['batch_size']
+        for start in range(0, len(card_ids), batch_size):
+            SearchService.update_cards(card_ids[start:start + batch_size])
+        self.stdout.write(self.style.SUCCESS(f'Пересчитано карточек: {len(card_ids)}.'))
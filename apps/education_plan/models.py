@@ -1,15 +1,32 @@
 import random
 import string
 import uuid
-from django.db import models
+from django.contrib.postgres.indexes import GinIndex
+from django.contrib.postgres.search import SearchVectorField
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import models, transaction
+from django.db.models import F, Q, Max, OuterRef, Subquery
+from django.db.models.functions import Coalesce, Greatest
 from django.utils import timezone
 from django.core.validators import RegexValidator
 from apps.account.models import UserProfile
-from apps.education_plan.tasks import change_card_status_to_repeat
+from apps.education_plan.ranking import rank_ordering_enabled
 from TutorToolkit.constants import FILE_RESTRICTIONS
+from TutorToolkit.mixins import DirtyFieldsModelMixin, RevisionModelMixin
 
 
-class EducationPlan(models.Model):
+def next_child_index(children, parent_field):
+    """Позиция после последней из дочерних записей children для UPDATE родителя (0, если их нет).
+
+    Счетчик не опускается ниже нее: записи, созданные в обход счетчика (bulk_create, данные до его появления),
+    не получают повторных позиций.
+    """
+    last = children.filter(**{parent_field: OuterRef('pk')}).order_by().values(parent_field) \
+        .annotate(next=Max('index') + 1).values('next')
+    return Coalesce(Subquery(last), 0)
+
+
+class EducationPlan(DirtyFieldsModelMixin, RevisionModelMixin, models.Model):
     id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
     tutor = models.ForeignKey(UserProfile, related_name='tutor_plans', on_delete=models.CASCADE)
     student = models.ForeignKey(UserProfile, related_name='student_plans', on_delete=models.CASCADE, blank=True, null=True)
@@ -24,6 +41,10 @@ class EducationPlan(models.Model):
         ('inactive', 'Inactive'),
     )
     status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='inactive')
+    revision = models.PositiveIntegerField(default=0, editable=False)
+    # Версия порядка модулей для оптимистической блокировки (VersionService).
+    version = models.PositiveIntegerField(default=0, editable=False)
+    modules_count = models.PositiveIntegerField(default=0, editable=False)
 
     def save(self, *args, **kwargs):
         if not self.invite_code:
@@ -41,7 +62,7 @@ class EducationPlan(models.Model):
                 return code
 
 
-class Label(models.Model):
+class Label(DirtyFieldsModelMixin, models.Model):
     id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
     title = models.CharField(max_length=100)
     tutor = models.ForeignKey(UserProfile, related_name='labels', on_delete=models.CASCADE)
@@ -68,22 +89,48 @@ class Label(models.Model):
         return self.title
 
 
-class Module(models.Model):
+class Module(DirtyFieldsModelMixin, models.Model):
     id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
     title = models.CharField(max_length=100)
     plan = models.ForeignKey(EducationPlan, related_name='modules', on_delete=models.CASCADE)
-    index = models.IntegerField()
+    index = models.IntegerField(blank=True, null=True)
+    rank = models.CharField(max_length=255, blank=True, db_collation='C')
+    # Версия порядка и содержимого карточек модуля для оптимистической блокировки (VersionService).
+    version = models.PositiveIntegerField(default=0, editable=False)
+    cards_count = models.PositiveIntegerField(default=0, editable=False)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['plan', 'rank'], name='module_plan_rank'),
+        ]
 
     def save(self, *args, **kwargs):
-        if self.index is None:
-            self.index = self.plan.modules.count()
-        super().save(*args, **kwargs)
+        with transaction.atomic(savepoint=False):
+            if self._state.adding:
+                self.reserve_position()
+            super().save(*args, **kwargs)
+
+    def reserve_position(self):
+        """Увеличивает счетчик модулей плана и выдает новому модулю позицию в конце плана.
+
+        Увеличение версии в том же UPDATE блокирует строку плана до вставки модуля, поэтому последний ключ rank
+        читается уже под блокировкой и параллельные вставки не получают одинаковых ключей.
+        """
+        EducationPlan.objects.filter(pk=self.plan_id).update(
+            version=F('version') + 1,
+            modules_count=Greatest(F('modules_count'), next_child_index(Module.objects, 'plan_id')) + 1)
+        if rank_ordering_enabled():
+            if not self.rank:
+                from apps.education_plan.services import RankService
+                self.rank = RankService.get_next_rank(Module.objects.filter(plan_id=self.plan_id))
+        elif self.index is None:
+            self.index = EducationPlan.objects.filter(pk=self.plan_id).values_list('modules_count', flat=True).get() - 1
 
     def __str__(self):
         return self.title
 
 
-class Card(models.Model):
+class Card(DirtyFieldsModelMixin, models.Model):
     id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
     title = models.CharField(max_length=100)
     description = models.CharField(max_length=255, blank=True)
@@ -92,10 +139,22 @@ class Card(models.Model):
     plan_time = models.DurationField(blank=True, null=True)
     result_time = models.DurationField(blank=True, null=True)
     repetition_date = models.DateTimeField(blank=True, null=True)
+    # Карточка ждет перевода в to_repeat задачей sweep_due_repetitions.
+    repetition_pending = models.BooleanField(default=False, editable=False)
+    # Состояние SM-2 (RepetitionService.schedule): успешные повторения подряд, интервал в днях, коэффициент легкости.
+    repetition_count = models.PositiveIntegerField(default=0, editable=False)
+    repetition_interval = models.PositiveIntegerField(default=0, editable=False)
+    ease_factor = models.FloatField(default=2.5, editable=False)
     module = models.ForeignKey(Module, related_name='cards', on_delete=models.CASCADE, blank=True, null=True)
     labels = models.ManyToManyField(Label, related_name='cards', blank=True)
     index = models.IntegerField(blank=True, null=True)
+    rank = models.CharField(max_length=255, blank=True, db_collation='C')
     is_template = models.BooleanField(default=False)
+    # Владелец шаблона: у шаблонов нет модуля, по которому их можно отнести к преподавателю.
+    owner = models.ForeignKey(UserProfile, related_name='templates', on_delete=models.CASCADE, blank=True, null=True,
+                              editable=False)
+    # Поисковый документ карточки: название, описание, метки, имена файлов и текст разделов (SearchService).
+    search_vector = SearchVectorField(null=True, editable=False)
 
     STATUS_CHOICES = (
         ('not_started', 'NOT_STARTED'),
@@ -113,85 +172,94 @@ class Card(models.Model):
     )
     difficulty = models.CharField(max_length=15, choices=DIFFICULTY_CHOICES, default='not_selected')
 
-    def handle_repetition_task(self):
-        task_id = f"change_status-{self.id}"
+    class Meta:
+        indexes = [
+            models.Index(fields=['module', 'rank'], name='card_module_rank'),
+            models.Index(fields=['repetition_date'], name='card_repetition_due', condition=Q(repetition_pending=True)),
+            models.Index(fields=['owner', 'title'], name='card_template_owner', condition=Q(is_template=True)),
+            GinIndex(fields=['search_vector'], name='card_search'),
+        ]
 
-        if self.repetition_date > timezone.now():
-            change_card_status_to_repeat.apply_async((self.id,), eta=self.repetition_date, task_id=task_id)
+    def schedule_repetition(self):
+        """Ставит карточку в очередь повторения, если дата повторения еще не наступила."""
+        self.repetition_pending = self.repetition_date is not None and self.repetition_date > timezone.now()
 
     def save(self, *args, **kwargs):
-        if self.index is None and not self.is_template:
-            self.index = self.module.cards.count()
-
-        if self.pk:
-            old_repetition_date = Card.objects.filter(pk=self.pk).values_list('repetition_date', flat=True).first()
-        else:
-            old_repetition_date = None
-
-        super().save(*args, **kwargs)
-
-        if old_repetition_date != self.repetition_date:
-            self.handle_repetition_task()
-
-    def create_template(self):
-        template = Card.objects.create(
-            title=self.title,
-            description=self.description,
-            is_template=True
-        )
-        template.labels.set(self.labels.all())
-
-        card_content = self.content
-
-        CardContent.objects.create(
-            card=template,
-            homework=self._copy_section_content(card_content.homework),
-            lesson=self._copy_section_content(card_content.lesson),
-            repetition=self._copy_section_content(card_content.repetition)
-        )
-        return template
+        with transaction.atomic(savepoint=False):
+            if self._state.adding and self.module_id is not None and not self.is_template:
+                self.reserve_position()
+
+            loaded = self.get_loaded_values()
+            if self._state.adding:
+                repetition_changed = True
+            elif 'repetition_date' in loaded:
+                repetition_changed = loaded['repetition_date'] != self.repetition_date
+            else:
+                repetition_changed = Card.objects.filter(pk=self.pk).values_list(
+                    'repetition_date', flat=True).first() != self.repetition_date
+
+            if repetition_changed:
+                self.schedule_repetition()
+                if kwargs.get('update_fields') is not None:
+                    kwargs['update_fields'] = {*kwargs['update_fields'], 'repetition_pending'}
+
+            super().save(*args, **kwargs)
+
+    def reserve_position(self):
+        """Увеличивает счетчик карточек модуля и выдает новой карточке позицию в конце модуля.
+
+        Увеличение версии в том же UPDATE блокирует строку модуля до вставки карточки, поэтому последний ключ rank
+        читается уже под блокировкой и параллельные вставки не получают одинаковых ключей.
+        """
+        Module.objects.filter(pk=self.module_id).update(
+            version=F('version') + 1,
+            cards_count=Greatest(F('cards_count'), next_child_index(Card.objects, 'module_id')) + 1)
+        if rank_ordering_enabled():
+            if not self.rank:
+                from apps.education_plan.services import RankService
+                self.rank = RankService.get_next_rank(Card.objects.filter(module_id=self.module_id))
+        elif self.index is None:
+            self.index = Module.objects.filter(pk=self.module_id).values_list('cards_count', flat=True).get() - 1
+
+    def create_template(self, owner):
+        from apps.education_plan.services import CardService
+        templates, _ = CardService.clone(self, [None], owner=owner)
+        return templates[0]
 
     def create_card_from_template(self, module):
         if not self.is_template:
             raise ValueError("Only templates can be used to create new cards.")
 
-        card = Card.objects.create(
-            title=self.title,
-            description=self.description,
-            module=module
-        )
-        card.labels.set(self.labels.all())
-
-        card_content = self.content
-        new_homework = self._copy_section_content(card_content.homework)
-        new_lesson = self._copy_section_content(card_content.lesson)
-        new_repetition = self._copy_section_content(card_content.repetition)
-
-        CardContent.objects.create(
-            card=card,
-            homework=new_homework,
-            lesson=new_lesson,
-            repetition=new_repetition
-        )
-        return card
-
-    @staticmethod
-    def _copy_section_content(section_content):
-        if section_content is None:
-            return None
-        new_section_content = SectionContent.objects.create(text=section_content.text)
-        new_section_content.files.set(section_content.files.all())
-        return new_section_content
+        from apps.education_plan.services import CardService
+        cards, _ = CardService.clone(self, [module])
+        return cards[0]
 
     def __str__(self):
         return self.title
 
 
+class Blob(models.Model):
+    """Содержимое загруженных файлов, хранящееся один раз на sha256 (digest); ref_count - число File со ссылкой."""
+    digest = models.CharField(max_length=64, primary_key=True)
+    key = models.CharField(max_length=512)
+    size = models.PositiveBigIntegerField()
+    ref_count = models.PositiveIntegerField(default=0)
+    # Производные изображения (FilePreviewService): {имя: {'key', 'width', 'height', 'size'}}.
+    previews = models.JSONField(default=dict, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f"{self.digest} ({self.ref_count} refs)"
+
+
 class File(models.Model):
     FILE_TYPE_CHOICES = [(ext, data['display']) for ext, data in FILE_RESTRICTIONS.items()]
 
     id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
     file = models.FileField(upload_to='uploads/%Y/%m/%d/')
+    # Общее содержимое: file указывает на Blob.key, объект удаляется вместе с последней ссылкой (BlobService).
+    blob = models.ForeignKey(Blob, related_name='files', on_delete=models.PROTECT, blank=True, null=True,
+                             editable=False)
     upload_date = models.DateTimeField(auto_now_add=True)
     name = models.CharField(max_length=255, editable=False)
     extension = models.CharField(max_length=10, choices=FILE_TYPE_CHOICES, editable=False)
@@ -202,7 +270,50 @@ class File(models.Model):
         return f"{self.file.name} ({self.extension}, {self.size} bytes)"
 
 
-class SectionContent(models.Model):
+class FileUpload(models.Model):
+    """Незавершенная загрузка: прямая по ссылке в хранилище или по частям (chunk_size задан).
+
+    File создается после подтверждения загрузки; брошенные загрузки удаляет задача expire_file_uploads.
+    """
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    key = models.CharField(max_length=512)
+    name = models.CharField(max_length=255)
+    extension = models.CharField(max_length=10, choices=File.FILE_TYPE_CHOICES)
+    size = models.PositiveBigIntegerField()
+    chunk_size = models.PositiveIntegerField(null=True, blank=True)
+    tutor = models.ForeignKey(UserProfile, related_name='file_uploads', on_delete=models.CASCADE)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    @property
+    def chunk_count(self):
+        return -(-self.size // self.chunk_size) if self.chunk_size else None
+
+    def get_chunk_length(self, number):
+        """Размер части number: все части, кроме последней, занимают chunk_size байт."""
+        return min(self.chunk_size, self.size - number * self.chunk_size)
+
+    def __str__(self):
+        return f"{self.key} ({self.size} bytes)"
+
+
+class UploadChunk(models.Model):
+    """Принятая часть загрузки FileUpload; сама часть лежит во временном хранилище (uploads.get_chunk_storage)."""
+    upload = models.ForeignKey(FileUpload, related_name='chunks', on_delete=models.CASCADE)
+    number = models.PositiveIntegerField()
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        ordering = ('upload', 'number')
+        constraints = [
+            models.UniqueConstraint(fields=['upload', 'number'], name='upload_chunk_number'),
+        ]
+
+    def __str__(self):
+        return f"{self.upload_id} #{self.number}"
+
+
+class SectionContent(DirtyFieldsModelMixin, models.Model):
     id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
     text = models.TextField(blank=True)
     files = models.ManyToManyField(File, related_name='section_contents', blank=True)
@@ -211,11 +322,70 @@ class SectionContent(models.Model):
         return f"{self.id}"
 
 
-class CardContent(models.Model):
+class SectionRevision(models.Model):
+    """Версия текста раздела: полный текст (snapshot) каждые SECTION_REVISION_SNAPSHOT_INTERVAL версий,
+    между ними - дельта относительно предыдущей версии (deltas.make_delta)."""
+    section = models.ForeignKey(SectionContent, related_name='revisions', on_delete=models.CASCADE)
+    number = models.PositiveIntegerField()
+    snapshot = models.TextField(null=True, blank=True)
+    delta = models.JSONField(null=True, blank=True)
+    length = models.PositiveIntegerField(default=0)
+    author = models.ForeignKey(UserProfile, related_name='section_revisions', on_delete=models.SET_NULL, null=True,
+                               blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        ordering = ('section', 'number')
+        constraints = [
+            models.UniqueConstraint(fields=['section', 'number'], name='section_revision_number'),
+        ]
+
+    def __str__(self):
+        return f"{self.section_id} v{self.number}"
+
+
+class CardContent(DirtyFieldsModelMixin, models.Model):
+    # Разделы могут быть общими у шаблона и созданных из него карточек до первого изменения
+    # (CardService.get_own_section копирует общий раздел перед записью).
     card = models.OneToOneField(Card, primary_key=True, related_name='content', on_delete=models.CASCADE)
-    homework = models.OneToOneField(SectionContent, related_name='homework', on_delete=models.SET_NULL, null=True,
-                                    blank=True)
-    lesson = models.OneToOneField(SectionContent, related_name='lesson', on_delete=models.SET_NULL, null=True,
-                                  blank=True)
-    repetition = models.OneToOneField(SectionContent, related_name='repetition', on_delete=models.SET_NULL, null=True,
-                                      blank=True)
+    homework = models.ForeignKey(SectionContent, related_name='homework', on_delete=models.SET_NULL, null=True,
+                                 blank=True)
+    lesson = models.ForeignKey(SectionContent, related_name='lesson', on_delete=models.SET_NULL, null=True,
+                               blank=True)
+    repetition = models.ForeignKey(SectionContent, related_name='repetition', on_delete=models.SET_NULL, null=True,
+                                   blank=True)
+
+
+class BoardChange(models.Model):
+    """Запись журнала изменений доски, по которому клиент догоняет состояние плана с ревизии N."""
+    OP_CHOICES = (
+        ('create', 'CREATE'),
+        ('update', 'UPDATE'),
+        ('move', 'MOVE'),
+        ('delete', 'DELETE'),
+        ('label_attach', 'LABEL_ATTACH'),
+        ('label_detach', 'LABEL_DETACH'),
+        ('truncate', 'TRUNCATE'),
+    )
+    OBJECT_TYPE_CHOICES = (
+        ('module', 'MODULE'),
+        ('card', 'CARD'),
+        ('label', 'LABEL'),
+    )
+
+    plan = models.ForeignKey(EducationPlan, related_name='changes', on_delete=models.CASCADE)
+    revision = models.PositiveIntegerField()
+    op = models.CharField(max_length=15, choices=OP_CHOICES)
+    object_type = models.CharField(max_length=10, choices=OBJECT_TYPE_CHOICES, blank=True)
+    object_id = models.UUIDField(blank=True, null=True)
+    data = models.JSONField(default=dict, blank=True, encoder=DjangoJSONEncoder)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        ordering = ('revision', 'id')
+        indexes = [
+            models.Index(fields=['plan', 'revision'], name='board_change_plan_revision'),
+        ]
+
+    def __str__(self):
+        return f"{self.plan_id} #{self.revision} {self.op} {self.object_type}"
@@ -0,0 +1,61 @@
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import CursorPagination, PageNumberPagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+
+class EducationPlanCursorPagination(CursorPagination):
+    page_size = 20
+    page_size_query_param = 'page_size'
+    max_page_size = 100
+    ordering = ('student_last_name', 'student_first_name', 'id')
+
+
+class TemplateCursorPagination(CursorPagination):
+    page_size = 20
+    page_size_query_param = 'page_size'
+    max_page_size = 100
+    ordering = ('title', 'id')
+
+
+class SearchPagination(PageNumberPagination):
+    """Страницы результатов поиска по номеру (порядок по релевантности курсором не задать).
+
+    Общее число результатов не считается: отдельный COUNT по полнотекстовому запросу стоит столько же,
+    сколько сама страница, поэтому о следующей странице судят по лишней строке.
+    """
+    page_size = 20
+    page_size_query_param = 'page_size'
+    max_page_size = 100
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        page_size = self.get_page_size(request)
+        try:
+            self.number = int(request.query_params.get(self.page_query_param, 1))
+        except ValueError:
+            self.number = 0
+        if self.number < 1:
+            raise NotFound(self.invalid_page_message.format(page_number=request.query_params.get(
+                self.page_query_param), message='Номер страницы должен быть положительным числом.'))
+
+        offset = (self.number - 1) * page_size
+        rows = list(queryset[offset:offset + page_size + 1])
+        self.has_next = len(rows) > page_size
+        return rows[:page_size]
+
+    def get_next_link(self):
+        if not self.has_next:
+            return None
+        return replace_query_param(self.request.build_absolute_uri(), self.page_query_param, self.number + 1)
+
+    def get_previous_link(self):
+        if self.number == 1:
+            return None
+        url = self.request.build_absolute_uri()
+        if self.number == 2:
+            return remove_query_param(url, self.page_query_param)
+        return replace_query_param(url, self.page_query_param, self.number - 1)
+
+    def get_paginated_response(self, data):
+        return Response({'next': self.get_next_link(), 'previous': self.get_previous_link(), 'results': data})
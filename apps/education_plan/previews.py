@@ -0,0 +1,81 @@
+import io
+from django.conf import settings
+
+try:
+    from PIL import Image, ImageOps
+    RENDER_ERRORS = (OSError, ValueError, Image.DecompressionBombError)
+except ImportError:  # Без Pillow превью не создаются, файлы отдаются как есть.
+    Image = ImageOps = None
+    RENDER_ERRORS = ()
+
+try:
+    import pypdfium2
+    RENDER_ERRORS += (pypdfium2.PdfiumError,)
+except ImportError:  # Без pypdfium2 у PDF нет превью первой страницы.
+    pypdfium2 = None
+
+IMAGE_EXTENSIONS = ('bmp', 'gif', 'png', 'jpg', 'jpeg')
+# Несжатые оригиналы, для которых дополнительно сохраняется копия без потерь в WebP.
+UNCOMPRESSED_EXTENSIONS = ('bmp',)
+
+
+def has_previews(extension):
+    if Image is None:
+        return False
+    return extension in IMAGE_EXTENSIONS or extension == 'pdf' and pypdfium2 is not None
+
+
+def _to_webp(image, **options):
+    output = io.BytesIO()
+    image.save(output, 'WEBP', **options)
+    return output.getvalue(), image.width, image.height
+
+
+def _prepare(image):
+    """Первый кадр в RGB/RGBA с учетом EXIF-поворота: WebP не хранит палитры и поворот."""
+    image = ImageOps.exif_transpose(image)
+    if image.mode not in ('RGB', 'RGBA'):
+        has_alpha = 'A' in image.mode or 'transparency' in image.info
+        image = image.convert('RGBA' if has_alpha else 'RGB')
+    return image
+
+
+def _thumbnail(image, size):
+    image = image.copy()
+    image.thumbnail((size, size))
+    return _to_webp(image, quality=settings.FILE_PREVIEW_QUALITY)
+
+
+def _render_pdf_page(stream):
+    document = pypdfium2.PdfDocument(stream.read())
+    try:
+        page = document[0]
+        scale = settings.FILE_PREVIEW_SIZE / max(page.get_size())
+        return page.render(scale=scale).to_pil()
+    finally:
+        document.close()
+
+
+def render_previews(stream, extension):
+    """Производные изображения файла в WebP: {имя: (содержимое, ширина, высота)}.
+
+    thumbnail - уменьшенная копия для досок и карточек, preview - первая страница PDF,
+    compressed - несжатый оригинал (BMP) без потерь. Для нечитаемых файлов возвращается {}.
+    """
+    if not has_previews(extension):
+        return {}
+    renditions = {}
+    try:
+        if extension == 'pdf':
+            image = _prepare(_render_pdf_page(stream))
+            renditions['preview'] = _to_webp(image, quality=settings.FILE_PREVIEW_QUALITY)
+        else:
+            image = Image.open(stream)
+            image.load()
+            image = _prepare(image)
+            if extension in UNCOMPRESSED_EXTENSIONS:
+                renditions['compressed'] = _to_webp(image, lossless=True)
+        renditions['thumbnail'] = _thumbnail(image, settings.FILE_THUMBNAIL_SIZE)
+    except RENDER_ERRORS:
+        return {}
+    return renditions
@@ -0,0 +1,62 @@
+from django.conf import settings
+
+DIGITS = '0123456789abcdefghijklmnopqrstuvwxyz'
+BASE = len(DIGITS)
+# Длина ключей после перебалансировки и шаг при добавлении в начало или конец списка.
+RANK_WIDTH = 6
+RANK_STEP = BASE ** 3
+
+
+def rank_ordering_enabled():
+    """Порядок карточек и модулей задается ключами rank вместо сдвига index (settings.BOARD_ORDERING)."""
+    return settings.BOARD_ORDERING == 'rank'
+
+
+def needs_rebalance(rank):
+    return len(rank) > settings.RANK_REBALANCE_LENGTH
+
+
+def _to_int(rank, precision):
+    value = 0
+    for digit in rank.ljust(precision, DIGITS[0]):
+        value = value * BASE + DIGITS.index(digit)
+    return value
+
+
+def _to_rank(value, precision):
+    digits = []
+    for _ in range(precision):
+        value, digit = divmod(value, BASE)
+        digits.append(DIGITS[digit])
+    # Ключ - дробь в системе счисления BASE, поэтому нули в конце не меняют порядок и отбрасываются.
+    return ''.join(reversed(digits)).rstrip(DIGITS[0])
+
+
+def rank_between(before=None, after=None):
+    """Ключ строго между before и after; None означает начало или конец списка.
+
+    Между равными или переставленными ключами нового ключа нет, поэтому для них выбрасывается ValueError.
+    """
+    if before and after and before >= after:
+        raise ValueError(f'Нет ключа между {before!r} и {after!r}.')
+    precision = max(len(before or ''), len(after or ''), RANK_WIDTH)
+    while True:
+        low = _to_int(before, precision) if before else 0
+        high = _to_int(after, precision) if after else BASE ** precision
+
+        if after is None and before is not None and low + RANK_STEP < high:
+            return _to_rank(low + RANK_STEP, precision)
+        if before is None and after is not None and high - RANK_STEP > 0:
+            return _to_rank(high - RANK_STEP, precision)
+        if high - low > 1:
+            return _to_rank((low + high) // 2, precision)
+        precision += 1
+
+
+def initial_ranks(count):
+    """Равномерно распределенные ключи одинаковой длины для count элементов."""
+    precision = RANK_WIDTH
+    while BASE ** precision // (count + 1) < 2:
+        precision += 1
+    gap = BASE ** precision // (count + 1)
+    return [_to_rank(gap * (position + 1), precision) for position in range(count)]
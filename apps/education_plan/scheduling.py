@@ -0,0 +1,41 @@
+from datetime import timedelta
+
+# Оценка запоминания (0-5 по SM-2) по сложности карточки.
+DIFFICULTY_QUALITY = {'easy': 5, 'medium': 4, 'hard': 3, 'not_selected': 4}
+# Карточка, дождавшаяся повторения (to_repeat), считается забытой и начинает интервалы заново.
+LAPSE_QUALITY = 2
+PASSING_QUALITY = 3
+MIN_EASE_FACTOR = 1.3
+FIRST_INTERVALS = (1, 6)
+# Карточки, по которым пересчитывается расписание: пройденные и ожидающие повторения.
+SCHEDULED_STATUSES = ('done', 'to_repeat')
+
+
+def get_qualities(statuses, difficulties, plan_times, result_times):
+    """Оценки по столбцам карточек; превышение запланированного времени снижает оценку на 1."""
+    return [
+        LAPSE_QUALITY if status == 'to_repeat'
+        else DIFFICULTY_QUALITY.get(difficulty, DIFFICULTY_QUALITY['not_selected'])
+        - bool(plan_time and result_time and result_time > plan_time)
+        for status, difficulty, plan_time, result_time in zip(statuses, difficulties, plan_times, result_times)
+    ]
+
+
+def next_repetition(quality, count, interval, ease_factor):
+    """Шаг SM-2: (число успешных повторений, интервал в днях, коэффициент легкости)."""
+    ease_factor = round(max(MIN_EASE_FACTOR, ease_factor + 0.1 - (5 - quality) * (0.08 + (5 - quality) * 0.02)), 2)
+    if quality < PASSING_QUALITY:
+        return 0, FIRST_INTERVALS[0], ease_factor
+    if count < len(FIRST_INTERVALS):
+        return count + 1, FIRST_INTERVALS[count], ease_factor
+    return count + 1, round(interval * ease_factor), ease_factor
+
+
+def schedule(now, qualities, counts, intervals, ease_factors):
+    """Расписание для столбцов карточек: списки (counts, intervals, ease_factors, repetition_dates)."""
+    results = [next_repetition(*row) for row in zip(qualities, counts, intervals, ease_factors)]
+    if not results:
+        return [], [], [], []
+    counts, intervals, ease_factors = map(list, zip(*results))
+    dates = [now + timedelta(days=interval) for interval in intervals]
+    return counts, intervals, ease_factors, dates
@@ -1,6 +1,12 @@
+import uuid
 from rest_framework import serializers
+from django.db.models import Prefetch, prefetch_related_objects
 from django.shortcuts import get_object_or_404
-from apps.education_plan.models import EducationPlan, Module, Card, Label, File, CardContent, SectionContent
+from apps.education_plan.cache import SectionCache
+from apps.education_plan.models import EducationPlan, Module, Card, Label, File, CardContent, SectionContent, \
+    BoardChange, SectionRevision, FileUpload
+from apps.education_plan.ranking import rank_ordering_enabled
+from apps.education_plan.services import RankService, CardService, BlobService
 from apps.account.serializers import ProfileSerializer
 from TutorToolkit.constants import FILE_RESTRICTIONS
 
@@ -52,31 +58,91 @@ class LabelSerializer(serializers.ModelSerializer):
         return label
 
 
-class CardSerializer(serializers.ModelSerializer):
+class RankIndexMixin:
+    """В режиме rank порядковый index вычисляется по ключам, а не берется из поля модели.
+
+    Известные заранее позиции передаются в контексте: {'indexes': {id: index}}.
+    """
+    def to_representation(self, instance):
+        representation = super().to_representation(instance)
+        if rank_ordering_enabled() and instance.rank:
+            indexes = self.context.get('indexes', {})
+            representation['index'] = indexes[instance.pk] if instance.pk in indexes \
+                else RankService.get_index(instance)
+        return representation
+
+
+class SectionContentInputSerializer(serializers.Serializer):
+    text = serializers.CharField(required=False, allow_blank=True, default='')
+    files = serializers.ListField(child=serializers.UUIDField(), required=False, default=list)
+
+
+class CardContentInputSerializer(serializers.Serializer):
+    homework = SectionContentInputSerializer(required=False)
+    lesson = SectionContentInputSerializer(required=False)
+    repetition = SectionContentInputSerializer(required=False)
+
+    def validate(self, data):
+        file_ids = {file_id for section in data.values() for file_id in section['files']}
+        if file_ids and File.objects.filter(id__in=file_ids).count() != len(file_ids):
+            raise serializers.ValidationError({'files': 'Файл не найден.'})
+        return data
+
+
+class CardSerializer(RankIndexMixin, serializers.ModelSerializer):
     module_id = serializers.CharField(write_only=True)
-    labels = serializers.PrimaryKeyRelatedField(queryset=Label.objects.all(), many=True, write_only=True)
+    labels = serializers.ListField(child=serializers.UUIDField(), write_only=True)
+    content = CardContentInputSerializer(write_only=True, required=False)
 
     class Meta:
         model = Card
         fields = (
             'id', 'title', 'description', 'date_start', 'date_end', 'plan_time', 'result_time', 'repetition_date',
-            'status', 'module', 'labels', 'module_id', 'index', 'difficulty')
+            'status', 'module', 'labels', 'module_id', 'index', 'difficulty', 'content')
         read_only_fields = ('id', 'module', 'index')
 
+    def validate_labels(self, label_ids):
+        """Все метки проверяются одним запросом."""
+        labels = list(Label.objects.filter(id__in=label_ids))
+        if len(labels) != len(set(label_ids)):
+            raise serializers.ValidationError('Метка не найдена.')
+        return labels
+
+    def validate(self, data):
+        if self.instance is not None and 'content' in data:
+            raise serializers.ValidationError({'content': 'Содержимое карточки изменяется через card_content.'})
+        return data
+
+    def has_changes(self):
+        """Изменит ли save() карточку: без измененных полей и меток не пишется ни карточка, ни журнал доски."""
+        data = dict(self.validated_data)
+        labels = data.pop('labels', None)
+        for attr, value in data.items():
+            setattr(self.instance, attr, value)
+        if self.instance.get_dirty_fields():
+            return True
+        return labels is not None and {label.pk for label in labels} != set(
+            self.instance.labels.values_list('id', flat=True))
+
+    def create(self, validated_data):
+        validated_data.pop('module_id', None)
+        return CardService.create_card(labels=validated_data.pop('labels', []),
+                                       content=validated_data.pop('content', None), **validated_data)
+
     def to_representation(self, instance):
         representation = super().to_representation(instance)
         representation['labels'] = LabelSerializer(instance.labels.all(), many=True).data
         return representation
 
 
-class ModuleSerializer(serializers.ModelSerializer):
+class ModuleSerializer(RankIndexMixin, serializers.ModelSerializer):
     cards = CardSerializer(many=True, read_only=True)
     plan_id = serializers.CharField(write_only=True)
 
     class Meta:
         model = Module
-        fields = ('id', 'title', 'plan', 'cards', 'plan_id', 'index')
-        read_only_fields = ('id', 'plan', 'index')
+        fields = ('id', 'title', 'plan', 'cards', 'plan_id', 'index', 'version')
+        read_only_fields = ('id', 'plan', 'index', 'version')
 
 
 class ModulesInEducationPlanSerializer(serializers.ModelSerializer):
@@ -84,8 +150,42 @@ class ModulesInEducationPlanSerializer(serializers.ModelSerializer):
 
     class Meta:
         model = EducationPlan
-        fields = ('id', 'discipline', 'modules',)
-        read_only_fields = ('modules',)
+        fields = ('id', 'discipline', 'revision', 'version', 'modules',)
+        read_only_fields = ('revision', 'version', 'modules',)
+
+
+class CardChangeSerializer(RankIndexMixin, serializers.ModelSerializer):
+
+    class Meta:
+        model = Card
+        fields = (
+            'id', 'title', 'description', 'date_start', 'date_end', 'plan_time', 'result_time', 'repetition_date',
+            'status', 'module', 'index', 'difficulty')
+        read_only_fields = fields
+
+
+class ModuleChangeSerializer(RankIndexMixin, serializers.ModelSerializer):
+
+    class Meta:
+        model = Module
+        fields = ('id', 'title', 'plan', 'index')
+        read_only_fields = fields
+
+
+class BoardChangeSerializer(serializers.ModelSerializer):
+
+    class Meta:
+        model = BoardChange
+        fields = ('revision', 'op', 'object_type', 'object_id', 'data')
+        read_only_fields = fields
+
+
+class EducationPlanSummarySerializer(serializers.ModelSerializer):
+
+    class Meta:
+        model = EducationPlan
+        fields = ('id', 'discipline', 'status', 'student_first_name', 'student_last_name')
+        read_only_fields = fields
 
 
 class MoveElementSerializer(serializers.Serializer):
@@ -95,6 +195,7 @@ class MoveElementSerializer(serializers.Serializer):
     element_id = serializers.CharField()
     destination_index = serializers.IntegerField()
     destination_id = serializers.CharField(required=False)
+    version = serializers.IntegerField(required=False, min_value=0)
 
     def validate(self, data):
         element_type = data.get('element_type')
@@ -106,40 +207,108 @@ class MoveElementSerializer(serializers.Serializer):
         return data
 
 
+class MoveElementsSerializer(serializers.Serializer):
+    MAX_MOVES = 500
+
+    moves = MoveElementSerializer(many=True, allow_empty=False, max_length=MAX_MOVES)
+    versions = serializers.DictField(child=serializers.IntegerField(min_value=0), required=False)
+
+    def validate_moves(self, moves):
+        for move in moves:
+            for field in ('element_id', 'destination_id'):
+                if move.get(field) is None:
+                    continue
+                try:
+                    move[field] = uuid.UUID(move[field])
+                except ValueError:
+                    raise serializers.ValidationError(f"Field '{field}' must be a valid UUID.")
+        return moves
+
+    def validate_versions(self, versions):
+        try:
+            return {uuid.UUID(object_id): version for object_id, version in versions.items()}
+        except ValueError:
+            raise serializers.ValidationError("Keys of 'versions' must be valid UUIDs.")
+
+
+class InstantiateTemplateSerializer(serializers.Serializer):
+    MAX_MODULES = 500
+
+    module_ids = serializers.ListField(child=serializers.UUIDField(), allow_empty=False, max_length=MAX_MODULES)
+
+    def validate_module_ids(self, module_ids):
+        return list(dict.fromkeys(module_ids))
+
+
+class ModuleCloneSerializer(serializers.Serializer):
+    plan_id = serializers.UUIDField()
+
+
 class FileSerializer(serializers.ModelSerializer):
     name = serializers.CharField(required=True)
+    previews = serializers.SerializerMethodField()
 
     class Meta:
         model = File
-        fields = ('id', 'file', 'name', 'extension', 'size', 'upload_date', 'tutor')
+        fields = ('id', 'file', 'name', 'extension', 'size', 'upload_date', 'tutor', 'previews')
         read_only_fields = ('id', 'extension', 'size', 'upload_date', 'tutor')
 
+    def get_previews(self, file):
+        """Ссылки на превью (миниатюра, первая страница PDF, сжатая копия) с размерами, пока не созданы - {}."""
+        if file.blob_id is None:
+            return {}
+        storage = file.file.storage
+        return {name: {'url': storage.url(preview['key']), 'width': preview['width'], 'height': preview['height'],
+                       'size': preview['size']}
+                for name, preview in file.blob.previews.items()}
+
     def validate(self, data):
         file = data.get('file')
         if file:
-            name = file.name
-            extension = name.split('.')[-1].lower()
-            size = file.size
-
-            if extension not in FILE_RESTRICTIONS:
-                raise serializers.ValidationError({
-                    'file': [f"Файл с расширением {extension} не разрешен."],
-                    'name': name
-                })
-
-            max_size = FILE_RESTRICTIONS[extension]['max_size']
-            if size > max_size:
-                max_size_mb = max_size / 1024 / 1024
-                raise serializers.ValidationError({
-                    'file': [f"Размер файла {extension} должен быть менее {max_size_mb} MB."],
-                    'name': name
-                })
-
-            data['extension'] = extension
-            data['size'] = size
+            data['extension'] = check_file_restrictions(file.name, file.size)
+            data['size'] = file.size
 
         return data
 
+    def create(self, validated_data):
+        return BlobService.create_file(validated_data['tutor'], validated_data['name'], validated_data['extension'],
+                                       validated_data['file'])
+
+
+def check_file_restrictions(name, size):
+    """Проверяет расширение и размер файла по FILE_RESTRICTIONS и возвращает расширение."""
+    extension = name.split('.')[-1].lower()
+    if extension not in FILE_RESTRICTIONS:
+        raise serializers.ValidationError({
+            'file': [f"Файл с расширением {extension} не разрешен."],
+            'name': name
+        })
+
+    max_size = FILE_RESTRICTIONS[extension]['max_size']
+    if size > max_size:
+        max_size_mb = max_size / 1024 / 1024
+        raise serializers.ValidationError({
+            'file': [f"Размер файла {extension} должен быть менее {max_size_mb} MB."],
+            'name': name
+        })
+    return extension
+
+
+class FileUploadSerializer(serializers.ModelSerializer):
+    """Начало загрузки (прямой или по частям при chunked): имя и размер файла проверяются до загрузки."""
+    size = serializers.IntegerField(min_value=1)
+    chunked = serializers.BooleanField(write_only=True, default=False)
+    chunks = serializers.IntegerField(source='chunk_count', read_only=True)
+
+    class Meta:
+        model = FileUpload
+        fields = ('id', 'name', 'size', 'extension', 'chunked', 'chunk_size', 'chunks', 'created_at')
+        read_only_fields = ('id', 'extension', 'chunk_size', 'created_at')
+
+    def validate(self, data):
+        data['extension'] = check_file_restrictions(data['name'], data['size'])
+        return data
+
 
 class SectionContentSerializer(serializers.ModelSerializer):
 
@@ -150,9 +319,36 @@ class SectionContentSerializer(serializers.ModelSerializer):
 
     def to_representation(self, instance):
         representation = super().to_representation(instance)
+        prefetch_related_objects([instance], self.get_files_prefetch())
         representation['files'] = FileSerializer(instance.files.all(), many=True).data
         return representation
 
+    @staticmethod
+    def get_files_prefetch():
+        # Превью файлов хранятся в Blob, он загружается тем же запросом.
+        return Prefetch('files', queryset=File.objects.select_related('blob'))
+
+    @classmethod
+    def render_many(cls, sections):
+        """Данные разделов по id: из SectionCache, для промахов файлы загружаются одним запросом на все разделы."""
+        cache = SectionCache()
+        payloads = cache.get_many([section.pk for section in sections])
+        missing = [section for section in sections if section.pk not in payloads]
+        if missing:
+            prefetch_related_objects(missing, cls.get_files_prefetch())
+            rendered = {section.pk: dict(cls(section).data) for section in missing}
+            cache.set_many(rendered)
+            payloads.update(rendered)
+        return payloads
+
+
+class SectionRevisionSerializer(serializers.ModelSerializer):
+
+    class Meta:
+        model = SectionRevision
+        fields = ('number', 'length', 'author', 'created_at')
+        read_only_fields = fields
+
 
 class CardContentSerializer(serializers.ModelSerializer):
     card_id = serializers.CharField(write_only=True)
@@ -165,10 +361,123 @@ class CardContentSerializer(serializers.ModelSerializer):
         fields = ('homework', 'lesson', 'repetition', 'card', 'card_id')
         read_only_fields = ('card',)
 
+    SECTION_FIELDS = ('homework', 'lesson', 'repetition')
+
     def to_representation(self, instance):
-        representation = super().to_representation(instance)
-        representation['homework'] = SectionContentSerializer(instance.homework).data
-        representation['lesson'] = SectionContentSerializer(instance.lesson).data
-        representation['repetition'] = SectionContentSerializer(instance.repetition).data
-        representation['card_title'] = instance.card.title
+        return self.represent_many([instance])[0]
+
+    def represent_many(self, instances):
+        """Данные содержимого нескольких карточек, разделы которых загружены через select_related.
+
+        Разделы берутся из SectionCache, а не из вложенных сериализаторов, которые загружают файлы
+        каждого раздела отдельным запросом: промахи всех карточек отрисовываются одним render_many.
+        """
+        sections = [getattr(instance, name) for instance in instances for name in self.SECTION_FIELDS]
+        payloads = SectionContentSerializer.render_many([section for section in sections if section])
+        empty = SectionContentSerializer(None).data
+        representations = []
+        for instance in instances:
+            representation = {}
+            for name in self.SECTION_FIELDS:
+                section = getattr(instance, name)
+                representation[name] = payloads[section.pk] if section else empty
+            representation['card'] = self.fields['card'].to_representation(instance.card)
+            representation['card_title'] = instance.card.title
+            representations.append(representation)
+        return representations
+
+
+class BoardReadSerializer:
+    """Сборка доски только для чтения из values()-запросов (модули, карточки, связи карточек с метками).
+
+    Значения форматируются полями обычных сериализаторов, поэтому результат совпадает с
+    ModulesInEducationPlanSerializer, а число запросов не зависит от количества карточек.
+    """
+    def __init__(self):
+        self.plan_fields = self._readable_fields(ModulesInEducationPlanSerializer())
+        self.module_fields = self._readable_fields(ModuleSerializer())
+        self.card_fields = self._readable_fields(CardSerializer())
+        self.label_fields = self._readable_fields(LabelSerializer())
+
+    @staticmethod
+    def _readable_fields(serializer):
+        return [field for field in serializer.fields.values() if not field.write_only]
+
+    @staticmethod
+    def _represent(fields, row, nested=None):
+        nested = nested or {}
+        representation = {}
+        for field in fields:
+            if field.field_name in nested:
+                representation[field.field_name] = nested[field.field_name]
+                continue
+            value = row[field.source]
+            if value is None or isinstance(field, serializers.RelatedField):
+                representation[field.field_name] = value
+            else:
+                representation[field.field_name] = field.to_representation(value)
         return representation
+
+    def _sources(self, fields):
+        return [field.source for field in fields if not isinstance(field, serializers.BaseSerializer)]
+
+    def _labels_by_card(self, cards_queryset):
+        label_sources = self._sources(self.label_fields)
+        rows = Card.labels.through.objects.filter(card__in=cards_queryset.values('id')).order_by('label__title').values(
+            'card_id', *(f'label__{source}' for source in label_sources))
+
+        labels_by_card = {}
+        for row in rows:
+            label_row = {source: row[f'label__{source}'] for source in label_sources}
+            labels_by_card.setdefault(row['card_id'], []).append(self._represent(self.label_fields, label_row))
+        return labels_by_card
+
+    def cards(self, cards_queryset):
+        """Карточки в порядке queryset вместе с метками: два запроса на любое количество карточек."""
+        rows = list(cards_queryset.values(*self._sources(self.card_fields)))
+        labels_by_card = self._labels_by_card(cards_queryset)
+        cards = []
+        for row in rows:
+            card = self._represent(self.card_fields, row)
+            card['labels'] = labels_by_card.get(row['id'], [])
+            cards.append(card)
+        return cards
+
+    def modules(self, modules_queryset):
+        """Модули по порядку с карточками, также упорядоченными.
+
+        В режиме rank index модулей - позиция в плане, index карточек - позиция в модуле.
+        """
+        ordering = 'rank' if rank_ordering_enabled() else 'index'
+        modules_queryset = modules_queryset.order_by(ordering)
+        cards_by_module = {}
+        for card in self.cards(Card.objects.filter(module__in=modules_queryset.values('id')).order_by(ordering)):
+            module_cards = cards_by_module.setdefault(card['module'], [])
+            if ordering == 'rank':
+                card['index'] = len(module_cards)
+            module_cards.append(card)
+
+        modules = [
+            self._represent(self.module_fields, row, nested={'cards': cards_by_module.get(row['id'], [])})
+            for row in modules_queryset.values(*self._sources(self.module_fields))
+        ]
+        if ordering == 'rank':
+            # Модули нескольких планов (BoardReadSerializer.plans) нумеруются в каждом плане отдельно.
+            counts_by_plan = {}
+            for module in modules:
+                module['index'] = counts_by_plan.get(module['plan'], 0)
+                counts_by_plan[module['plan']] = module['index'] + 1
+        return modules
+
+    def plans(self, plans):
+        """Доски для уже загруженных планов: три запроса независимо от количества планов и карточек."""
+        modules_by_plan = {}
+        for module in self.modules(Module.objects.filter(plan__in=[plan.pk for plan in plans])):
+            modules_by_plan.setdefault(module['plan'], []).append(module)
+
+        return [
+            self._represent(self.plan_fields, {field.source: getattr(plan, field.source)
+                                               for field in self.plan_fields if field.field_name != 'modules'},
+                            nested={'modules': modules_by_plan.get(plan.pk, [])})
+            for plan in plans
+        ]
@@ -1,8 +1,23 @@
+import uuid
+import hashlib
+from datetime import timedelta
+from django.core.files.base import ContentFile
 from rest_framework import status
-from django.db.models import Q, F
+from rest_framework.renderers import JSONRenderer
+from django.conf import settings
+from django.contrib.postgres.expressions import ArraySubquery
+from django.contrib.postgres.search import SearchQuery, SearchRank, SearchVector
+from django.db.models import Q, F, Sum, Max, Func, OuterRef, Subquery, TextField, Value
+from django.db.models.functions import Coalesce, Greatest
 from django.shortcuts import get_object_or_404
 from django.db import transaction
 from django.contrib.auth import get_user_model
+from django.utils import timezone
+from apps.education_plan.ranking import rank_ordering_enabled, rank_between, initial_ranks, needs_rebalance
+from apps.education_plan.scheduling import SCHEDULED_STATUSES, get_qualities, schedule
+from apps.education_plan.deltas import make_delta, apply_delta
+from apps.education_plan.uploads import get_chunk_storage, get_chunk_name, delete_chunks, open_chunks
+from apps.education_plan.previews import has_previews, render_previews
 
 
 class StudentInvitationService:
@@ -58,32 +73,265 @@ class StudentInvitationService:
         return user.userprofile
 
 
+class VersionConflict(Exception):
+    """Объект изменен после того, как клиент (или запрос) прочитал его версию."""
+    def __init__(self, object_id, version):
+        super().__init__(object_id, version)
+        self.data = {'detail': 'Доска изменена в другом месте, обновите данные.', 'id': object_id, 'version': version}
+
+
+class VersionService:
+    """Оптимистическая блокировка досок: версия модуля (карточки и их порядок) и плана (порядок модулей)
+    проверяется и увеличивается одним UPDATE ... WHERE version = ожидаемая (compare-and-swap).
+
+    Успешная проверка удерживает блокировку строки до конца транзакции, поэтому конкурирующая запись
+    с той же ожидаемой версией получает конфликт вместо перемешивания сдвигов индексов.
+    Чтобы не было взаимных блокировок, версии проверяются в одном порядке: модули, затем планы, по id.
+    """
+    @staticmethod
+    def check_and_bump(model, object_id, expected, **values):
+        """Проверка и увеличение версии; values записываются в том же UPDATE (например, счетчики)."""
+        if not model.objects.filter(pk=object_id, version=expected).update(version=F('version') + 1, **values):
+            current = model.objects.filter(pk=object_id).values_list('version', flat=True).first()
+            raise VersionConflict(object_id, current)
+        return expected + 1
+
+    @staticmethod
+    def check(model, object_id, expected):
+        """Проверка версии без увеличения - для запросов, которые ничего не меняют."""
+        current = model.objects.filter(pk=object_id).values_list('version', flat=True).first()
+        if current != expected:
+            raise VersionConflict(object_id, current)
+        return current
+
+    @staticmethod
+    def lock_modules(module_ids):
+        """Блокировка строк модулей в порядке id перед изменением их index вместе с версией плана."""
+        from .models import Module
+        list(Module.objects.filter(pk__in=module_ids).order_by('id').select_for_update().values_list('id', flat=True))
+
+    @staticmethod
+    def check_and_bump_many(model, expected_versions, values=None):
+        """Проверка версий {id: ожидаемая версия} с записью values {id: {поле: значение}}; возвращает новые версии."""
+        values = values or {}
+        return {object_id: VersionService.check_and_bump(model, object_id, expected, **values.get(object_id, {}))
+                for object_id, expected in sorted(expected_versions.items(), key=lambda item: str(item[0]))}
+
+
 class MoveElementService:
     """Перемещение карточки."""
     @staticmethod
-    def move_card(card, destination_index, destination_module):
+    def move_card(card, destination_index, destination_module, version=None):
+        """Перемещение карточки; version - ожидаемая версия модуля назначения (иначе - версия загруженного модуля)."""
+        from .models import Card, Module
         source_module = card.module
-        source_index = card.index
 
         with transaction.atomic():
-            if source_module != destination_module:
-                MoveElementService.update_indexes_for_move_card_in_different_modules(source_module, source_index, destination_module, destination_index)
+            expected = {source_module.pk: source_module.version}
+            expected[destination_module.pk] = destination_module.version if version is None else version
+            counters = {}
+            if source_module.pk != destination_module.pk:
+                counters = {source_module.pk: {'cards_count': F('cards_count') - 1},
+                            destination_module.pk: {'cards_count': F('cards_count') + 1}}
+            versions = VersionService.check_and_bump_many(Module, expected, counters)
+            source_module.version = versions[source_module.pk]
+            destination_module.version = versions[destination_module.pk]
+
+            # Строки модулей заблокированы, поэтому положение карточки перечитывается уже без гонок.
+            card.refresh_from_db(fields=['module', 'index', 'rank'])
+            if card.module_id != source_module.pk:
+                raise VersionConflict(source_module.pk, expected[source_module.pk])
+
+            if rank_ordering_enabled():
+                # Переписывается только ключ перемещаемой карточки, соседние карточки не затрагиваются.
+                source_index = RankService.get_index(card)
+                rank = RankService.get_rank_for_index(destination_module.cards.exclude(pk=card.pk), destination_index)
+                Card.objects.filter(pk=card.pk).update(rank=rank, module=destination_module)
+                card.rank = rank
             else:
-                MoveElementService.update_indexes_for_move_in_same_element(source_module.cards.all(), source_index, destination_index)
+                source_index = card.index
+                if source_module != destination_module:
+                    MoveElementService.update_indexes_for_move_card_in_different_modules(source_module, source_index, destination_module, destination_index)
+                else:
+                    MoveElementService.update_indexes_for_move_in_same_element(source_module.cards.all(), source_index, destination_index)
 
-            card.index = destination_index
+                Card.objects.filter(pk=card.pk).update(index=destination_index, module=destination_module)
+                card.index = destination_index
             card.module = destination_module
-            card.save()
+
+            if source_module.plan_id == destination_module.plan_id:
+                BoardChangeService.record([(destination_module.plan_id, 'move', 'card', card.pk, {
+                    'module': destination_module.pk, 'index': destination_index,
+                    'source_module': source_module.pk, 'source_index': source_index,
+                })])
+            else:
+                BoardChangeService.record([
+                    (source_module.plan_id, 'delete', 'card', card.pk, {}),
+                    (destination_module.plan_id, 'create', 'card', card.pk, BoardChangeService.get_card_data(card)),
+                ])
+
+            if rank_ordering_enabled() and needs_rebalance(card.rank):
+                RankService.schedule_rebalance('card', destination_module.pk)
 
     @staticmethod
-    def move_module(module, destination_index):
-        """Перемещение модуля."""
+    def move_module(module, destination_index, version=None):
+        """Перемещение модуля; version - ожидаемая версия плана (иначе берется из module.plan)."""
+        from .models import EducationPlan, Module
         with transaction.atomic():
-            source_index = module.index
             plan = module.plan
-            MoveElementService.update_indexes_for_move_in_same_element(plan.modules.all(), source_index, destination_index)
-            module.index = destination_index
-            module.save()
+            VersionService.lock_modules(Module.objects.filter(plan_id=plan.pk).values('id'))
+            plan.version = VersionService.check_and_bump(EducationPlan, plan.pk,
+                                                         plan.version if version is None else version)
+            module.refresh_from_db(fields=['index', 'rank'])
+            if rank_ordering_enabled():
+                source_index = RankService.get_index(module)
+                rank = RankService.get_rank_for_index(plan.modules.exclude(pk=module.pk), destination_index)
+                Module.objects.filter(pk=module.pk).update(rank=rank)
+                module.rank = rank
+            else:
+                source_index = module.index
+                MoveElementService.update_indexes_for_move_in_same_element(plan.modules.all(), source_index, destination_index)
+                plan.modules.filter(pk=module.pk).update(index=destination_index)
+                module.index = destination_index
+            BoardChangeService.record([(module.plan_id, 'move', 'module', module.pk, {
+                'index': destination_index, 'source_index': source_index,
+            })])
+
+            if rank_ordering_enabled() and needs_rebalance(module.rank):
+                RankService.schedule_rebalance('module', module.plan_id)
+
+    @staticmethod
+    def move_elements(moves, profile, versions=None):
+        """Пакет перемещений карточек и модулей в одной транзакции.
+
+        Итоговый порядок вычисляется в памяти, затем каждый затронутый модуль (для модулей - план)
+        записывается одним bulk_update. versions - ожидаемые версии модулей и планов по id; для остальных
+        берутся версии, прочитанные вместе с модулями. Возвращает новый порядок и версии затронутых модулей и планов.
+        """
+        from .models import EducationPlan, Module, Card
+        card_ids = {move['element_id'] for move in moves if move['element_type'] == 'task'}
+        module_ids = {move['element_id'] for move in moves if move['element_type'] == 'board'} | \
+                     {move['destination_id'] for move in moves if move['element_type'] == 'task'}
+        ordering = ('rank', 'id') if rank_ordering_enabled() else ('index', 'id')
+
+        with transaction.atomic():
+            # Все модули планов учителя, к которым относятся перемещаемые элементы: проверка прав одним запросом.
+            modules = list(Module.objects.select_related('plan').filter(
+                plan__tutor=profile, plan__in=EducationPlan.objects.filter(
+                    Q(modules__id__in=module_ids) | Q(modules__cards__id__in=card_ids)
+                ).values('id')
+            ).order_by(*ordering))
+            modules_by_id = {module.id: module for module in modules}
+            if not module_ids <= modules_by_id.keys():
+                return {'detail': 'Модуль не найден.'}, status.HTTP_404_NOT_FOUND
+
+            cards = list(Card.objects.filter(
+                Q(module_id__in=module_ids) | Q(module_id__in=Card.objects.filter(id__in=card_ids).values('module_id'))
+            ).order_by(*ordering))
+            cards_by_id = {card.id: card for card in cards}
+            if any(card_id not in cards_by_id or cards_by_id[card_id].module_id not in modules_by_id
+                   for card_id in card_ids):
+                return {'detail': 'Карточка не найдена.'}, status.HTTP_404_NOT_FOUND
+
+            module_orders, card_orders = {}, {}
+            for module in modules:
+                module_orders.setdefault(module.plan_id, []).append(module.id)
+            for card in cards:
+                card_orders.setdefault(card.module_id, []).append(card.id)
+            card_modules = {card.id: card.module_id for card in cards}
+
+            touched_modules, touched_plans, changes = {}, {}, []
+            for move in moves:
+                if move['element_type'] == 'task':
+                    card_id, destination_id = move['element_id'], move['destination_id']
+                    source_id = card_modules[card_id]
+                    source_index = MoveElementService._move_in_orders(
+                        card_orders.setdefault(source_id, []), card_orders.setdefault(destination_id, []),
+                        card_id, move['destination_index'])
+                    destination_index = card_orders[destination_id].index(card_id)
+                    card_modules[card_id] = destination_id
+                    touched_modules.update(dict.fromkeys((source_id, destination_id)))
+
+                    source_plan_id = modules_by_id[source_id].plan_id
+                    destination_plan_id = modules_by_id[destination_id].plan_id
+                    if source_plan_id == destination_plan_id:
+                        changes.append((destination_plan_id, 'move', 'card', card_id, {
+                            'module': destination_id, 'index': destination_index,
+                            'source_module': source_id, 'source_index': source_index,
+                        }))
+                    else:
+                        changes.append((source_plan_id, 'delete', 'card', card_id, {}))
+                        changes.append((destination_plan_id, 'create', 'card', card_id, None))
+                else:
+                    module_id = move['element_id']
+                    plan_id = modules_by_id[module_id].plan_id
+                    order = module_orders[plan_id]
+                    source_index = MoveElementService._move_in_orders(order, order, module_id,
+                                                                      move['destination_index'])
+                    touched_plans[plan_id] = None
+                    changes.append((plan_id, 'move', 'module', module_id, {
+                        'index': order.index(module_id), 'source_index': source_index,
+                    }))
+
+            versions = versions or {}
+            VersionService.lock_modules(set(touched_modules) | {
+                module.id for module in modules if module.plan_id in touched_plans})
+            module_versions = VersionService.check_and_bump_many(Module, {
+                module_id: versions.get(module_id, modules_by_id[module_id].version) for module_id in touched_modules
+            }, {module_id: {'cards_count': len(card_orders[module_id])} for module_id in touched_modules})
+            plan_versions = VersionService.check_and_bump_many(EducationPlan, {
+                plan_id: versions.get(plan_id, modules_by_id[order[0]].plan.version)
+                for plan_id, order in module_orders.items() if plan_id in touched_plans})
+
+            for module_id in touched_modules:
+                MoveElementService._save_order(Card, card_orders[module_id], cards_by_id, {'module_id': module_id})
+            for plan_id in touched_plans:
+                MoveElementService._save_order(Module, module_orders[plan_id], modules_by_id, {})
+
+            created = {change[3] for change in changes if change[1] == 'create'}
+            if created:
+                created_data = {card.id: BoardChangeService.get_card_data(card)
+                                for card in Card.objects.filter(id__in=created).prefetch_related('labels')}
+                changes = [change if change[1] != 'create' else change[:4] + (created_data[change[3]],)
+                           for change in changes]
+            BoardChangeService.record(changes)
+
+        return {
+            'modules': [{'id': module_id, 'version': module_versions[module_id], 'cards': card_orders[module_id]}
+                        for module_id in touched_modules],
+            'plans': [{'id': plan_id, 'version': plan_versions[plan_id], 'modules': module_orders[plan_id]}
+                      for plan_id in touched_plans],
+        }, status.HTTP_200_OK
+
+    @staticmethod
+    def _move_in_orders(source_order, destination_order, element_id, destination_index):
+        """Перенос элемента между списками порядка; возвращает его прежнюю позицию."""
+        source_index = source_order.index(element_id)
+        source_order.pop(source_index)
+        destination_order.insert(min(max(destination_index, 0), len(destination_order)), element_id)
+        return source_index
+
+    @staticmethod
+    def _save_order(model, order, objects_by_id, values):
+        """Запись порядка одного набора одним bulk_update: меняются только строки с новыми значениями."""
+        fields = ['index', *values]
+        ranks = [None] * len(order)
+        if rank_ordering_enabled():
+            # Набор получает равномерные ключи заново, это заодно его перебалансировка.
+            fields.append('rank')
+            ranks = initial_ranks(len(order))
+
+        updated = []
+        for index, (object_id, rank) in enumerate(zip(order, ranks)):
+            obj = objects_by_id[object_id]
+            new_values = {'index': index, **values}
+            if rank is not None:
+                new_values['rank'] = rank
+            if any(getattr(obj, field) != value for field, value in new_values.items()):
+                for field, value in new_values.items():
+                    setattr(obj, field, value)
+                updated.append(obj)
+        model.objects.bulk_update(updated, [field.removesuffix('_id') for field in fields])
 
     @staticmethod
     def update_indexes_for_move_card_in_different_modules(source_module, source_index, destination_module, destination_index):
@@ -98,3 +346,906 @@ class MoveElementService:
             queryset.filter(index__gte=destination_index, index__lt=source_index).update(index=F('index') + 1)
         elif source_index < destination_index:
             queryset.filter(index__gt=source_index, index__lte=destination_index).update(index=F('index') - 1)
+
+
+class RankService:
+    """Порядок карточек и модулей по строковым ключам rank (settings.BOARD_ORDERING = 'rank').
+
+    Ключ нового положения выбирается между ключами соседей, поэтому перемещение записывает одну строку.
+    Порядковый index для API вычисляется по ключам; когда ключи становятся слишком длинными,
+    ключи родителя пересчитываются фоновой задачей.
+    """
+    @staticmethod
+    def get_siblings(instance):
+        from .models import Module
+        if isinstance(instance, Module):
+            return Module.objects.filter(plan_id=instance.plan_id)
+        return type(instance).objects.filter(module_id=instance.module_id)
+
+    @staticmethod
+    def get_index(instance):
+        return RankService.get_siblings(instance).filter(rank__lt=instance.rank).count()
+
+    @staticmethod
+    def get_next_rank(queryset):
+        """Ключ для добавления элемента в конец набора."""
+        return rank_between(queryset.aggregate(last=Max('rank'))['last'] or None, None)
+
+    @staticmethod
+    def get_rank_for_index(queryset, index):
+        """Ключ, который поставит элемент на позицию index среди элементов queryset.
+
+        Между соседями с одинаковыми ключами нового ключа нет: тогда набор сразу перебалансируется,
+        вызывающий код уже держит блокировку родителя.
+        """
+        index = max(index, 0)
+        neighbours = RankService.get_neighbours(queryset, index)
+        if len(neighbours) > 1 and neighbours[1] and neighbours[0] >= neighbours[1]:
+            RankService.rebalance(queryset)
+            neighbours = RankService.get_neighbours(queryset, index)
+        if index == 0:
+            return rank_between(None, neighbours[0] if neighbours else None)
+        if not neighbours:
+            return RankService.get_next_rank(queryset)
+        return rank_between(neighbours[0], neighbours[1] if len(neighbours) > 1 else None)
+
+    @staticmethod
+    def get_neighbours(queryset, index):
+        return list(queryset.order_by('rank').values_list('rank', flat=True)[max(index - 1, 0):index + 1])
+
+    @staticmethod
+    def rebalance(queryset, order_by='rank'):
+        """Равномерные ключи одинаковой длины для элементов набора; index заполняется их позицией."""
+        with transaction.atomic():
+            items = list(queryset.select_for_update().order_by(order_by, 'id').only('id', 'rank', 'index'))
+            for index, (item, rank) in enumerate(zip(items, initial_ranks(len(items)))):
+                item.rank = rank
+                item.index = index
+            queryset.model.objects.bulk_update(items, ['rank', 'index'], batch_size=1000)
+        return len(items)
+
+    @staticmethod
+    def rebalance_parent(object_type, parent_id, order_by='rank'):
+        from .models import Module, Card
+        if object_type == 'module':
+            return RankService.rebalance(Module.objects.filter(plan_id=parent_id), order_by)
+        return RankService.rebalance(Card.objects.filter(module_id=parent_id), order_by)
+
+    @staticmethod
+    def schedule_rebalance(object_type, parent_id):
+        from .tasks import rebalance_ranks
+        transaction.on_commit(lambda: rebalance_ranks.delay(object_type, str(parent_id)))
+
+
+class CardService:
+    """Создание карточки вместе с содержимым (CardContent и три раздела) и метками пакетными вставками."""
+    SECTION_TYPES = ('homework', 'lesson', 'repetition')
+
+    @staticmethod
+    def create_card(module, labels=(), content=None, **fields):
+        """Фиксированное число запросов независимо от количества меток и файлов.
+
+        content - {'homework': {'text': ..., 'files': [id файлов]}, ...}, отсутствующие разделы создаются пустыми.
+        """
+        from .models import Card, CardContent, SectionContent
+        from .serializers import LabelSerializer
+        content = content or {}
+        sections_data = [content.get(section_type) or {} for section_type in CardService.SECTION_TYPES]
+
+        with transaction.atomic():
+            card = Card(module=module, **fields)
+            card.reserve_position()
+            card.schedule_repetition()
+            Card.objects.bulk_create([card])
+
+            sections = SectionContent.objects.bulk_create(
+                SectionContent(text=section_data.get('text', '')) for section_data in sections_data)
+            SectionContent.files.through.objects.bulk_create(
+                SectionContent.files.through(sectioncontent_id=section.id, file_id=file_id)
+                for section, section_data in zip(sections, sections_data) for file_id in section_data.get('files', []))
+            CardContent.objects.bulk_create([CardContent(card=card, **dict(zip(CardService.SECTION_TYPES, sections)))])
+            Card.labels.through.objects.bulk_create(
+                Card.labels.through(card_id=card.id, label_id=label.id) for label in labels)
+            SearchService.update_cards([card.pk])
+
+            data = BoardChangeService.get_card_data(card, with_labels=False)
+            data['labels'] = LabelSerializer(labels, many=True).data
+            BoardChangeService.record([(module.plan_id, 'create', 'card', card.pk, data)])
+        return card
+
+    @staticmethod
+    def reserve_positions(module_ids):
+        """Позиции в конце модулей для новых карточек, по одной на модуль: {id модуля: (index, rank)}.
+
+        Как Card.reserve_position, но для любого числа модулей за фиксированное число запросов.
+        """
+        from .models import Card, Module, next_child_index
+        if not module_ids:
+            return {}
+        VersionService.lock_modules(module_ids)
+        modules = Module.objects.filter(pk__in=module_ids)
+        modules.update(version=F('version') + 1,
+                       cards_count=Greatest(F('cards_count'), next_child_index(Card.objects, 'module_id')) + 1)
+        indexes = {module_id: count - 1 for module_id, count in modules.values_list('id', 'cards_count')}
+        if not rank_ordering_enabled():
+            return {module_id: (index, '') for module_id, index in indexes.items()}
+
+        last_ranks = dict(Card.objects.filter(module_id__in=module_ids).values('module_id').annotate(
+            last=Max('rank')).values_list('module_id', 'last'))
+        return {module_id: (index, rank_between(last_ranks.get(module_id) or None, None))
+                for module_id, index in indexes.items()}
+
+    @staticmethod
+    def assign_template_owners(default_owner=None):
+        """Владельцы шаблонов, созданных до появления Card.owner: преподаватель меток шаблона, иначе - файлов
+        его разделов, иначе default_owner (если задан). Возвращает (назначено, осталось без владельца).
+        """
+        from .models import Card, Label, File
+        card = OuterRef('pk')
+        owners = [Subquery(Label.objects.filter(cards=card).order_by('tutor_id').values('tutor_id')[:1])]
+        owners += [Subquery(File.objects.filter(**{f'section_contents__{section_type}__card': card})
+                            .order_by('tutor_id').values('tutor_id')[:1])
+                   for section_type in CardService.SECTION_TYPES]
+        if default_owner is not None:
+            owners.append(Value(default_owner.pk))
+        templates = Card.objects.filter(is_template=True, owner__isnull=True)
+        with transaction.atomic():
+            assigned = templates.update(owner=Coalesce(*owners))
+            # UPDATE проставляет NULL там, где владельца определить не удалось.
+            left = templates.count()
+        return assigned - left, left
+
+    @staticmethod
+    def clone(source, modules, owner=None):
+        """Копии карточки source с метками в каждом модуле из modules; None вместо модуля создает шаблон owner.
+
+        Разделы содержимого не копируются, а остаются общими до первого изменения (get_own_section).
+        Возвращает копии и их данные для ответа (как в журнале изменений).
+        Число запросов не зависит от количества модулей.
+        """
+        from .models import Card, CardContent, SectionContent
+        from .serializers import CardChangeSerializer, LabelSerializer
+        labels = list(source.labels.all())
+
+        with transaction.atomic():
+            content = CardContent.objects.filter(card=source).values(*CardService.SECTION_TYPES).first() or {}
+            section_ids = [content.get(section_type) for section_type in CardService.SECTION_TYPES]
+            # Блокировка разделов не дает изменить их на месте, пока на них появляются новые ссылки.
+            list(SectionContent.objects.filter(pk__in=[section_id for section_id in section_ids if section_id])
+                 .order_by('id').select_for_update().values_list('id', flat=True))
+
+            positions = CardService.reserve_positions([module.pk for module in modules if module is not None])
+            cards = []
+            for module in modules:
+                index, rank = positions[module.pk] if module is not None else (None, '')
+                cards.append(Card(title=source.title, description=source.description, module=module,
+                                  is_template=module is None, owner=owner if module is None else None,
+                                  index=None if rank else index, rank=rank, search_vector=source.search_vector))
+            Card.objects.bulk_create(cards)
+
+            CardContent.objects.bulk_create(
+                CardContent(card=card, **{f'{section_type}_id': section_id
+                                          for section_type, section_id in zip(CardService.SECTION_TYPES, section_ids)})
+                for card in cards)
+            Card.labels.through.objects.bulk_create(
+                Card.labels.through(card_id=card.id, label_id=label.id) for card in cards for label in labels)
+            # У копий тот же поисковый документ; пересчет нужен, только если у источника его еще нет.
+            if source.search_vector is None:
+                SearchService.update_cards([card.pk for card in cards])
+
+            indexes = {card.pk: positions[card.module_id][0] for card in cards if card.module_id is not None}
+            labels_data = LabelSerializer(labels, many=True).data
+            data = CardChangeSerializer(cards, many=True, context={'indexes': indexes}).data
+            for card_data in data:
+                card_data['labels'] = labels_data
+            BoardChangeService.record([(module.plan_id, 'create', 'card', card.pk, card_data)
+                                       for card, module, card_data in zip(cards, modules, data) if module is not None])
+        return cards, data
+
+    @staticmethod
+    def get_own_section(card_content, section_type):
+        """Раздел карточки для изменения: отсутствующий создается, общий с другими карточками копируется.
+
+        Вызывается в транзакции: строка раздела остается заблокированной до сохранения изменений.
+        """
+        from .models import CardContent, SectionContent
+        section = getattr(card_content, section_type)
+        if section is not None:
+            # Текст перечитывается под блокировкой: от него считается дельта следующей версии (SectionHistoryService).
+            for text in SectionContent.objects.filter(pk=section.pk).select_for_update().values_list('text', flat=True):
+                section.text = text
+            shared = CardContent.objects.filter(
+                Q(homework=section) | Q(lesson=section) | Q(repetition=section)
+            ).exclude(pk=card_content.pk).exists()
+            if not shared:
+                return section
+
+            copy = SectionContent.objects.create(text=section.text)
+            SectionContent.files.through.objects.bulk_create(
+                SectionContent.files.through(sectioncontent_id=copy.id, file_id=file_id)
+                for file_id in SectionContent.files.through.objects.filter(
+                    sectioncontent_id=section.pk).values_list('file_id', flat=True))
+            section = copy
+        else:
+            section = SectionContent.objects.create(text='')
+
+        setattr(card_content, section_type, section)
+        card_content.save(update_fields=[section_type])
+        return section
+
+
+class SectionHistoryService:
+    """История текста разделов (SectionRevision): дельты между версиями и полный текст каждые
+    SECTION_REVISION_SNAPSHOT_INTERVAL версий, поэтому любая версия собирается из одного запроса.
+
+    История принадлежит разделу: копия общего раздела (CardService.get_own_section) начинает свою
+    историю с текста, который был на момент копирования.
+    """
+    @staticmethod
+    def is_snapshot(number):
+        return (number - 1) % settings.SECTION_REVISION_SNAPSHOT_INTERVAL == 0
+
+    @staticmethod
+    def record(section, previous_text, author=None):
+        """Сохраняет версию после изменения текста раздела; вызывается в транзакции под блокировкой раздела.
+
+        Первая запись истории сохраняет и исходный текст, чтобы к нему можно было вернуться.
+        """
+        from .models import SectionRevision
+        if section.text == previous_text:
+            return None
+        last_number = SectionRevision.objects.filter(section=section).order_by('-number').values_list(
+            'number', flat=True).first()
+        revisions = []
+        if last_number is None:
+            last_number = 1
+            revisions.append(SectionRevision(section=section, number=last_number, snapshot=previous_text,
+                                             length=len(previous_text)))
+        number = last_number + 1
+        if SectionHistoryService.is_snapshot(number):
+            revision = SectionRevision(section=section, number=number, snapshot=section.text)
+        else:
+            revision = SectionRevision(section=section, number=number, delta=make_delta(previous_text, section.text))
+        revision.length = len(section.text)
+        revision.author = author
+        revisions.append(revision)
+        SectionRevision.objects.bulk_create(revisions)
+        return revision
+
+    @staticmethod
+    def get_text(section, number):
+        """Текст версии number: ближайший полный текст и дельты после него. None, если версии нет."""
+        from .models import SectionRevision
+        start = number - (number - 1) % settings.SECTION_REVISION_SNAPSHOT_INTERVAL
+        rows = list(SectionRevision.objects.filter(section=section, number__range=(start, number))
+                    .order_by('number').values_list('number', 'snapshot', 'delta'))
+        if not rows or rows[-1][0] != number:
+            return None
+        text = rows[0][1]
+        for _, _, delta in rows[1:]:
+            text = apply_delta(text, delta)
+        return text
+
+    @staticmethod
+    def restore(card_content, section_type, number, author=None):
+        """Возвращает раздел карточки к версии number как новую версию. None, если версии нет."""
+        section = getattr(card_content, section_type)
+        text = SectionHistoryService.get_text(section, number) if section is not None else None
+        if text is None:
+            return None
+        with transaction.atomic():
+            section = CardService.get_own_section(card_content, section_type)
+            previous_text = section.text
+            section.text = text
+            section.save()
+            SectionHistoryService.record(section, previous_text, author)
+        return section
+
+
+class BlobService:
+    """Общее содержимое файлов (Blob): одинаковые загрузки хранятся одним объектом, ключ - sha256 содержимого.
+
+    Строка Blob блокируется на время получения и освобождения ссылки. Объекты удаленного Blob стираются после
+    коммита, поэтому ключи объектов уникальны: повторная загрузка того же содержимого не перезаписывает объект,
+    ожидающий удаления.
+    """
+    READ_SIZE = 64 * 1024
+
+    @staticmethod
+    def get_digest(stream):
+        """sha256 потока (файла хранилища, UploadedFile или частей загрузки), читаемого по READ_SIZE."""
+        digest = hashlib.sha256()
+        for chunk in iter(lambda: stream.read(BlobService.READ_SIZE), b''):
+            digest.update(chunk)
+        return digest.hexdigest()
+
+    @staticmethod
+    def get_key(digest, extension):
+        return f'blobs/{digest[:2]}/{digest}-{uuid.uuid4().hex[:12]}.{extension}'
+
+    @staticmethod
+    def acquire(digest, size, extension, store):
+        """Ссылка на содержимое digest: существующий Blob получает +1 ссылку, новое содержимое сохраняется
+        вызовом store(key), который возвращает итоговый ключ в хранилище.
+
+        Возвращает (blob, created).
+        """
+        from .models import Blob
+        with transaction.atomic():
+            blob = Blob.objects.select_for_update().filter(pk=digest).first()
+            if blob is not None:
+                Blob.objects.filter(pk=digest).update(ref_count=F('ref_count') + 1)
+                return blob, False
+            key = store(BlobService.get_key(digest, extension))
+            # Одновременная загрузка того же содержимого ждет блокировки строки и получает ссылку на нее.
+            blob, created = Blob.objects.select_for_update().get_or_create(
+                digest=digest, defaults={'key': key, 'size': size, 'ref_count': 1})
+            if not created:
+                Blob.objects.filter(pk=digest).update(ref_count=F('ref_count') + 1)
+                if key != blob.key:
+                    transaction.on_commit(lambda: BlobService.get_storage().delete(key))
+        if created:
+            FilePreviewService.schedule(digest, extension)
+        return blob, created
+
+    @staticmethod
+    def release(digest):
+        """Снимает ссылку на содержимое; с последней ссылкой удаляются Blob и объект в хранилище.
+
+        Объекты в хранилище удаляются только после коммита: при откате Blob остается вместе с содержимым.
+        """
+        from .models import Blob
+        with transaction.atomic():
+            blob = Blob.objects.select_for_update().filter(pk=digest).first()
+            if blob is None:
+                return
+            if blob.ref_count > 1:
+                Blob.objects.filter(pk=digest).update(ref_count=F('ref_count') - 1)
+                return
+            keys = [preview['key'] for preview in blob.previews.values()] + [blob.key]
+            blob.delete()
+            transaction.on_commit(lambda: BlobService.delete_objects(keys))
+
+    @staticmethod
+    def delete_objects(keys):
+        storage = BlobService.get_storage()
+        for key in keys:
+            storage.delete(key)
+
+    @staticmethod
+    def get_storage():
+        from .models import File
+        return File._meta.get_field('file').storage
+
+    @staticmethod
+    def create_file(profile, name, extension, content):
+        """File учителя из загруженного через приложение файла (UploadedFile) с общим содержимым."""
+        from .models import File
+        digest = BlobService.get_digest(content)
+        blob, _ = BlobService.acquire(digest, content.size, extension,
+                                      lambda key: BlobService.get_storage().save(key, content))
+        return File.objects.create(file=blob.key, blob=blob, name=name, extension=extension, size=blob.size,
+                                   tutor=profile)
+
+
+class FilePreviewService:
+    """Превью общего содержимого файлов (Blob.previews): миниатюры изображений, первая страница PDF и сжатая
+    копия BMP создаются задачей generate_file_previews один раз на Blob."""
+    @staticmethod
+    def schedule(digest, extension):
+        if not has_previews(extension):
+            return
+        from .tasks import generate_file_previews
+        transaction.on_commit(lambda: generate_file_previews.delay(digest, extension))
+
+    @staticmethod
+    def get_key(digest, version, name):
+        return f'previews/{digest[:2]}/{digest}-{version}/{name}.webp'
+
+    @staticmethod
+    def generate(digest, extension):
+        """Сохраняет превью Blob, если их еще нет, и возвращает их имена."""
+        from .models import Blob
+        blob = Blob.objects.filter(pk=digest).first()
+        if blob is None or blob.previews:
+            return []
+        storage = BlobService.get_storage()
+        with storage.open(blob.key) as content:
+            renditions = render_previews(content, extension)
+
+        previews = {}
+        version = uuid.uuid4().hex[:12]
+        for name, (data, width, height) in renditions.items():
+            key = storage.save(FilePreviewService.get_key(digest, version, name), ContentFile(data))
+            previews[name] = {'key': key, 'width': width, 'height': height, 'size': len(data)}
+        with transaction.atomic():
+            # Пока превью создавались, последняя ссылка на Blob могла быть снята (BlobService.release).
+            blob = Blob.objects.select_for_update().filter(pk=digest).first()
+            if blob is None or blob.previews:
+                for preview in previews.values():
+                    storage.delete(preview['key'])
+                return []
+            blob.previews = previews
+            blob.save(update_fields=['previews'])
+        return list(previews)
+
+
+class FileUploadService:
+    """Загрузка файлов без прохода через воркер целиком: прямая по ссылке в хранилище или по частям
+    (FileUpload.chunk_size), File создается после подтверждения загрузки."""
+    @staticmethod
+    def create_upload(profile, name, size, extension, chunked=False):
+        from .models import File, FileUpload
+        upload_id = uuid.uuid4()
+        # Отдельный каталог на загрузку: имя файла сохраняется, а ключи разных загрузок не совпадают.
+        key = File._meta.get_field('file').generate_filename(None, f'{upload_id.hex}/{name}')
+        return FileUpload.objects.create(id=upload_id, key=key, name=name, extension=extension, size=size,
+                                         chunk_size=settings.CHUNKED_UPLOAD_CHUNK_SIZE if chunked else None,
+                                         tutor=profile)
+
+    @staticmethod
+    def save_chunk(upload, number, stream, length):
+        """Записывает часть number во временное хранилище; повторная отправка части ее заменяет.
+
+        Возвращает (error_response, status_code) или (None, None).
+        """
+        from .models import FileUpload, UploadChunk
+        if not upload.chunk_size:
+            return {'detail': 'Загрузка не принимает файл по частям.'}, status.HTTP_400_BAD_REQUEST
+        if number >= upload.chunk_count:
+            return {'detail': f'Номер части должен быть меньше {upload.chunk_count}.'}, status.HTTP_400_BAD_REQUEST
+        if length != upload.get_chunk_length(number):
+            return {'detail': f'Размер части {number} должен быть {upload.get_chunk_length(number)} байт.'}, \
+                status.HTTP_400_BAD_REQUEST
+
+        storage = get_chunk_storage()
+        name = get_chunk_name(upload, number)
+        if storage.exists(name):
+            storage.delete(name)
+        storage.save(name, stream)
+        UploadChunk.objects.bulk_create([UploadChunk(upload=upload, number=number)], ignore_conflicts=True)
+        FileUpload.objects.filter(pk=upload.pk).update(updated_at=timezone.now())
+        return None, None
+
+    @staticmethod
+    def get_received(upload):
+        """Принятые части отрезками [первая, последняя]; загрузка продолжается с первой недостающей."""
+        ranges = []
+        for number in upload.chunks.order_by('number').values_list('number', flat=True):
+            if ranges and ranges[-1][1] == number - 1:
+                ranges[-1][1] = number
+            else:
+                ranges.append([number, number])
+        return ranges
+
+    @staticmethod
+    def confirm(profile, upload_id):
+        """Создает File по загруженному объекту, сверив его размер в хранилище с заявленным.
+
+        Файл, загруженный по частям, сначала собирается в хранилище потоком из временных частей.
+        Возвращает (file, error_response, status_code); строка загрузки блокируется, поэтому
+        повторное подтверждение не создаст второй File.
+        """
+        from .models import File, FileUpload
+        storage = File._meta.get_field('file').storage
+        with transaction.atomic():
+            upload = FileUpload.objects.select_for_update().filter(pk=upload_id, tutor=profile).first()
+            if upload is None:
+                return None, {'detail': 'Загрузка не найдена.'}, status.HTTP_404_NOT_FOUND
+            if upload.chunk_size:
+                if upload.chunks.count() != upload.chunk_count:
+                    return None, {'detail': 'Загружены не все части файла.'}, status.HTTP_400_BAD_REQUEST
+                # Части хешируются локально: при совпадении содержимого файл не собирается и не отправляется в
+                # хранилище повторно.
+                with open_chunks(upload) as chunks:
+                    digest = BlobService.get_digest(chunks)
+
+                def store(key):
+                    with open_chunks(upload) as content:
+                        return storage.save(key, content)
+            else:
+                try:
+                    size = storage.size(upload.key)
+                except FileNotFoundError:
+                    return None, {'detail': 'Файл еще не загружен.'}, status.HTTP_400_BAD_REQUEST
+                if size != upload.size:
+                    storage.delete(upload.key)
+                    upload.delete()
+                    return None, {'detail': 'Размер загруженного файла не совпадает с заявленным.'}, \
+                        status.HTTP_400_BAD_REQUEST
+                with storage.open(upload.key) as content:
+                    digest = BlobService.get_digest(content)
+
+                def store(key):
+                    return upload.key
+
+            blob, created = BlobService.acquire(digest, upload.size, upload.extension, store)
+            if not upload.chunk_size and blob.key != upload.key:
+                storage.delete(upload.key)
+            file = File.objects.create(file=blob.key, blob=blob, name=upload.name, extension=upload.extension,
+                                       size=blob.size, tutor=profile)
+            upload.delete()
+        delete_chunks(upload_id)
+        return file, None, None
+
+    @staticmethod
+    def expire(updated_before):
+        """Удаляет загрузки без активности с updated_before вместе с частями и неподтвержденными объектами."""
+        from .models import File, FileUpload
+        storage = File._meta.get_field('file').storage
+        expired = 0
+        for upload in FileUpload.objects.filter(updated_at__lt=updated_before).only('id', 'key', 'chunk_size'):
+            # Строка удаляется повторной проверкой времени: загрузка могла получить часть или быть подтверждена.
+            deleted, _ = FileUpload.objects.filter(pk=upload.pk, updated_at__lt=updated_before).delete()
+            if not deleted:
+                continue
+            if upload.chunk_size:
+                delete_chunks(upload.pk)
+            elif storage.exists(upload.key):
+                storage.delete(upload.key)
+            expired += 1
+        return expired
+
+
+class RepetitionService:
+    """Очередь повторений: карточки с repetition_pending, у которых наступила repetition_date."""
+    @staticmethod
+    def mark_due(now, batch_size):
+        """Переводит в to_repeat очередную пачку наступивших карточек одним UPDATE и возвращает их.
+
+        Строки, заблокированные другим обработчиком, пропускаются.
+        """
+        from .models import Card
+        with transaction.atomic():
+            card_ids = list(Card.objects.select_for_update(skip_locked=True)
+                            .filter(repetition_pending=True, repetition_date__lte=now)
+                            .order_by('repetition_date').values_list('id', flat=True)[:batch_size])
+            if not card_ids:
+                return []
+
+            Card.objects.filter(pk__in=card_ids).update(status='to_repeat', repetition_pending=False)
+            cards = list(Card.objects.filter(pk__in=card_ids).select_related('module__plan'))
+            BoardChangeService.record([
+                (card.module.plan_id, 'update', 'card', card.pk, BoardChangeService.get_card_data(card, with_labels=False))
+                for card in cards if card.module_id is not None
+            ])
+        return cards
+
+    @staticmethod
+    def schedule(cards, now=None, reschedule_pending=False):
+        """Пересчитывает repetition_date карточек queryset по SM-2 одним проходом по столбцам.
+
+        Карточки, уже ожидающие повторения (repetition_pending), по умолчанию не затрагиваются: их состояние SM-2
+        уже включает шаг до этого повторения, и новый шаг засчитал бы повторение, которого не было. С
+        reschedule_pending дата таких карточек отсчитывается заново от now по их текущему интервалу. Клиенты
+        досок получают отметку о полной перезагрузке.
+
+        Возвращает {'scheduled': запланировано, 'rescheduled': перенесено ожидающих, 'pending': оставлено ожидающих}.
+        """
+        from .models import Card
+        now = now or timezone.now()
+        with transaction.atomic():
+            rows = list(cards.select_for_update(of=('self',)).filter(
+                status__in=SCHEDULED_STATUSES, module__isnull=False,
+            ).values_list('id', 'module__plan_id', 'repetition_pending', 'status', 'difficulty', 'plan_time',
+                          'result_time', 'repetition_count', 'repetition_interval', 'ease_factor'))
+            # Интервал 0 - дата повторения задана вручную, а не по SM-2: ее отсчитывать не от чего.
+            pending = [row for row in rows if row[2] and row[8]]
+            rows = [row for row in rows if not row[2]]
+            result = {'scheduled': len(rows), 'rescheduled': 0, 'pending': len(pending)}
+            if reschedule_pending:
+                result['rescheduled'], result['pending'] = len(pending), 0
+            else:
+                pending = []
+            if not rows and not pending:
+                return result
+
+            # Результат SM-2 принимает немного различных значений: один UPDATE на каждое вместо CASE по всем строкам.
+            groups = {}
+            if rows:
+                ids, _, _, statuses, difficulties, plan_times, result_times, counts, intervals, ease_factors = \
+                    zip(*rows)
+                qualities = get_qualities(statuses, difficulties, plan_times, result_times)
+                counts, intervals, ease_factors, dates = schedule(now, qualities, counts, intervals, ease_factors)
+                for card_id, *values in zip(ids, counts, intervals, ease_factors, dates):
+                    groups.setdefault(tuple(values), []).append(card_id)
+            for (count, interval, ease_factor, date), card_ids in groups.items():
+                Card.objects.filter(pk__in=card_ids).update(
+                    repetition_count=count, repetition_interval=interval, ease_factor=ease_factor,
+                    repetition_date=date, repetition_pending=True)
+
+            pending_groups = {}
+            for card_id, *_, interval, _ in pending:
+                pending_groups.setdefault(interval, []).append(card_id)
+            for interval, card_ids in pending_groups.items():
+                Card.objects.filter(pk__in=card_ids).update(repetition_date=now + timedelta(days=interval))
+
+            plan_ids = {row[1] for row in rows + pending}
+            BoardChangeService.record([(plan_id, 'truncate', '', None, {}) for plan_id in plan_ids])
+        return result
+
+
+class PlanRevisionService:
+    """Увеличение ревизии образовательного плана при изменении доски."""
+    @staticmethod
+    def get_revisions(plan_ids, profile):
+        from .models import EducationPlan
+        return sorted(EducationPlan.objects.filter(
+            Q(**{f'{profile.role}': profile}), id__in=plan_ids
+        ).values_list('id', 'revision'))
+
+    @staticmethod
+    def get_total_revision(profile):
+        """Сумма ревизий всех планов профиля: меняется при любом изменении карточек в этих планах."""
+        from .models import EducationPlan
+        return EducationPlan.objects.filter(
+            Q(**{f'{profile.role}': profile})
+        ).aggregate(total=Sum('revision'))['total'] or 0
+
+    @staticmethod
+    def bump_for_cards(card_ids):
+        from .models import EducationPlan
+        card_ids = set(card_ids)
+        if card_ids:
+            EducationPlan.objects.filter(modules__cards__id__in=card_ids).update(revision=F('revision') + 1)
+
+
+class BoardCloneService:
+    """Глубокое копирование модулей (и через них планов) пакетными вставками с новыми id, назначенными в памяти.
+
+    Разделы содержимого остаются общими с исходными карточками до первого изменения (CardService.get_own_section).
+    """
+    BATCH_SIZE = 1000
+    # Копируется учебная программа, а не прогресс студента: статус, даты и расписание повторений сбрасываются.
+    # Поисковый документ переносится как есть: метки и разделы у копии те же.
+    CARD_FIELDS = ('title', 'description', 'plan_time', 'difficulty', 'search_vector')
+
+    @staticmethod
+    def count_cards(module_ids):
+        from .models import Module
+        return Module.objects.filter(pk__in=module_ids).aggregate(total=Sum('cards_count'))['total'] or 0
+
+    @staticmethod
+    def clone_modules(module_ids, plan_id, progress=None):
+        """Копирует модули module_ids с карточками, содержимым и метками в конец плана plan_id.
+
+        progress(скопировано карточек, всего карточек) вызывается после каждой пачки. Возвращает id новых модулей.
+        """
+        from .models import EducationPlan, Module, Card, CardContent, SectionContent, next_child_index
+        ranked = rank_ordering_enabled()
+        ordering = 'rank' if ranked else 'index'
+        with transaction.atomic():
+            sources = list(Module.objects.filter(pk__in=module_ids).order_by('plan_id', ordering)
+                           .values_list('id', 'title'))
+            cards = list(Card.objects.filter(module_id__in=module_ids).order_by(ordering)
+                         .values('id', 'module_id', *BoardCloneService.CARD_FIELDS))
+            contents = list(CardContent.objects.filter(card__module_id__in=module_ids)
+                            .values_list('card_id', *CardService.SECTION_TYPES))
+            label_links = list(Card.labels.through.objects.filter(card__module_id__in=module_ids)
+                               .values_list('card_id', 'label_id'))
+            section_ids = {section_id for content in contents for section_id in content[1:] if section_id}
+            list(SectionContent.objects.filter(pk__in=section_ids).order_by('id').select_for_update()
+                 .values_list('id', flat=True))
+
+            plan = EducationPlan.objects.filter(pk=plan_id)
+            plan.update(version=F('version') + 1,
+                        modules_count=Greatest(F('modules_count'), next_child_index(Module.objects, 'plan_id'))
+                        + len(sources))
+            first_index = plan.values_list('modules_count', flat=True).get() - len(sources)
+            last_rank = ranked and Module.objects.filter(plan_id=plan_id).aggregate(last=Max('rank'))['last'] or None
+
+            cards_by_module = {}
+            for card in cards:
+                cards_by_module.setdefault(card['module_id'], []).append(card)
+            new_ids = {}
+            modules = []
+            for position, (module_id, title) in enumerate(sources):
+                new_ids[module_id] = uuid.uuid4()
+                last_rank = rank_between(last_rank, None) if ranked else ''
+                modules.append(Module(id=new_ids[module_id], title=title, plan_id=plan_id,
+                                      index=None if ranked else first_index + position, rank=last_rank,
+                                      cards_count=len(cards_by_module.get(module_id, []))))
+            Module.objects.bulk_create(modules, batch_size=BoardCloneService.BATCH_SIZE)
+
+            new_cards = []
+            for module_id, module_cards in cards_by_module.items():
+                ranks = initial_ranks(len(module_cards)) if ranked else [''] * len(module_cards)
+                for (index, card), rank in zip(enumerate(module_cards), ranks):
+                    new_ids[card['id']] = uuid.uuid4()
+                    new_cards.append(Card(id=new_ids[card['id']], module_id=new_ids[module_id],
+                                          index=None if ranked else index, rank=rank,
+                                          **{field: card[field] for field in BoardCloneService.CARD_FIELDS}))
+            for start in range(0, len(new_cards), BoardCloneService.BATCH_SIZE):
+                Card.objects.bulk_create(new_cards[start:start + BoardCloneService.BATCH_SIZE])
+                if progress:
+                    progress(min(start + BoardCloneService.BATCH_SIZE, len(new_cards)), len(new_cards))
+
+            CardContent.objects.bulk_create(
+                (CardContent(card_id=new_ids[card_id], **{f'{section_type}_id': section_id for section_type, section_id
+                                                          in zip(CardService.SECTION_TYPES, sections)})
+                 for card_id, *sections in contents),
+                batch_size=BoardCloneService.BATCH_SIZE)
+            Card.labels.through.objects.bulk_create(
+                (Card.labels.through(card_id=new_ids[card_id], label_id=label_id) for card_id, label_id in label_links),
+                batch_size=BoardCloneService.BATCH_SIZE)
+
+            # Клиенты доски получают отметку о полной перезагрузке вместо записи на каждую карточку.
+            BoardChangeService.record([(plan_id, 'truncate', '', None, {})])
+        return [module.id for module in modules]
+
+
+class SearchService:
+    """Полнотекстовый поиск карточек по поисковому документу Card.search_vector (GIN-индекс card_search).
+
+    Документ собирается в БД из названия и описания (вес A и B), названий меток и имен файлов (B)
+    и текста разделов (C) и пересчитывается сигналами при изменении любого из источников.
+    """
+    @staticmethod
+    def _joined(queryset, field):
+        return Func(ArraySubquery(queryset.values(field)), Value(' '), function='ARRAY_TO_STRING',
+                    output_field=TextField())
+
+    @staticmethod
+    def get_vector():
+        # Каждый подзапрос идет от карточки по индексам (без OR между связями), чтобы пересчет
+        # документа стоил несколько поисков по ключу, а не просмотр всех разделов.
+        from .models import Label, File, CardContent
+        config = settings.SEARCH_CONFIG
+        card = OuterRef('pk')
+        files = [SearchService._joined(File.objects.filter(**{f'section_contents__{section_type}__card': card}), 'name')
+                 for section_type in CardService.SECTION_TYPES]
+        texts = [Subquery(CardContent.objects.filter(card_id=card).values(f'{section_type}__text')[:1])
+                 for section_type in CardService.SECTION_TYPES]
+        return (SearchVector('title', weight='A', config=config)
+                + SearchVector('description', SearchService._joined(Label.objects.filter(cards=card), 'title'),
+                               *files, weight='B', config=config)
+                + SearchVector(*texts, weight='C', config=config))
+
+    @staticmethod
+    def get_card_ids(model, pks):
+        """Запрос id карточек, в поисковый документ которых входят объекты model с указанными pk."""
+        from .models import Card, Label, File, SectionContent, CardContent
+        if model is Card:
+            return Card.objects.filter(pk__in=pks).values_list('pk', flat=True)
+        if model is Label:
+            return Card.labels.through.objects.filter(label_id__in=pks).values_list('card_id', flat=True)
+        if model is File:
+            pks = SectionContent.files.through.objects.filter(file_id__in=pks).values_list('sectioncontent_id',
+                                                                                           flat=True)
+        elif model is not SectionContent:
+            raise ValueError(f'{model.__name__} не входит в поисковый документ карточки.')
+        return CardContent.objects.filter(Q(homework__in=pks) | Q(lesson__in=pks) |
+                                          Q(repetition__in=pks)).values_list('card_id', flat=True)
+
+    @staticmethod
+    def update_cards(card_ids):
+        """Пересчитывает поисковые документы карточек одним UPDATE (card_ids - список или подзапрос)."""
+        from .models import Card
+        return Card.objects.filter(pk__in=card_ids).update(search_vector=SearchService.get_vector())
+
+    @staticmethod
+    def search(profile, query):
+        """Карточки планов пользователя (и шаблоны преподавателя) по запросу в синтаксисе websearch,
+        по убыванию релевантности."""
+        from .models import Card, Module
+        search_query = SearchQuery(query, search_type='websearch', config=settings.SEARCH_CONFIG)
+        # Модули плана берутся подзапросом, а не соединением: план запроса не зависит от оценок
+        # числа строк модулей и планов, а план карточки вычисляется только для строк страницы.
+        if profile.role == 'tutor':
+            scope = Q(module__in=Module.objects.filter(plan__tutor=profile)) | Q(owner=profile)
+        else:
+            scope = Q(module__in=Module.objects.filter(plan__student=profile))
+        return Card.objects.filter(scope, search_vector=search_query).annotate(
+            relevance=SearchRank(F('search_vector'), search_query),
+            plan_id=Subquery(Module.objects.filter(pk=OuterRef('module_id')).values('plan_id')),
+        ).order_by('-relevance', 'id')
+
+
+class BoardService:
+    """Получение доски (модули, карточки, метки) плана с кэшированием по ревизии."""
+    @staticmethod
+    def get_plan_revision(plan_id, profile):
+        """Ревизия плана пользователя или None (в том числе для id не в формате UUID из адреса запроса)."""
+        from .models import EducationPlan
+        try:
+            plan_id = uuid.UUID(str(plan_id))
+        except ValueError:
+            return None
+        return EducationPlan.objects.filter(
+            Q(**{f'{profile.role}': profile}), pk=plan_id
+        ).values_list('revision', flat=True).first()
+
+    @staticmethod
+    def render_board(plan_id):
+        from .models import EducationPlan
+        from .serializers import BoardReadSerializer
+        plan = EducationPlan.objects.get(pk=plan_id)
+        return JSONRenderer().render(BoardReadSerializer().plans([plan])[0])
+
+    @staticmethod
+    def get_rendered_board(plan_id, revision):
+        from .cache import BoardCache
+        return BoardCache().get_or_build(plan_id, revision, lambda: BoardService.render_board(plan_id))
+
+
+class BoardChangeService:
+    """Журнал изменений доски: каждая запись увеличивает ревизию плана и сохраняется с ее новым значением."""
+    @staticmethod
+    def get_card_data(card, with_labels=True):
+        from .serializers import CardChangeSerializer, LabelSerializer
+        data = CardChangeSerializer(card).data
+        if with_labels:
+            data['labels'] = LabelSerializer(card.labels.all(), many=True).data
+        return data
+
+    @staticmethod
+    def get_module_data(module):
+        from .serializers import ModuleChangeSerializer
+        return ModuleChangeSerializer(module).data
+
+    @staticmethod
+    def record(changes):
+        """Запись изменений вида (plan_id, op, object_type, object_id, data), по одной ревизии на план.
+
+        Число запросов не зависит от количества планов.
+        """
+        from .models import EducationPlan, BoardChange
+        changes_by_plan = {}
+        for plan_id, op, object_type, object_id, data in changes:
+            if plan_id is not None:
+                changes_by_plan.setdefault(str(plan_id), []).append((op, object_type, object_id, data))
+        if not changes_by_plan:
+            return
+
+        with transaction.atomic():
+            plans = EducationPlan.objects.filter(pk__in=changes_by_plan)
+            if len(changes_by_plan) > 1:
+                list(plans.order_by('id').select_for_update().values_list('id', flat=True))
+            plans.update(revision=F('revision') + 1)
+            entries = [
+                BoardChange(plan_id=plan_id, revision=revision, op=op, object_type=object_type,
+                            object_id=object_id, data=data or {})
+                for plan_id, revision in plans.values_list('id', 'revision')
+                for op, object_type, object_id, data in changes_by_plan[str(plan_id)]
+            ]
+            BoardChange.objects.bulk_create(entries)
+
+    @staticmethod
+    def get_changes(plan_id, since):
+        """Изменения после ревизии since или None, если журнал уже обрезан и нужна полная перезагрузка доски."""
+        from .models import BoardChange
+        changes = list(BoardChange.objects.filter(plan_id=plan_id, revision__gt=since))
+        if any(change.op == 'truncate' for change in changes):
+            return None
+        return BoardChangeService.compact(changes)
+
+    @staticmethod
+    def compact(changes):
+        """Повторные обновления объекта схлопываются в последнее, обновления удаленных объектов отбрасываются."""
+        last_positions = {}
+        for position, change in enumerate(changes):
+            if change.op in ('update', 'delete'):
+                last_positions[(change.op, change.object_type, change.object_id)] = position
+
+        compacted = []
+        for position, change in enumerate(changes):
+            if change.op == 'update':
+                last_update = last_positions[('update', change.object_type, change.object_id)]
+                last_delete = last_positions.get(('delete', change.object_type, change.object_id), -1)
+                if position != last_update or position < last_delete:
+                    continue
+            compacted.append(change)
+        return compacted
+
+    @staticmethod
+    def truncate(created_before):
+        """Удаление старых записей журнала с сохранением отметки о последней удаленной ревизии плана."""
+        from .models import BoardChange
+        truncated = BoardChange.objects.filter(created_at__lt=created_before).values('plan_id').annotate(
+            revision=Max('revision'))
+
+        with transaction.atomic():
+            markers = [BoardChange(plan_id=row['plan_id'], revision=row['revision'], op='truncate') for row in truncated]
+            BoardChange.objects.filter(created_at__lt=created_before).delete()
+            BoardChange.objects.bulk_create(markers)
+        return len(markers)
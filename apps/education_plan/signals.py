@@ -0,0 +1,208 @@
+from django.db.models import F
+from django.db.models.signals import post_save, post_delete, pre_delete, m2m_changed
+from django.dispatch import receiver
+from apps.account.services import ProfileRevisionService
+from apps.education_plan.cache import SectionCache
+from apps.education_plan.models import EducationPlan, Module, Card, Label, CardContent, SectionContent, File, Blob
+from apps.education_plan.services import PlanRevisionService, BoardChangeService, SearchService, BlobService
+
+
+def is_deleted_with(origin, model):
+    """Удаление запущено каскадом от объекта (или queryset) указанной модели."""
+    return getattr(origin, 'model', type(origin)) is model
+
+
+@receiver([post_save, post_delete], sender=EducationPlan)
+def bump_profiles_on_plan_change(sender, instance, **kwargs):
+    ProfileRevisionService.bump_plan_members(instance)
+
+
+@receiver(post_save, sender=Module)
+def record_module_save(sender, instance, created, **kwargs):
+    op = 'create' if created else 'update'
+    BoardChangeService.record([(instance.plan_id, op, 'module', instance.pk,
+                                BoardChangeService.get_module_data(instance))])
+
+
+@receiver(post_delete, sender=Module)
+def record_module_delete(sender, instance, origin=None, **kwargs):
+    if not is_deleted_with(origin, EducationPlan):
+        BoardChangeService.record([(instance.plan_id, 'delete', 'module', instance.pk, {})])
+
+
+@receiver(post_save, sender=Card)
+def record_card_save(sender, instance, created, **kwargs):
+    if instance.module_id is None:
+        return
+    op = 'create' if created else 'update'
+    BoardChangeService.record([(instance.module.plan_id, op, 'card', instance.pk,
+                                BoardChangeService.get_card_data(instance, with_labels=False))])
+
+
+@receiver(post_delete, sender=Card)
+def record_card_delete(sender, instance, origin=None, **kwargs):
+    # Карточки, удаленные вместе с модулем или планом, клиент убирает по удалению родителя.
+    if instance.module_id is not None and is_deleted_with(origin, Card):
+        plan_id = Module.objects.filter(pk=instance.module_id).values_list('plan_id', flat=True).first()
+        BoardChangeService.record([(plan_id, 'delete', 'card', instance.pk, {})])
+
+
+@receiver(post_delete, sender=Module)
+def decrement_modules_count(sender, instance, origin=None, **kwargs):
+    if is_deleted_with(origin, Module):
+        EducationPlan.objects.filter(pk=instance.plan_id).update(modules_count=F('modules_count') - 1)
+
+
+@receiver(post_delete, sender=Card)
+def decrement_cards_count(sender, instance, origin=None, **kwargs):
+    if instance.module_id is not None and is_deleted_with(origin, Card):
+        Module.objects.filter(pk=instance.module_id).update(cards_count=F('cards_count') - 1)
+
+
+@receiver(post_save, sender=CardContent)
+def bump_revision_on_card_content_change(sender, instance, **kwargs):
+    PlanRevisionService.bump_for_cards([instance.card_id])
+
+
+@receiver(post_save, sender=Label)
+def record_label_update(sender, instance, created, **kwargs):
+    if created:
+        return
+    from apps.education_plan.serializers import LabelSerializer
+    data = LabelSerializer(instance).data
+    plan_ids = EducationPlan.objects.filter(modules__cards__labels=instance).distinct().values_list('id', flat=True)
+    BoardChangeService.record([(plan_id, 'update', 'label', instance.pk, data) for plan_id in plan_ids])
+
+
+@receiver(pre_delete, sender=Label)
+def record_label_delete(sender, instance, **kwargs):
+    # После удаления связи с карточками уже не найти, поэтому изменение записывается заранее.
+    plan_ids = EducationPlan.objects.filter(modules__cards__labels=instance).distinct().values_list('id', flat=True)
+    BoardChangeService.record([(plan_id, 'delete', 'label', instance.pk, {}) for plan_id in plan_ids])
+
+
+@receiver(m2m_changed, sender=Card.labels.through)
+def record_card_labels_change(sender, instance, action, reverse, pk_set, **kwargs):
+    from apps.education_plan.serializers import LabelSerializer
+    if action not in ('post_add', 'post_remove', 'pre_clear'):
+        return
+
+    if not reverse and instance.module_id is None:
+        return
+
+    if action == 'pre_clear':
+        lookup = {'label_id': instance.pk} if reverse else {'card_id': instance.pk}
+        pairs = list(Card.labels.through.objects.filter(**lookup).values_list('card_id', 'label_id'))
+    elif reverse:
+        pairs = [(card_id, instance.pk) for card_id in pk_set]
+    else:
+        pairs = [(instance.pk, label_id) for label_id in pk_set]
+    if not pairs:
+        return
+
+    card_plans = dict(Card.objects.filter(
+        id__in={card_id for card_id, _ in pairs}, module__isnull=False
+    ).values_list('id', 'module__plan_id'))
+
+    if action == 'post_add':
+        labels = {str(label['id']): label for label in LabelSerializer(
+            Label.objects.filter(id__in={label_id for _, label_id in pairs}), many=True).data}
+        changes = [(card_plans.get(card_id), 'label_attach', 'card', card_id, {'label': labels[str(label_id)]})
+                   for card_id, label_id in pairs]
+    else:
+        changes = [(card_plans.get(card_id), 'label_detach', 'card', card_id, {'label': label_id})
+                   for card_id, label_id in pairs]
+    BoardChangeService.record(changes)
+
+
+@receiver([post_save, post_delete], sender=SectionContent)
+def invalidate_section_on_change(sender, instance, **kwargs):
+    SectionCache().invalidate([instance.pk])
+
+
+@receiver(m2m_changed, sender=SectionContent.files.through)
+def invalidate_section_on_files_change(sender, instance, action, reverse, pk_set, **kwargs):
+    if action not in ('post_add', 'post_remove', 'pre_clear'):
+        return
+    if not reverse:
+        SectionCache().invalidate([instance.pk])
+    elif action == 'pre_clear':
+        invalidate_file_sections(sender, instance)
+    else:
+        SectionCache().invalidate(pk_set)
+
+
+@receiver(post_save, sender=File)
+@receiver(pre_delete, sender=File)
+def invalidate_file_sections(sender, instance, **kwargs):
+    # Связи удаляемого файла с разделами удаляются каскадом без m2m_changed.
+    if kwargs.get('created'):
+        return
+    SectionCache().invalidate(SectionContent.files.through.objects.filter(file_id=instance.pk)
+                              .values_list('sectioncontent_id', flat=True))
+
+
+@receiver(post_save, sender=Blob)
+def invalidate_blob_sections(sender, instance, update_fields=None, **kwargs):
+    # Превью общего содержимого входят в данные разделов всех файлов, ссылающихся на Blob.
+    if update_fields and 'previews' in update_fields:
+        SectionCache().invalidate(SectionContent.files.through.objects.filter(file__blob=instance.pk)
+                                  .values_list('sectioncontent_id', flat=True))
+
+
+# Поля, входящие в поисковый документ карточки (SearchService.get_vector).
+SEARCH_FIELDS = {Card: {'title', 'description'}, SectionContent: {'text'}, Label: {'title'}, File: {'name'}}
+
+
+@receiver(post_save, sender=Card)
+@receiver(post_save, sender=SectionContent)
+@receiver(post_save, sender=Label)
+@receiver(post_save, sender=File)
+def update_search_on_save(sender, instance, created, update_fields=None, **kwargs):
+    # Новые метки, файлы и разделы еще не связаны с карточками.
+    if created and sender is not Card:
+        return
+    if created or update_fields is None or SEARCH_FIELDS[sender] & set(update_fields):
+        SearchService.update_cards(SearchService.get_card_ids(sender, [instance.pk]))
+
+
+@receiver(post_save, sender=CardContent)
+def update_search_on_card_content_save(sender, instance, created, update_fields=None, **kwargs):
+    # Отдельное сохранение раздела (CardService.get_own_section) подставляет копию или пустой раздел.
+    if created or update_fields is None:
+        SearchService.update_cards([instance.card_id])
+
+
+@receiver(pre_delete, sender=SectionContent)
+@receiver(pre_delete, sender=Label)
+@receiver(pre_delete, sender=File)
+def remember_search_cards(sender, instance, **kwargs):
+    # Связи с карточками удаляются вместе с объектом, поэтому карточки запоминаются заранее.
+    instance._search_card_ids = list(SearchService.get_card_ids(sender, [instance.pk]))
+
+
+@receiver(post_delete, sender=SectionContent)
+@receiver(post_delete, sender=Label)
+@receiver(post_delete, sender=File)
+def update_search_on_delete(sender, instance, **kwargs):
+    if instance._search_card_ids:
+        SearchService.update_cards(instance._search_card_ids)
+
+
+@receiver(m2m_changed, sender=Card.labels.through)
+@receiver(m2m_changed, sender=SectionContent.files.through)
+def update_search_on_m2m_change(sender, instance, action, reverse, model, pk_set, **kwargs):
+    if action == 'pre_clear' and reverse:
+        instance._search_card_ids = list(SearchService.get_card_ids(type(instance), [instance.pk]))
+    elif action == 'post_clear' and reverse:
+        SearchService.update_cards(instance._search_card_ids)
+    elif action in ('post_add', 'post_remove', 'post_clear'):
+        owner_model, owner_pks = (model, pk_set) if reverse else (type(instance), [instance.pk])
+        SearchService.update_cards(SearchService.get_card_ids(owner_model, owner_pks))
+
+
+@receiver(post_delete, sender=File)
+def release_file_blob(sender, instance, **kwargs):
+    # Файлы, загруженные до появления Blob, не ссылаются на общее содержимое.
+    if instance.blob_id:
+        BlobService.release(instance.blob_id)
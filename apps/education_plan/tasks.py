@@ -1,8 +1,12 @@
+from datetime import timedelta
 from celery import shared_task
+from django.conf import settings
+from django.utils import timezone
 
 
 @shared_task
 def change_card_status_to_repeat(card_id):
+    # Оставлена для задач с ETA, поставленных до перехода на sweep_due_repetitions.
     from apps.education_plan.models import Card
     from apps.notifications.services import NotificationService
     card = Card.objects.filter(id=card_id).first()
@@ -10,3 +14,56 @@ def change_card_status_to_repeat(card_id):
         card.status = 'to_repeat'
         card.save()
         NotificationService.handle_repetition_reminder(card.module.plan, card)
+
+
+@shared_task
+def sweep_due_repetitions():
+    from apps.education_plan.services import RepetitionService
+    from apps.notifications.services import NotificationService
+    now = timezone.now()
+    swept = 0
+    while True:
+        cards = RepetitionService.mark_due(now, settings.REPETITION_SWEEP_BATCH_SIZE)
+        if not cards:
+            return swept
+        NotificationService.handle_repetition_reminders(cards)
+        swept += len(cards)
+
+
+@shared_task
+def truncate_board_changes():
+    from apps.education_plan.services import BoardChangeService
+    created_before = timezone.now() - timedelta(days=settings.BOARD_CHANGES_RETENTION_DAYS)
+    return BoardChangeService.truncate(created_before)
+
+
+@shared_task
+def expire_file_uploads():
+    from apps.education_plan.services import FileUploadService
+    updated_before = timezone.now() - timedelta(hours=settings.FILE_UPLOAD_EXPIRE_HOURS)
+    return FileUploadService.expire(updated_before)
+
+
+@shared_task
+def generate_file_previews(digest, extension):
+    from apps.education_plan.services import FilePreviewService
+    return FilePreviewService.generate(digest, extension)
+
+
+@shared_task
+def rebalance_ranks(object_type, parent_id):
+    from apps.education_plan.services import RankService
+    return RankService.rebalance_parent(object_type, parent_id)
+
+
+@shared_task(bind=True)
+def clone_modules(self, module_ids, plan_id, tutor_id=None):
+    """tutor_id сохраняется в состоянии задачи: clone_status отдает его только этому преподавателю."""
+    from apps.education_plan.services import BoardCloneService
+
+    def progress(done, total):
+        self.update_state(state='PROGRESS', meta={'plan_id': plan_id, 'tutor_id': tutor_id,
+                                                  'done': done, 'total': total})
+
+    module_ids = BoardCloneService.clone_modules(module_ids, plan_id, progress)
+    return {'plan_id': plan_id, 'tutor_id': tutor_id, 'modules': [str(module_id) for module_id in module_ids]}
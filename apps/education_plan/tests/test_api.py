@@ -1,9 +1,18 @@
+import io
+import json
+import uuid
+from unittest import mock
+from django.core.management import call_command
+from django.db import connection
+from django.test import override_settings
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
 from rest_framework import status
 from rest_framework.test import APITestCase
 from django.contrib.auth import get_user_model
 from apps.account.serializers import ProfileSerializer
-from apps.education_plan.models import Label, EducationPlan, Module, Card
+from apps.education_plan.models import Label, EducationPlan, Module, Card, File, SectionContent
+from apps.education_plan.tasks import clone_modules
 from apps.education_plan.serializers import LabelSerializer, EducationPlanForStudentSerializer, \
     EducationPlanForTutorSerializer
 
@@ -302,3 +311,650 @@ class ChangeOrderOfElementsTest(APITestCase):
         self.assertEqual(response.status_code, status.HTTP_200_OK)
         self.module2.refresh_from_db()
         self.assertEqual(self.module2.index, 1)
+
+
+class ChangeOrderOfElementsBatchTest(APITestCase):
+    def setUp(self):
+        self.user_tutor = User.objects.create_user(email='testuser@gmail.com', password='testpassword',
+                                                   role='tutor', first_name='first_name', last_name='last_name')
+        self.client.force_authenticate(user=self.user_tutor)
+        self.url = reverse('move_elements')
+
+        self.plan = EducationPlan.objects.create(tutor=self.user_tutor.userprofile, student_first_name="John",
+                                                 student_last_name="Doe")
+        self.module1 = Module.objects.create(title="Test Module1", plan=self.plan)
+        self.module2 = Module.objects.create(title="Test Module2", plan=self.plan)
+        self.module3 = Module.objects.create(title="Test Module3", plan=self.plan)
+        self.cards1 = [Card.objects.create(title=f"Test Card1{i}", module=self.module1) for i in range(3)]
+        self.cards2 = [Card.objects.create(title=f"Test Card2{i}", module=self.module2) for i in range(3)]
+
+        another_user = User.objects.create_user(email='another_user@gmail.com', password='testpassword', role='tutor')
+        another_plan = EducationPlan.objects.create(tutor=another_user.userprofile, student_first_name="Jane",
+                                                    student_last_name="Doe")
+        self.another_card = Card.objects.create(title="Another Card",
+                                                module=Module.objects.create(title="Module", plan=another_plan))
+
+    def card_move(self, card, module, index):
+        return {'element_type': 'task', 'element_id': str(card.id), 'destination_id': str(module.id),
+                'destination_index': index}
+
+    def get_order(self, module):
+        return list(module.cards.order_by('index').values_list('id', flat=True))
+
+    def test_batch_moves(self):
+        moves = [
+            self.card_move(self.cards1[2], self.module1, 0),
+            self.card_move(self.cards2[0], self.module1, 1),
+            self.card_move(self.cards1[0], self.module2, 10),
+            {'element_type': 'board', 'element_id': str(self.module3.id), 'destination_index': 0},
+        ]
+        response = self.client.post(self.url, {'moves': moves}, format='json')
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        module1_order = [self.cards1[2].id, self.cards2[0].id, self.cards1[1].id]
+        module2_order = [self.cards2[1].id, self.cards2[2].id, self.cards1[0].id]
+        self.assertEqual(self.get_order(self.module1), module1_order)
+        self.assertEqual(self.get_order(self.module2), module2_order)
+        self.assertEqual(list(self.plan.modules.order_by('index').values_list('id', flat=True)),
+                         [self.module3.id, self.module1.id, self.module2.id])
+        self.assertEqual([(module['id'], module['cards']) for module in response.data['modules']],
+                         [(self.module1.id, module1_order), (self.module2.id, module2_order)])
+        self.assertEqual([(plan['id'], plan['modules']) for plan in response.data['plans']],
+                         [(self.plan.id, [self.module3.id, self.module1.id, self.module2.id])])
+
+    def test_queries_do_not_depend_on_moves_count(self):
+        def count_queries(moves):
+            with CaptureQueriesContext(connection) as context:
+                response = self.client.post(self.url, {'moves': moves}, format='json')
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            return len(context.captured_queries)
+
+        few = count_queries([self.card_move(self.cards1[0], self.module1, 2)])
+        many = count_queries([self.card_move(card, self.module1, 0) for card in self.cards1 * 3])
+
+        self.assertEqual(few, many)
+
+    def test_foreign_card_rejects_whole_batch(self):
+        moves = [self.card_move(self.cards1[2], self.module1, 0), self.card_move(self.another_card, self.module1, 0)]
+        response = self.client.post(self.url, {'moves': moves}, format='json')
+
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+        self.assertEqual(self.get_order(self.module1), [card.id for card in self.cards1])
+
+    def test_invalid_moves(self):
+        response = self.client.post(self.url, {'moves': []}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+        response = self.client.post(self.url, {'moves': [self.card_move(self.cards1[0], self.module1, 0) | {
+            'element_id': 'abc'}]}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+class CardCreateAPITestCase(APITestCase):
+    def setUp(self):
+        self.user_tutor = User.objects.create_user(email='testuser@gmail.com', password='testpassword',
+                                                   role='tutor', first_name='first_name', last_name='last_name')
+        self.tutor = self.user_tutor.userprofile
+        self.client.force_authenticate(user=self.user_tutor)
+        self.url = reverse('card-list')
+
+        self.plan = EducationPlan.objects.create(tutor=self.tutor, student_first_name="John", student_last_name="Doe")
+        self.module = Module.objects.create(title="Test Module", plan=self.plan)
+        self.labels = [Label.objects.create(title=f'Label {i}', color='#FF0000', tutor=self.tutor) for i in range(3)]
+        self.files = [File.objects.create(file=f'uploads/file_{i}.pdf', name=f'file_{i}.pdf', extension='pdf',
+                                          tutor=self.tutor) for i in range(3)]
+
+    def create_card(self, labels, files):
+        data = {
+            'title': 'New card',
+            'module_id': str(self.module.id),
+            'labels': [str(label.id) for label in labels],
+            'content': {'homework': {'text': 'Домашнее задание', 'files': [str(file.id) for file in files]}},
+        }
+        return self.client.post(self.url, data, format='json')
+
+    def test_nested_create(self):
+        response = self.create_card(self.labels[:2], self.files[:2])
+
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(len(response.data['labels']), 2)
+        card = Card.objects.get(pk=response.data['id'])
+        self.assertEqual(card.index, 0)
+        self.assertEqual(card.content.homework.text, 'Домашнее задание')
+        self.assertEqual(card.content.homework.files.count(), 2)
+        self.assertEqual(card.content.lesson.text, '')
+        self.assertIsNotNone(card.content.repetition)
+
+    def test_create_queries_do_not_depend_on_labels_and_files(self):
+        def count_queries(labels, files):
+            with CaptureQueriesContext(connection) as context:
+                response = self.create_card(labels, files)
+            self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+            return len(context.captured_queries)
+
+        self.assertEqual(count_queries(self.labels[:1], self.files[:1]), count_queries(self.labels, self.files))
+
+    def test_unknown_label(self):
+        self.labels[0].delete()
+
+        response = self.create_card(self.labels, [])
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(self.module.cards.count(), 0)
+
+    def test_counters(self):
+        first = Card.objects.get(pk=self.create_card([], []).data['id'])
+        second = Card.objects.get(pk=self.create_card([], []).data['id'])
+        self.module.refresh_from_db()
+        self.assertEqual((first.index, second.index, self.module.cards_count), (0, 1, 2))
+
+        self.client.delete(reverse('card-detail', kwargs={'pk': first.id}))
+        self.module.refresh_from_db()
+        self.assertEqual(self.module.cards_count, 1)
+
+        another_module = Module.objects.create(title="Another Module", plan=self.plan)
+        self.plan.refresh_from_db()
+        self.assertEqual((another_module.index, self.plan.modules_count), (1, 2))
+
+        self.client.post(reverse('move_element'), {'element_type': 'task', 'element_id': second.id,
+                                                   'destination_id': another_module.id, 'destination_index': 0},
+                         format='json')
+        self.module.refresh_from_db()
+        another_module.refresh_from_db()
+        self.assertEqual((self.module.cards_count, another_module.cards_count), (0, 1))
+
+        self.client.delete(reverse('module-detail', kwargs={'pk': self.module.id}))
+        self.plan.refresh_from_db()
+        self.assertEqual(self.plan.modules_count, 1)
+
+    def test_counters_follow_rows_created_without_them(self):
+        Card.objects.bulk_create(Card(title=f"Card {index}", module=self.module, index=index) for index in range(3))
+        Module.objects.bulk_create([Module(title="Another Module", plan=self.plan, index=1)])
+
+        card = Card.objects.get(pk=self.create_card([], []).data['id'])
+        module = Module.objects.create(title="New Module", plan=self.plan)
+
+        self.assertEqual((card.index, module.index), (3, 2))
+        self.module.refresh_from_db()
+        self.assertEqual(self.module.cards_count, 4)
+
+    def test_fill_child_counters(self):
+        Card.objects.bulk_create(Card(title=f"Card {index}", module=self.module, index=index) for index in range(3))
+
+        call_command('fill_child_counters', stdout=io.StringIO())
+
+        self.plan.refresh_from_db()
+        self.module.refresh_from_db()
+        self.assertEqual((self.plan.modules_count, self.module.cards_count), (1, 3))
+
+
+class EducationPlanListAPITestCase(APITestCase):
+    def setUp(self):
+        self.url = reverse('education_plan-list')
+        self.user_tutor = User.objects.create_user(email='testuser@gmail.com', password='testpassword',
+                                                   role='tutor', first_name='first_name', last_name='last_name')
+        self.tutor = self.user_tutor.userprofile
+        self.client.force_authenticate(user=self.user_tutor)
+
+        self.plans = [
+            EducationPlan.objects.create(tutor=self.tutor, student_first_name='first_name',
+                                         student_last_name=f'last_name_{i}')
+            for i in range(3)
+        ]
+        for plan in self.plans:
+            module = Module.objects.create(title="Test Module", plan=plan)
+            for i in range(5):
+                Card.objects.create(title=f"Test Card{i}", module=module)
+
+    def test_list_returns_plans_without_modules(self):
+        response = self.client.get(self.url)
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual([plan['id'] for plan in response.data['results']], [str(plan.id) for plan in self.plans])
+        for plan in response.data['results']:
+            self.assertNotIn('modules', plan)
+
+    def test_list_is_paginated_by_cursor(self):
+        response = self.client.get(self.url, {'page_size': 2})
+
+        self.assertEqual(len(response.data['results']), 2)
+        self.assertIsNotNone(response.data['next'])
+
+        response = self.client.get(response.data['next'])
+        self.assertEqual([plan['id'] for plan in response.data['results']], [str(self.plans[2].id)])
+        self.assertIsNone(response.data['next'])
+
+    def test_list_expands_requested_plans_only(self):
+        expanded_plan = self.plans[1]
+        response = self.client.get(self.url, {'expand': str(expanded_plan.id)})
+
+        results = {plan['id']: plan for plan in response.data['results']}
+        self.assertEqual(len(results[str(expanded_plan.id)]['modules'][0]['cards']), 5)
+        self.assertNotIn('modules', results[str(self.plans[0].id)])
+
+    def test_list_query_count_does_not_depend_on_cards(self):
+        with CaptureQueriesContext(connection) as context:
+            self.client.get(self.url)
+        queries_count = len(context.captured_queries)
+
+        for plan in self.plans:
+            module = Module.objects.create(title="Another Module", plan=plan)
+            Card.objects.create(title="Another Card", module=module)
+
+        with self.assertNumQueries(queries_count):
+            self.client.get(self.url)
+
+
+@override_settings(DEFAULT_FILE_STORAGE='django.core.files.storage.FileSystemStorage')
+class CardTemplateAPITestCase(APITestCase):
+    def setUp(self):
+        self.user_tutor = User.objects.create_user(email='testuser@gmail.com', password='testpassword',
+                                                   role='tutor', first_name='first_name', last_name='last_name')
+        self.tutor = self.user_tutor.userprofile
+        self.client.force_authenticate(user=self.user_tutor)
+
+        self.plans = [EducationPlan.objects.create(tutor=self.tutor, student_first_name=f"John{i}",
+                                                   student_last_name="Doe") for i in range(6)]
+        self.modules = [Module.objects.create(title="Test Module", plan=plan) for plan in self.plans]
+        Card.objects.create(title="Existing card", module=self.modules[0])
+        labels = [Label.objects.create(title=f'Label {i}', color='#FF0000', tutor=self.tutor) for i in range(2)]
+        files = [File.objects.create(file=f'uploads/file_{i}.pdf', name=f'file_{i}.pdf', extension='pdf',
+                                     tutor=self.tutor) for i in range(2)]
+        response = self.client.post(reverse('card-list'), {
+            'title': 'Homework', 'module_id': str(self.modules[0].id), 'labels': [str(label.id) for label in labels],
+            'content': {'homework': {'text': 'Домашнее задание', 'files': [str(file.id) for file in files]}},
+        }, format='json')
+        self.card = Card.objects.get(pk=response.data['id'])
+
+    def create_template(self):
+        response = self.client.post(reverse('card-create-template', kwargs={'pk': self.card.id}))
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        return Card.objects.get(pk=response.data['id'])
+
+    def instantiate(self, template, modules):
+        return self.client.post(reverse('card-instantiate', kwargs={'pk': template.id}),
+                                {'module_ids': [str(module.id) for module in modules]}, format='json')
+
+    def assert_copied(self, card):
+        self.assertEqual(card.title, 'Homework')
+        self.assertEqual(card.labels.count(), 2)
+        self.assertEqual(card.content.homework.text, 'Домашнее задание')
+        self.assertEqual(card.content.homework.files.count(), 2)
+        self.assertEqual(card.content.homework.id, self.card.content.homework.id)
+
+    def test_create_template(self):
+        template = self.create_template()
+
+        self.assertTrue(template.is_template)
+        self.assertIsNone(template.module)
+        self.assert_copied(template)
+
+    def test_create_card_from_template(self):
+        template = self.create_template()
+
+        response = self.client.post(reverse('card-create-card-from-template', kwargs={'pk': template.id}),
+                                    {'module_id': str(self.modules[0].id)}, format='json')
+
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        card = Card.objects.get(pk=response.data['id'])
+        self.assert_copied(card)
+        self.assertEqual(card.index, 2)
+
+    def test_instantiate_into_modules(self):
+        template = self.create_template()
+
+        response = self.instantiate(template, self.modules[:3])
+
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual([card['module'] for card in response.data], [module.id for module in self.modules[:3]])
+        self.assertEqual([card['index'] for card in response.data], [2, 0, 0])
+        self.assertEqual(len(response.data[0]['labels']), 2)
+        for module in self.modules[:3]:
+            self.assert_copied(module.cards.get(title='Homework', index=module.cards.count() - 1))
+        self.assertEqual(Module.objects.get(pk=self.modules[1].pk).cards_count, 1)
+        self.assertTrue(self.plans[2].changes.filter(op='create', object_id=response.data[2]['id']).exists())
+
+    def test_instantiate_queries_do_not_depend_on_modules(self):
+        template = self.create_template()
+
+        def count_queries(modules):
+            with CaptureQueriesContext(connection) as context:
+                response = self.instantiate(template, modules)
+            self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+            return len(context.captured_queries)
+
+        self.assertEqual(count_queries(self.modules[:2]), count_queries(self.modules))
+
+    def test_instantiate_into_foreign_module(self):
+        template = self.create_template()
+        another_user = User.objects.create_user(email='another@gmail.com', password='testpassword', role='tutor')
+        plan = EducationPlan.objects.create(tutor=another_user.userprofile, student_first_name="John",
+                                            student_last_name="Doe")
+        module = Module.objects.create(title="Foreign Module", plan=plan)
+
+        response = self.instantiate(template, [self.modules[1], module])
+
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+        self.assertEqual(self.modules[1].cards.count(), 0)
+
+    def test_instantiate_requires_template(self):
+        response = self.instantiate(self.card, self.modules[:1])
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def update_section(self, card, data):
+        return self.client.patch(reverse('card_content-update-section', args=[card.id, 'homework']), data,
+                                 format='json')
+
+    def test_first_edit_forks_shared_section(self):
+        template = self.create_template()
+        response = self.instantiate(template, self.modules[1:3])
+        first, second = (Card.objects.get(pk=card['id']) for card in response.data)
+        shared_id = template.content.homework_id
+
+        response = self.update_section(first, {'text': 'Изменено'})
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        first.content.refresh_from_db()
+        self.assertNotEqual(first.content.homework_id, shared_id)
+        self.assertEqual(first.content.homework.text, 'Изменено')
+        self.assertEqual(first.content.homework.files.count(), 2)
+        self.assertEqual(SectionContent.objects.get(pk=shared_id).text, 'Домашнее задание')
+        self.assertEqual(second.content.homework_id, shared_id)
+
+        forked_id = first.content.homework_id
+        self.update_section(first, {'text': 'Еще раз'})
+        first.content.refresh_from_db()
+        self.assertEqual(first.content.homework_id, forked_id)
+
+    def test_deleting_template_keeps_shared_sections(self):
+        template = self.create_template()
+        card_id = self.instantiate(template, self.modules[1:2]).data[0]['id']
+
+        template.delete()
+        self.card.delete()
+
+        response = self.client.get(reverse('card_content-detail', args=[card_id]))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['homework']['text'], 'Домашнее задание')
+        self.assertEqual(len(response.data['homework']['files']), 2)
+
+    def test_templates_are_paginated_by_title(self):
+        for title in ['Fractions', 'Algebra', 'Division']:
+            Card.objects.create(title=title, is_template=True, owner=self.tutor)
+        template = self.create_template()
+
+        response = self.client.get(reverse('card-templates'), {'page_size': 2})
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual([card['title'] for card in response.data['results']], ['Algebra', 'Division'])
+        response = self.client.get(response.data['next'])
+        self.assertEqual([card['title'] for card in response.data['results']], ['Fractions', 'Homework'])
+        self.assertEqual(response.data['results'][1]['id'], str(template.id))
+        self.assertEqual(len(response.data['results'][1]['labels']), 2)
+        self.assertIsNone(response.data['next'])
+
+    def test_templates_filters(self):
+        template = self.create_template()
+        Card.objects.create(title='Fractions', is_template=True, owner=self.tutor)
+        url = reverse('card-templates')
+
+        response = self.client.get(url, {'title': 'fr'})
+        self.assertEqual([card['title'] for card in response.data['results']], ['Fractions'])
+
+        response = self.client.get(url, {'label': [str(label.id) for label in template.labels.all()]})
+        self.assertEqual([card['id'] for card in response.data['results']], [str(template.id)])
+
+        response = self.client.get(url, {'label': 'invalid'})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_templates_queries_do_not_depend_on_count(self):
+        def count_queries():
+            with CaptureQueriesContext(connection) as context:
+                response = self.client.get(reverse('card-templates'))
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            return len(context.captured_queries)
+
+        self.create_template()
+        queries = count_queries()
+        for _ in range(5):
+            self.create_template()
+        self.assertEqual(count_queries(), queries)
+
+    def test_legacy_templates_get_owners(self):
+        template = self.create_template()
+        template.labels.clear()
+        Card.objects.filter(pk=template.pk).update(owner=None)
+        Card.objects.create(title='Algebra', is_template=True)
+        self.assertEqual(self.client.get(reverse('card-templates')).data['results'], [])
+
+        output = io.StringIO()
+        call_command('assign_template_owners', stdout=output)
+
+        self.assertIn('Без владельца осталось шаблонов: 1', output.getvalue())
+        response = self.client.get(reverse('card-templates'))
+        self.assertEqual([card['id'] for card in response.data['results']], [str(template.id)])
+
+        call_command('assign_template_owners', default_owner=str(self.tutor.pk), stdout=io.StringIO())
+
+        response = self.client.get(reverse('card-templates'))
+        self.assertEqual([card['title'] for card in response.data['results']], ['Algebra', 'Homework'])
+
+    def test_foreign_templates_are_hidden(self):
+        template = self.create_template()
+        another_user = User.objects.create_user(email='another@gmail.com', password='testpassword', role='tutor')
+        self.client.force_authenticate(user=another_user)
+
+        response = self.client.get(reverse('card-templates'))
+        self.assertEqual(response.data['results'], [])
+
+        response = self.client.post(reverse('card-create-card-from-template', kwargs={'pk': template.id}),
+                                    {'module_id': str(self.modules[0].id)}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+
+class CloneAPITestCase(APITestCase):
+    def setUp(self):
+        self.user_tutor = User.objects.create_user(email='testuser@gmail.com', password='testpassword',
+                                                   role='tutor', first_name='first_name', last_name='last_name')
+        self.tutor = self.user_tutor.userprofile
+        self.client.force_authenticate(user=self.user_tutor)
+
+        self.plan = EducationPlan.objects.create(tutor=self.tutor, student_first_name="John", student_last_name="Doe",
+                                                 discipline='Математика')
+        self.target = EducationPlan.objects.create(tutor=self.tutor, student_first_name="Jane",
+                                                   student_last_name="Doe")
+        Module.objects.create(title="Existing", plan=self.target)
+        self.label = Label.objects.create(title='Label', color='#FF0000', tutor=self.tutor)
+        self.modules = [Module.objects.create(title=f"Module {i}", plan=self.plan) for i in range(2)]
+        self.add_cards(self.modules[0], 3)
+
+    def add_cards(self, module, count):
+        for i in range(count):
+            response = self.client.post(reverse('card-list'), {
+                'title': f'Card {i}', 'module_id': str(module.id), 'labels': [str(self.label.id)],
+                'content': {'homework': {'text': f'Задание {i}'}},
+            }, format='json')
+            Card.objects.filter(pk=response.data['id']).update(status='done')
+
+    def clone_plan(self, email='new_student@gmail.com'):
+        return self.client.post(reverse('education_plan-clone', kwargs={'pk': self.plan.id}), {
+            'discipline': 'Математика', 'student_first_name': 'New', 'student_last_name': 'Student', 'email': email,
+        }, format='json')
+
+    def test_clone_plan(self):
+        response = self.clone_plan()
+
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        plan = EducationPlan.objects.get(pk=response.data['id'])
+        self.assertEqual((plan.student_first_name, plan.modules_count), ('New', 2))
+        modules = list(plan.modules.order_by('index'))
+        self.assertEqual([(module.title, module.index, module.cards_count) for module in modules],
+                         [('Module 0', 0, 3), ('Module 1', 1, 0)])
+        cards = list(modules[0].cards.order_by('index'))
+        self.assertEqual([(card.title, card.index, card.status) for card in cards],
+                         [('Card 0', 0, 'not_started'), ('Card 1', 1, 'not_started'), ('Card 2', 2, 'not_started')])
+        source = Card.objects.get(module=self.modules[0], title='Card 1')
+        self.assertEqual(cards[1].content.homework_id, source.content.homework_id)
+        self.assertEqual(list(cards[1].labels.all()), [self.label])
+
+    def test_clone_queries_do_not_depend_on_cards(self):
+        def count_queries(email):
+            with CaptureQueriesContext(connection) as context:
+                self.assertEqual(self.clone_plan(email).status_code, status.HTTP_201_CREATED)
+            return len(context.captured_queries)
+
+        queries = count_queries('first@gmail.com')
+        self.add_cards(self.modules[1], 20)
+
+        self.assertEqual(count_queries('second@gmail.com'), queries)
+
+    def test_clone_module_into_plan(self):
+        revision = EducationPlan.objects.get(pk=self.target.pk).revision
+
+        response = self.client.post(reverse('module-clone', kwargs={'pk': self.modules[0].id}),
+                                    {'plan_id': str(self.target.id)}, format='json')
+
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        module = Module.objects.get(pk=response.data['modules'][0])
+        self.assertEqual((module.plan_id, module.index, module.cards.count()), (self.target.id, 1, 3))
+        self.assertEqual(EducationPlan.objects.get(pk=self.target.pk).modules_count, 2)
+        changes = self.client.get(reverse('education_plan-changes', kwargs={'pk': self.target.id}),
+                                  {'since': revision})
+        self.assertEqual(changes.status_code, status.HTTP_410_GONE)
+
+    def test_clone_module_into_foreign_plan(self):
+        another_user = User.objects.create_user(email='another@gmail.com', password='testpassword', role='tutor')
+        plan = EducationPlan.objects.create(tutor=another_user.userprofile, student_first_name="John",
+                                            student_last_name="Doe")
+
+        response = self.client.post(reverse('module-clone', kwargs={'pk': self.modules[0].id}),
+                                    {'plan_id': str(plan.id)}, format='json')
+
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+        self.assertEqual(plan.modules.count(), 0)
+
+    def test_clone_module_without_valid_plan_id(self):
+        url = reverse('module-clone', kwargs={'pk': self.modules[0].id})
+        for data in ({}, {'plan_id': 'not-a-uuid'}):
+            response = self.client.post(url, data, format='json')
+
+            self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+            self.assertIn('plan_id', response.data)
+
+    @override_settings(BOARD_CLONE_ASYNC_CARDS=2)
+    def test_large_plan_is_cloned_by_task(self):
+        with mock.patch('apps.education_plan.tasks.clone_modules.apply_async') as apply_async:
+            with self.captureOnCommitCallbacks(execute=True):
+                response = self.clone_plan()
+
+        self.assertEqual(response.status_code, status.HTTP_202_ACCEPTED)
+        (module_ids, plan_id, tutor_id), = apply_async.call_args.args
+        self.assertEqual(apply_async.call_args.kwargs['task_id'], response.data['task_id'])
+        self.assertEqual((plan_id, tutor_id), (response.data['id'], str(self.tutor.id)))
+
+        with mock.patch.object(clone_modules, 'update_state') as update_state:
+            result = clone_modules(module_ids, plan_id, tutor_id)
+
+        update_state.assert_called_with(state='PROGRESS', meta={'plan_id': plan_id, 'tutor_id': tutor_id,
+                                                                'done': 3, 'total': 3})
+        self.assertEqual(len(result['modules']), 2)
+        self.assertEqual(Card.objects.filter(module__plan_id=plan_id).count(), 3)
+
+    def test_clone_status(self):
+        with mock.patch('apps.education_plan.views.AsyncResult') as async_result:
+            async_result.return_value.state = 'PROGRESS'
+            async_result.return_value.info = {'plan_id': str(self.plan.id), 'tutor_id': str(self.tutor.id),
+                                              'done': 1000, 'total': 3000}
+
+            response = self.client.get(reverse('clone_status', kwargs={'task_id': uuid.uuid4()}))
+
+        self.assertEqual(response.data, {'state': 'PROGRESS', 'plan_id': str(self.plan.id), 'done': 1000,
+                                         'total': 3000})
+
+    def test_clone_status_of_another_tutor(self):
+        another_user = User.objects.create_user(email='another@gmail.com', password='testpassword', role='tutor')
+        self.client.force_authenticate(user=another_user)
+        with mock.patch('apps.education_plan.views.AsyncResult') as async_result:
+            async_result.return_value.state = 'SUCCESS'
+            async_result.return_value.info = {'plan_id': str(self.plan.id), 'tutor_id': str(self.tutor.id),
+                                              'modules': [str(self.modules[0].id)]}
+
+            response = self.client.get(reverse('clone_status', kwargs={'task_id': uuid.uuid4()}))
+
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+
+@override_settings(DEFAULT_FILE_STORAGE='django.core.files.storage.FileSystemStorage')
+class CardContentListAPITestCase(APITestCase):
+    def setUp(self):
+        self.user_tutor = User.objects.create_user(email='testuser@gmail.com', password='testpassword',
+                                                   role='tutor', first_name='first_name', last_name='last_name')
+        self.tutor = self.user_tutor.userprofile
+        self.client.force_authenticate(user=self.user_tutor)
+
+        self.plan = EducationPlan.objects.create(tutor=self.tutor, student_first_name="John", student_last_name="Doe")
+        self.user_student = User.objects.create_user(email='student@gmail.com', password='testpassword',
+                                                     role='student', invite_code=self.plan.invite_code)
+        self.plan.student = self.user_student.userprofile
+        self.plan.save()
+        self.module = Module.objects.create(title="Test Module", plan=self.plan)
+        self.file = File.objects.create(file='uploads/file.pdf', name='file.pdf', extension='pdf', tutor=self.tutor)
+        self.cards = [self.add_card(i) for i in range(3)]
+
+    def add_card(self, i):
+        response = self.client.post(reverse('card-list'), {
+            'title': f'Card {i}', 'module_id': str(self.module.id), 'labels': [],
+            'content': {'homework': {'text': f'Задание {i}', 'files': [str(self.file.id)]}},
+        }, format='json')
+        return response.data['id']
+
+    def get_contents(self, params):
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get(reverse('card_content-list'), params)
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            data = json.loads(b''.join(response.streaming_content))
+        return data, len(context.captured_queries)
+
+    def test_module_contents(self):
+        data, _ = self.get_contents({'module_id': str(self.module.id)})
+
+        self.assertEqual([content['card_title'] for content in data], ['Card 0', 'Card 1', 'Card 2'])
+        self.assertEqual(data[1]['homework']['text'], 'Задание 1')
+        self.assertEqual(data[1]['homework']['files'][0]['id'], str(self.file.id))
+        self.assertEqual((data[0]['lesson']['text'], data[0]['lesson']['files']), ('', []))
+        retrieved = self.client.get(reverse('card_content-detail', args=[self.cards[1]]))
+        self.assertEqual(data[1], json.loads(retrieved.content))
+
+    def test_card_ids(self):
+        data, _ = self.get_contents({'card_ids': f'{self.cards[2]},{self.cards[0]}'})
+
+        self.assertEqual([content['card'] for content in data], [self.cards[0], self.cards[2]])
+
+    def test_queries_do_not_depend_on_cards(self):
+        _, queries = self.get_contents({'module_id': str(self.module.id)})
+        for i in range(3, 10):
+            self.add_card(i)
+
+        data, more_queries = self.get_contents({'module_id': str(self.module.id)})
+
+        self.assertEqual(len(data), 10)
+        self.assertEqual(more_queries, queries)
+
+    def test_student_scope(self):
+        another_plan = EducationPlan.objects.create(tutor=self.tutor, student_first_name="Jane",
+                                                    student_last_name="Doe")
+        another_user = User.objects.create_user(email='another@gmail.com', password='testpassword', role='student',
+                                                invite_code=another_plan.invite_code)
+        self.client.force_authenticate(user=another_user)
+        data, _ = self.get_contents({'module_id': str(self.module.id)})
+        self.assertEqual(data, [])
+
+        self.client.force_authenticate(user=self.user_student)
+        data, _ = self.get_contents({'module_id': str(self.module.id)})
+        self.assertEqual(len(data), 3)
+
+    def test_invalid_params(self):
+        url = reverse('card_content-list')
+        for params in [{}, {'module_id': 'invalid'}, {'module_id': str(self.module.id), 'card_ids': self.cards[0]}]:
+            self.assertEqual(self.client.get(url, params).status_code, status.HTTP_400_BAD_REQUEST)
@@ -0,0 +1,152 @@
+import os
+import shutil
+import tempfile
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test import override_settings, tag
+from rest_framework.test import APITestCase
+import celery_app
+from apps.education_plan.benchmarks.runner import run_benchmark, run_move_benchmark, \
+    run_schedule_benchmark, run_search_benchmark, find_regressions, load_json, \
+    save_json, BASELINE_PATH, RESULTS_PATH
+from apps.education_plan.benchmarks.seed import BenchmarkDataset
+from apps.education_plan.models import EducationPlan, Module, Card
+from apps.education_plan.ranking import initial_ranks
+from apps.education_plan.services import SearchService
+
+User = get_user_model()
+
+MEDIA_ROOT = tempfile.mkdtemp()
+
+
+@tag('benchmark')
+@override_settings(DEFAULT_FILE_STORAGE='django.core.files.storage.FileSystemStorage', MEDIA_ROOT=MEDIA_ROOT,
+                   DIRECT_UPLOAD_BACKEND='local')
+class EndpointBenchmarkTestCase(APITestCase):
+    """Число запросов, время и размер ответа всех эндпоинтов в сравнении с benchmarks/baseline.json.
+
+    Масштаб задается BENCHMARK_SCALE, отчет печатает python manage.py benchmark_report.
+    """
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.task_always_eager = celery_app.app.conf.task_always_eager
+        celery_app.app.conf.task_always_eager = True
+
+    @classmethod
+    def tearDownClass(cls):
+        celery_app.app.conf.task_always_eager = cls.task_always_eager
+        shutil.rmtree(MEDIA_ROOT, ignore_errors=True)
+        super().tearDownClass()
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.dataset = BenchmarkDataset.from_env().seed()
+
+    def test_endpoints_against_baseline(self):
+        results = run_benchmark(self.client, self.dataset)
+        save_json(RESULTS_PATH, {**load_json(RESULTS_PATH), 'scale': self.dataset.scale, 'results': results})
+
+        for name, result in results.items():
+            self.assertLess(result['status'], 500, name)
+
+        baseline = load_json(BASELINE_PATH).get(self.dataset.scale, {})
+        self.assertEqual(find_regressions(results, baseline), [])
+
+
+@tag('benchmark')
+class MoveBenchmarkTestCase(APITestCase):
+    """Перемещения карточек в модуле с MOVE_BENCHMARK_CARDS карточками (по умолчанию 10000) в режимах index и rank."""
+    MOVES = 20
+
+    @classmethod
+    def setUpTestData(cls):
+        user = User.objects.create_user(email='benchmark_tutor@gmail.com', password='testpassword', role='tutor',
+                                        first_name='first_name', last_name='last_name')
+        plan = EducationPlan.objects.create(tutor=user.userprofile, student_first_name='first_name',
+                                            student_last_name='last_name')
+        cls.module = Module.objects.create(title='Module', plan=plan, index=0, rank=initial_ranks(1)[0])
+        count = int(os.environ.get('MOVE_BENCHMARK_CARDS', 10000))
+        Card.objects.bulk_create(
+            (Card(title=f'Card {index}', module=cls.module, index=index, rank=rank)
+             for index, rank in enumerate(initial_ranks(count))),
+            batch_size=BenchmarkDataset.BATCH_SIZE)
+
+    def test_moves_in_large_module(self):
+        results = {ordering: run_move_benchmark(self.module, self.MOVES, ordering) for ordering in ('index', 'rank')}
+        save_json(RESULTS_PATH, {**load_json(RESULTS_PATH), 'moves': results})
+
+        self.assertEqual(results['rank']['rows_per_move'], 1)
+        self.assertGreater(results['index']['rows_per_move'], results['rank']['rows_per_move'])
+
+
+@tag('benchmark')
+class ScheduleBenchmarkTestCase(APITestCase):
+    """Пересчет расписания повторений плана с SCHEDULE_BENCHMARK_CARDS пройденными карточками (по умолчанию 5000)."""
+    MODULES = 20
+
+    @classmethod
+    def setUpTestData(cls):
+        user = User.objects.create_user(email='benchmark_tutor@gmail.com', password='testpassword', role='tutor',
+                                        first_name='first_name', last_name='last_name')
+        cls.plan = EducationPlan.objects.create(tutor=user.userprofile, student_first_name='first_name',
+                                                student_last_name='last_name')
+        modules = Module.objects.bulk_create(Module(title=f'Module {index}', plan=cls.plan, index=index)
+                                             for index in range(cls.MODULES))
+        count = int(os.environ.get('SCHEDULE_BENCHMARK_CARDS', 5000))
+        difficulties = [choice for choice, _ in Card.DIFFICULTY_CHOICES]
+        Card.objects.bulk_create(
+            (Card(title=f'Card {index}', module=modules[index % cls.MODULES], index=index // cls.MODULES,
+                  status='done', difficulty=difficulties[index % len(difficulties)]) for index in range(count)),
+            batch_size=BenchmarkDataset.BATCH_SIZE)
+
+    def test_schedule_large_plan(self):
+        result = run_schedule_benchmark(self.plan)
+        save_json(RESULTS_PATH, {**load_json(RESULTS_PATH), 'schedule': result})
+
+        self.assertEqual(result['cards'], Card.objects.filter(module__plan=self.plan).count())
+
+
+@tag('benchmark')
+class SearchBenchmarkTestCase(APITestCase):
+    """Поиск преподавателя с SEARCH_BENCHMARK_CARDS карточками (по умолчанию 50000) в PLANS планах."""
+    PLANS = 10
+    MODULES = 20
+    TOPICS = ['уравнение', 'неравенство', 'логарифм', 'производная', 'интеграл', 'вектор', 'матрица', 'функция',
+              'график', 'дробь', 'степень', 'корень', 'треугольник', 'окружность', 'вероятность', 'прогрессия',
+              'синус', 'предел', 'многочлен', 'параметр']
+    KINDS = ['домашнее задание', 'разбор', 'контрольная работа', 'повторение', 'теория']
+
+    @classmethod
+    def setUpTestData(cls):
+        user = User.objects.create_user(email='benchmark_tutor@gmail.com', password='testpassword', role='tutor',
+                                        first_name='first_name', last_name='last_name')
+        cls.user = user
+        plans = EducationPlan.objects.bulk_create(
+            EducationPlan(tutor=user.userprofile, invite_code=f'SEARCH{index:02}', student_first_name='first_name',
+                          student_last_name='last_name') for index in range(cls.PLANS))
+        modules = Module.objects.bulk_create(Module(title=f'Module {index}', plan=plan, index=index)
+                                             for plan in plans for index in range(cls.MODULES))
+        cls.count = int(os.environ.get('SEARCH_BENCHMARK_CARDS', 50000))
+        cards = Card.objects.bulk_create(
+            (Card(title=f'{cls.TOPICS[index % len(cls.TOPICS)]}: {cls.KINDS[index % len(cls.KINDS)]} {index}',
+                  description=f'Задача {index} по теме {cls.TOPICS[(index * 7) % len(cls.TOPICS)]}',
+                  module=modules[index % len(modules)], index=index // len(modules))
+             for index in range(cls.count)),
+            batch_size=BenchmarkDataset.BATCH_SIZE)
+        SearchService.update_cards([card.pk for card in cards])
+        # Статистика для планировщика и перенос новых записей из очереди GIN-индекса в сам индекс,
+        # как после autovacuum на рабочей базе.
+        with connection.cursor() as cursor:
+            cursor.execute(f'ANALYZE {Card._meta.db_table}')
+            cursor.execute("SELECT gin_clean_pending_list('card_search')")
+
+    def test_search_latency(self):
+        self.client.force_authenticate(user=self.user)
+        queries = [f'{topic} {kind}' for topic in self.TOPICS for kind in self.KINDS[:2]]
+        result = {**run_search_benchmark(self.client, queries), 'cards': self.count}
+        save_json(RESULTS_PATH, {**load_json(RESULTS_PATH), 'search': result})
+
+        # Время зависит от машины и только печатается benchmark_report; проверяется число запросов к БД,
+        # которое не зависит от количества совпадений.
+        self.assertEqual(result['queries'], 3)
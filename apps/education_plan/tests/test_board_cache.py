@@ -0,0 +1,194 @@
+import json
+import threading
+import time
+from django.db import connection
+from django.test import SimpleTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.renderers import JSONRenderer
+from rest_framework.test import APITestCase
+from django.contrib.auth import get_user_model
+from apps.education_plan.cache import BoardCache, SectionCache
+from apps.education_plan.models import EducationPlan, Module, Card, Label, CardContent, File, SectionContent
+from apps.education_plan.serializers import ModulesInEducationPlanSerializer
+
+User = get_user_model()
+
+
+class BoardCacheAPITestCase(APITestCase):
+    def setUp(self):
+        self.user_tutor = User.objects.create_user(email='testuser@gmail.com', password='testpassword',
+                                                   role='tutor', first_name='first_name', last_name='last_name')
+        self.tutor = self.user_tutor.userprofile
+        self.client.force_authenticate(user=self.user_tutor)
+
+        self.plan = EducationPlan.objects.create(tutor=self.tutor, student_first_name="John", student_last_name="Doe")
+        self.module = Module.objects.create(title="Test Module", plan=self.plan)
+        self.card = Card.objects.create(title="Test Card", module=self.module)
+        self.label = Label.objects.create(title='Test Label', color='#FF0000', tutor=self.tutor)
+        self.url = reverse('education_plan-detail', kwargs={'pk': self.plan.id})
+
+    def get_revision(self):
+        return EducationPlan.objects.values_list('revision', flat=True).get(pk=self.plan.pk)
+
+    def test_retrieve_returns_serialized_board(self):
+        response = self.client.get(self.url)
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        plan = EducationPlan.objects.get(pk=self.plan.pk)
+        expected_data = json.loads(JSONRenderer().render(ModulesInEducationPlanSerializer(plan).data))
+        self.assertEqual(response.json(), expected_data)
+
+    def test_warm_read_does_not_touch_card_tables(self):
+        self.client.get(self.url)
+
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get(self.url)
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        card_queries = [query['sql'] for query in context.captured_queries
+                        if 'education_plan_card' in query['sql'] or 'education_plan_module' in query['sql']]
+        self.assertEqual(card_queries, [])
+
+    def test_card_write_invalidates_board(self):
+        self.client.get(self.url)
+        revision = self.get_revision()
+
+        self.card.title = 'Updated Card'
+        self.card.save()
+
+        self.assertGreater(self.get_revision(), revision)
+        response = self.client.get(self.url)
+        self.assertEqual(response.json()['modules'][0]['cards'][0]['title'], 'Updated Card')
+
+    def test_label_changes_bump_revision(self):
+        revision = self.get_revision()
+        self.card.labels.add(self.label)
+        self.assertGreater(self.get_revision(), revision)
+
+        revision = self.get_revision()
+        self.label.title = 'Renamed Label'
+        self.label.save()
+        self.assertGreater(self.get_revision(), revision)
+
+        response = self.client.get(self.url)
+        self.assertEqual(response.json()['modules'][0]['cards'][0]['labels'][0]['title'], 'Renamed Label')
+
+    def test_module_and_card_content_writes_bump_revision(self):
+        revision = self.get_revision()
+        Module.objects.create(title="Another Module", plan=self.plan)
+        self.assertGreater(self.get_revision(), revision)
+
+        revision = self.get_revision()
+        CardContent.objects.create(card=self.card)
+        self.assertGreater(self.get_revision(), revision)
+
+    def test_plan_save_does_not_overwrite_newer_revision(self):
+        stale_plan = EducationPlan.objects.get(pk=self.plan.pk)
+        self.card.labels.add(self.label)
+        revision = self.get_revision()
+
+        stale_plan.discipline = 'Физика'
+        stale_plan.save()
+
+        self.assertEqual(stale_plan.revision, revision + 1)
+        self.assertEqual(self.get_revision(), revision + 1)
+
+    def test_retrieve_plan_of_another_tutor(self):
+        another_user = User.objects.create_user(email='another_user@gmail.com', password='testpassword',
+                                                role='tutor')
+        self.client.force_authenticate(user=another_user)
+        response = self.client.get(self.url)
+
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+
+@override_settings(DEFAULT_FILE_STORAGE='django.core.files.storage.FileSystemStorage')
+class SectionCacheAPITestCase(APITestCase):
+    def setUp(self):
+        self.user_tutor = User.objects.create_user(email='testuser@gmail.com', password='testpassword',
+                                                   role='tutor', first_name='first_name', last_name='last_name')
+        self.tutor = self.user_tutor.userprofile
+        self.client.force_authenticate(user=self.user_tutor)
+
+        plan = EducationPlan.objects.create(tutor=self.tutor, student_first_name="John", student_last_name="Doe")
+        self.card = Card.objects.create(title="Test Card", module=Module.objects.create(title="Module", plan=plan))
+        self.files = [File.objects.create(file=f'uploads/file_{i}.pdf', name=f'file_{i}.pdf', extension='pdf',
+                                          tutor=self.tutor) for i in range(2)]
+        sections = [SectionContent.objects.create(text=f'Раздел {i}') for i in range(3)]
+        for section in sections:
+            section.files.set(self.files)
+        self.homework = sections[0]
+        CardContent.objects.create(card=self.card, homework=sections[0], lesson=sections[1], repetition=sections[2])
+        self.url = reverse('card_content-detail', args=[self.card.id])
+
+    def get_content(self):
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get(self.url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return response.data, len(context.captured_queries)
+
+    def test_retrieve_queries(self):
+        data, cold_queries = self.get_content()
+        cached_data, warm_queries = self.get_content()
+
+        self.assertEqual(cached_data, data)
+        self.assertEqual(data['card_title'], 'Test Card')
+        self.assertEqual(data['homework']['text'], 'Раздел 0')
+        self.assertEqual(len(data['repetition']['files']), 2)
+        # Содержимое с разделами и карточкой, затем файлы всех трех разделов одним запросом.
+        self.assertEqual(cold_queries, 2)
+        self.assertEqual(warm_queries, 1)
+        self.assertIsNotNone(SectionCache().get_many([self.homework.pk]).get(self.homework.pk))
+
+    def test_missing_sections(self):
+        CardContent.objects.filter(pk=self.card.pk).update(lesson=None, repetition=None)
+
+        data, _ = self.get_content()
+
+        self.assertEqual(data['homework']['text'], 'Раздел 0')
+        self.assertEqual(data['lesson'], {'text': '', 'files': []})
+
+    def test_section_update_invalidates_cache(self):
+        self.get_content()
+
+        response = self.client.patch(reverse('card_content-update-section', args=[self.card.id, 'homework']),
+                                     {'text': 'Изменено', 'files': [str(self.files[0].id)]}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+        data, _ = self.get_content()
+        self.assertEqual(data['homework']['text'], 'Изменено')
+        self.assertEqual([file['id'] for file in data['homework']['files']], [str(self.files[0].id)])
+
+    def test_file_changes_invalidate_cache(self):
+        self.get_content()
+
+        self.files[0].delete()
+        self.homework.files.clear()
+
+        data, _ = self.get_content()
+        self.assertEqual(data['homework']['files'], [])
+        self.assertEqual(len(data['lesson']['files']), 1)
+
+
+class BoardCacheSingleFlightTestCase(SimpleTestCase):
+    def test_concurrent_misses_build_once(self):
+        board_cache = BoardCache()
+        calls = []
+
+        def builder():
+            calls.append(1)
+            time.sleep(0.2)
+            return b'{"modules":[]}'
+
+        results = []
+        threads = [threading.Thread(target=lambda: results.append(board_cache.get_or_build('plan', 1, builder)))
+                   for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(results, [b'{"modules":[]}'] * 8)
@@ -0,0 +1,112 @@
+from datetime import timedelta
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.test import APITestCase
+from django.contrib.auth import get_user_model
+from apps.education_plan.models import EducationPlan, Module, Card, Label, BoardChange
+from apps.education_plan.services import BoardChangeService
+
+User = get_user_model()
+
+
+class BoardChangesAPITestCase(APITestCase):
+    def setUp(self):
+        self.user_tutor = User.objects.create_user(email='testuser@gmail.com', password='testpassword',
+                                                   role='tutor', first_name='first_name', last_name='last_name')
+        self.tutor = self.user_tutor.userprofile
+        self.client.force_authenticate(user=self.user_tutor)
+
+        self.plan = EducationPlan.objects.create(tutor=self.tutor, student_first_name="John", student_last_name="Doe")
+        self.module1 = Module.objects.create(title="Test Module1", plan=self.plan)
+        self.module2 = Module.objects.create(title="Test Module2", plan=self.plan)
+        self.card1 = Card.objects.create(title="Test Card1", module=self.module1)
+        self.card2 = Card.objects.create(title="Test Card2", module=self.module1)
+        self.label = Label.objects.create(title='Test Label', color='#FF0000', tutor=self.tutor)
+        self.url = reverse('education_plan-changes', kwargs={'pk': self.plan.id})
+
+    def get_revision(self):
+        return self.client.get(reverse('education_plan-detail', kwargs={'pk': self.plan.id})).json()['revision']
+
+    def get_changes(self, since):
+        response = self.client.get(self.url, {'since': since})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return response.data['changes']
+
+    def test_changes_since_zero_contain_creates(self):
+        changes = self.get_changes(0)
+
+        created = [(change['object_type'], str(change['object_id'])) for change in changes if change['op'] == 'create']
+        self.assertEqual(created, [('module', str(self.module1.id)), ('module', str(self.module2.id)),
+                                   ('card', str(self.card1.id)), ('card', str(self.card2.id))])
+
+    def test_repeated_updates_are_compacted(self):
+        revision = self.get_revision()
+        self.card1.title = 'First title'
+        self.card1.save()
+        self.card1.title = 'Second title'
+        self.card1.save()
+
+        changes = self.get_changes(revision)
+
+        self.assertEqual(len(changes), 1)
+        self.assertEqual(changes[0]['op'], 'update')
+        self.assertEqual(changes[0]['data']['title'], 'Second title')
+
+    def test_updates_of_deleted_card_are_dropped(self):
+        revision = self.get_revision()
+        self.card1.title = 'Updated title'
+        self.card1.save()
+        self.card1.delete()
+
+        changes = self.get_changes(revision)
+
+        self.assertEqual([change['op'] for change in changes], ['delete'])
+
+    def test_move_is_recorded_as_index_change(self):
+        revision = self.get_revision()
+        data = {
+            'element_type': 'task',
+            'element_id': self.card2.id,
+            'destination_id': self.module2.id,
+            'destination_index': 0
+        }
+        self.client.post(reverse('move_element'), data, format='json')
+
+        changes = self.get_changes(revision)
+
+        self.assertEqual(len(changes), 1)
+        self.assertEqual(changes[0]['op'], 'move')
+        self.assertEqual(changes[0]['data'], {'module': str(self.module2.id), 'index': 0,
+                                              'source_module': str(self.module1.id), 'source_index': 1})
+
+    def test_label_attach_and_detach(self):
+        revision = self.get_revision()
+        self.card1.labels.add(self.label)
+        self.card1.labels.remove(self.label)
+
+        changes = self.get_changes(revision)
+
+        self.assertEqual([change['op'] for change in changes], ['label_attach', 'label_detach'])
+        self.assertEqual(changes[0]['data']['label']['title'], 'Test Label')
+        self.assertEqual(changes[1]['data']['label'], str(self.label.id))
+
+    def test_truncated_log_requires_full_refetch(self):
+        revision = self.get_revision()
+        self.card1.title = 'Updated title'
+        self.card1.save()
+        BoardChange.objects.filter(plan=self.plan).update(created_at=timezone.now() - timedelta(days=60))
+
+        BoardChangeService.truncate(timezone.now() - timedelta(days=30))
+
+        response = self.client.get(self.url, {'since': revision})
+        self.assertEqual(response.status_code, status.HTTP_410_GONE)
+        self.assertTrue(response.data['full_refetch'])
+
+        response = self.client.get(self.url, {'since': self.get_revision()})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['changes'], [])
+
+    def test_invalid_since(self):
+        response = self.client.get(self.url, {'since': 'abc'})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
@@ -0,0 +1,198 @@
+import random
+import threading
+from django.db import connection
+from django.test import TransactionTestCase, override_settings
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APITestCase
+from django.contrib.auth import get_user_model
+from apps.education_plan.models import EducationPlan, Module, Card
+from apps.education_plan.services import MoveElementService, VersionConflict
+
+User = get_user_model()
+
+
+class VersionAPITestCase(APITestCase):
+    def setUp(self):
+        self.user_tutor = User.objects.create_user(email='testuser@gmail.com', password='testpassword',
+                                                   role='tutor', first_name='first_name', last_name='last_name')
+        self.client.force_authenticate(user=self.user_tutor)
+
+        self.plan = EducationPlan.objects.create(tutor=self.user_tutor.userprofile, student_first_name="John",
+                                                 student_last_name="Doe")
+        self.module1 = Module.objects.create(title="Test Module1", plan=self.plan)
+        self.module2 = Module.objects.create(title="Test Module2", plan=self.plan)
+        self.card1 = Card.objects.create(title="Test Card1", module=self.module1)
+        self.card2 = Card.objects.create(title="Test Card2", module=self.module1)
+        self.module1.refresh_from_db()
+        self.plan.refresh_from_db()
+
+    def move_card(self, card, index, version):
+        return self.client.post(reverse('move_element'), {
+            'element_type': 'task', 'element_id': card.id, 'destination_id': self.module1.id,
+            'destination_index': index, 'version': version,
+        }, format='json')
+
+    def test_move_with_current_version(self):
+        response = self.move_card(self.card2, 0, self.module1.version)
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['module_version'], self.module1.version + 1)
+
+    def test_stale_move_is_rejected(self):
+        version = self.module1.version
+        self.assertEqual(self.move_card(self.card2, 0, version).status_code, status.HTTP_200_OK)
+
+        response = self.move_card(self.card1, 0, version)
+
+        self.assertEqual(response.status_code, status.HTTP_409_CONFLICT)
+        self.assertEqual(response.data['version'], version + 1)
+        self.card1.refresh_from_db()
+        self.assertEqual(self.card1.index, 1)
+
+    def test_stale_module_move_is_rejected(self):
+        data = {'element_type': 'board', 'element_id': self.module2.id, 'destination_index': 0,
+                'version': self.plan.version}
+        self.assertEqual(self.client.post(reverse('move_element'), data, format='json').status_code,
+                         status.HTTP_200_OK)
+
+        response = self.client.post(reverse('move_element'), data, format='json')
+
+        self.assertEqual(response.status_code, status.HTTP_409_CONFLICT)
+        self.assertEqual(response.data['version'], self.plan.version + 1)
+
+    def test_stale_card_edit_is_rejected(self):
+        url = reverse('card-detail', kwargs={'pk': self.card1.id})
+        response = self.client.patch(url, {'title': 'First', 'version': self.module1.version}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['module_version'], self.module1.version + 1)
+
+        response = self.client.patch(url, {'title': 'Second', 'version': self.module1.version}, format='json')
+
+        self.assertEqual(response.status_code, status.HTTP_409_CONFLICT)
+        self.card1.refresh_from_db()
+        self.assertEqual(self.card1.title, 'First')
+
+    def test_unchanged_card_edit_keeps_version(self):
+        url = reverse('card-detail', kwargs={'pk': self.card1.id})
+        revision = self.plan.revision
+
+        response = self.client.patch(url, {'title': 'Test Card1', 'labels': [], 'version': self.module1.version},
+                                     format='json')
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['module_version'], self.module1.version)
+        self.module1.refresh_from_db()
+        self.plan.refresh_from_db()
+        self.assertEqual((self.module1.version, self.plan.revision), (response.data['module_version'], revision))
+
+        response = self.client.patch(url, {'title': 'Updated', 'version': self.module1.version}, format='json')
+        self.assertEqual(response.data['module_version'], self.module1.version + 1)
+
+    def test_stale_batch_is_rejected(self):
+        moves = [{'element_type': 'task', 'element_id': str(self.card2.id), 'destination_id': str(self.module2.id),
+                  'destination_index': 0}]
+        self.client.patch(reverse('card-detail', kwargs={'pk': self.card1.id}), {'title': 'Updated'}, format='json')
+
+        response = self.client.post(reverse('move_elements'),
+                                    {'moves': moves, 'versions': {str(self.module1.id): self.module1.version}},
+                                    format='json')
+
+        self.assertEqual(response.status_code, status.HTTP_409_CONFLICT)
+        self.assertEqual(self.module2.cards.count(), 0)
+
+
+class MoveConcurrencyTestCase(TransactionTestCase):
+    """Случайные перемещения из нескольких потоков не нарушают непрерывность индексов."""
+    THREADS = 8
+    MOVES_PER_THREAD = 25
+    MODULES = 3
+    CARDS_PER_MODULE = 10
+
+    def setUp(self):
+        user = User.objects.create_user(email='testuser@gmail.com', password='testpassword', role='tutor',
+                                        first_name='first_name', last_name='last_name')
+        self.plan = EducationPlan.objects.create(tutor=user.userprofile, student_first_name="John",
+                                                 student_last_name="Doe")
+        self.module_ids = []
+        self.card_ids = []
+        for i in range(self.MODULES):
+            module = Module.objects.create(title=f"Test Module{i}", plan=self.plan)
+            self.module_ids.append(module.id)
+            self.card_ids += [Card.objects.create(title=f"Test Card{i}{j}", module=module).id
+                              for j in range(self.CARDS_PER_MODULE)]
+
+    def move_randomly(self, generator):
+        if generator.random() < 0.2:
+            module = Module.objects.select_related('plan').get(pk=generator.choice(self.module_ids))
+            MoveElementService.move_module(module, generator.randrange(self.MODULES))
+            return
+
+        card = Card.objects.select_related('module').get(pk=generator.choice(self.card_ids))
+        destination = Module.objects.get(pk=generator.choice(self.module_ids))
+        count = destination.cards.count()
+        index = generator.randrange(count if destination.pk == card.module_id else count + 1)
+        MoveElementService.move_card(card, index, destination)
+
+    def worker(self, seed, results):
+        generator = random.Random(seed)
+        try:
+            for _ in range(self.MOVES_PER_THREAD):
+                try:
+                    self.move_randomly(generator)
+                    results.append('moved')
+                except VersionConflict:
+                    results.append('conflict')
+        finally:
+            connection.close()
+
+    def test_indexes_stay_permutation(self):
+        results = []
+        threads = [threading.Thread(target=self.worker, args=(seed, results)) for seed in range(self.THREADS)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(len(results), self.THREADS * self.MOVES_PER_THREAD)
+        self.assertIn('moved', results)
+
+        module_indexes = sorted(Module.objects.filter(plan=self.plan).values_list('index', flat=True))
+        self.assertEqual(module_indexes, list(range(self.MODULES)))
+        self.assertEqual(Card.objects.count(), self.MODULES * self.CARDS_PER_MODULE)
+        for module_id in self.module_ids:
+            indexes = sorted(Card.objects.filter(module_id=module_id).values_list('index', flat=True))
+            self.assertEqual(indexes, list(range(len(indexes))), module_id)
+            self.assertEqual(Module.objects.get(pk=module_id).cards_count, len(indexes))
+
+
+@override_settings(BOARD_ORDERING='rank')
+class CreateConcurrencyTestCase(TransactionTestCase):
+    """Параллельные вставки в конец модуля получают разные ключи rank."""
+    THREADS = 6
+    CARDS_PER_THREAD = 10
+
+    def setUp(self):
+        user = User.objects.create_user(email='testuser@gmail.com', password='testpassword', role='tutor',
+                                        first_name='first_name', last_name='last_name')
+        plan = EducationPlan.objects.create(tutor=user.userprofile, student_first_name="John",
+                                            student_last_name="Doe")
+        self.module = Module.objects.create(title="Test Module", plan=plan)
+
+    def worker(self, number):
+        try:
+            for i in range(self.CARDS_PER_THREAD):
+                Card.objects.create(title=f"Test Card{number}{i}", module_id=self.module.id)
+        finally:
+            connection.close()
+
+    def test_ranks_are_unique(self):
+        threads = [threading.Thread(target=self.worker, args=(number,)) for number in range(self.THREADS)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        ranks = list(Card.objects.filter(module=self.module).values_list('rank', flat=True))
+        self.assertEqual(len(ranks), self.THREADS * self.CARDS_PER_THREAD)
+        self.assertEqual(len(set(ranks)), len(ranks))
@@ -0,0 +1,68 @@
+from datetime import timedelta
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from django.contrib.auth import get_user_model
+from apps.education_plan.models import EducationPlan, Module, Card
+
+User = get_user_model()
+
+
+class DirtyFieldsTestCase(TestCase):
+    def setUp(self):
+        user = User.objects.create_user(email='testuser@gmail.com', password='testpassword', role='tutor',
+                                        first_name='first_name', last_name='last_name')
+        self.plan = EducationPlan.objects.create(tutor=user.userprofile, student_first_name="John",
+                                                 student_last_name="Doe")
+        self.module = Module.objects.create(title="Test Module", plan=self.plan)
+        self.card = Card.objects.create(title="Test Card", module=self.module)
+
+    def test_noop_save_skips_database(self):
+        card = Card.objects.get(pk=self.card.pk)
+        card.title = "Test Card"
+
+        with self.assertNumQueries(0):
+            card.save()
+
+    def test_save_writes_only_changed_fields(self):
+        card = Card.objects.select_related('module').get(pk=self.card.pk)
+        card.status = 'done'
+
+        with CaptureQueriesContext(connection) as queries:
+            card.save()
+
+        statements = [query['sql'] for query in queries.captured_queries
+                      if query['sql'].startswith('UPDATE "education_plan_card"')]
+        self.assertEqual(len(statements), 1)
+        self.assertIn('"status"', statements[0])
+        self.assertNotIn('"title"', statements[0])
+        self.assertFalse(any(query['sql'].startswith('SELECT') and 'FROM "education_plan_card"' in query['sql']
+                             for query in queries.captured_queries))
+        self.assertEqual(Card.objects.get(pk=self.card.pk).status, 'done')
+        self.assertEqual(card.get_dirty_fields(), [])
+
+    def test_repetition_change_is_detected_without_select(self):
+        card = Card.objects.select_related('module').get(pk=self.card.pk)
+        card.repetition_date = timezone.now() + timedelta(days=1)
+        card.save()
+        Card.objects.filter(pk=card.pk).update(repetition_date=timezone.now() - timedelta(minutes=1))
+        card.title = "Updated"
+
+        with CaptureQueriesContext(connection) as queries:
+            card.save()
+
+        self.assertTrue(card.repetition_pending)
+        self.assertFalse(any(query['sql'].startswith('SELECT') and 'FROM "education_plan_card"' in query['sql']
+                             for query in queries.captured_queries))
+
+    def test_plan_noop_save_keeps_revision(self):
+        plan = EducationPlan.objects.get(pk=self.plan.pk)
+        revision = plan.revision
+
+        plan.save()
+        plan.discipline = "Math"
+        plan.save()
+
+        self.assertEqual(plan.revision, revision + 1)
+        self.assertEqual(plan.get_dirty_fields(), [])
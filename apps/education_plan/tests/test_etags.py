@@ -0,0 +1,137 @@
+from datetime import timedelta
+from unittest import mock
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.test import APITestCase
+from django.contrib.auth import get_user_model
+from apps.education_plan.models import EducationPlan, Module, Card
+from apps.notifications.models import Notification
+from apps.notifications.tasks import send_notifications
+from apps.schedule.models import Lesson
+
+User = get_user_model()
+
+
+class ETagAPITestCase(APITestCase):
+    def setUp(self):
+        self.user_tutor = User.objects.create_user(email='testuser@gmail.com', password='testpassword',
+                                                   role='tutor', first_name='first_name', last_name='last_name')
+        self.tutor = self.user_tutor.userprofile
+        self.plan = EducationPlan.objects.create(tutor=self.tutor, student_first_name="John", student_last_name="Doe",
+                                                 discipline='Математика')
+        self.user_student = User.objects.create_user(email='student@gmail.com', password='testpassword',
+                                                     role='student', invite_code=self.plan.invite_code)
+        self.student = self.user_student.userprofile
+
+        self.module = Module.objects.create(title="Test Module", plan=self.plan)
+        self.card = Card.objects.create(title="Test Card", module=self.module)
+        self.user = self.user_tutor
+
+    def get(self, url, etag=None):
+        # Пользователь загружается заново, как при аутентификации по токену, чтобы профиль не брался из кэша.
+        self.client.force_authenticate(user=User.objects.get(pk=self.user.pk))
+        if etag is None:
+            return self.client.get(url)
+        return self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+
+    def assertNotModified(self, url, etag, queries_count):
+        self.client.force_authenticate(user=User.objects.get(pk=self.user.pk))
+        with self.assertNumQueries(queries_count):
+            response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+
+    def test_board_etag(self):
+        url = reverse('education_plan-detail', kwargs={'pk': self.plan.id})
+        response = self.get(url)
+        etag = response['ETag']
+
+        # Профиль пользователя и ревизия плана.
+        self.assertNotModified(url, etag, 2)
+
+        self.card.title = 'Updated Card'
+        self.card.save()
+        response = self.get(url, etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertNotEqual(response['ETag'], etag)
+
+    def test_board_with_malformed_id(self):
+        for url in (reverse('education_plan-detail', kwargs={'pk': 'not-a-uuid'}),
+                    reverse('education_plan-changes', kwargs={'pk': 'not-a-uuid'}) + '?since=0'):
+            self.assertEqual(self.get(url).status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_plan_list_etag(self):
+        url = reverse('education_plan-list')
+        etag = self.get(url)['ETag']
+
+        self.assertNotModified(url, etag, 1)
+
+        EducationPlan.objects.create(tutor=self.tutor, student_first_name="Jane", student_last_name="Doe")
+        response = self.get(url, etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    def test_expanded_plan_list_etag_depends_on_board(self):
+        url = f"{reverse('education_plan-list')}?expand={self.plan.id}"
+        etag = self.get(url)['ETag']
+
+        self.card.title = 'Updated Card'
+        self.card.save()
+        response = self.get(url, etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    def test_users_data_etag(self):
+        url = reverse('get_users_data')
+        etag = self.get(url)['ETag']
+
+        self.assertNotModified(url, etag, 1)
+
+        self.student.first_name = 'Иван'
+        self.student.save()
+        response = self.get(url, etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    def test_lesson_list_etag(self):
+        url = reverse('lesson-list')
+        etag = self.get(url)['ETag']
+
+        self.assertNotModified(url, etag, 2)
+
+        Lesson.objects.create(title='Lesson', education_plan=self.plan, card=self.card,
+                              date_start=timezone.now(), date_end=timezone.now() + timedelta(hours=1))
+        response = self.get(url, etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        etag = response['ETag']
+
+        self.card.title = 'Updated Card'
+        self.card.save()
+        response = self.get(url, etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data[0]['card_title'], 'Updated Card')
+
+    def test_notification_list_etag(self):
+        self.user = self.user_student
+        url = reverse('notifications-list')
+        etag = self.get(url)['ETag']
+
+        self.assertNotModified(url, etag, 2)
+
+        Notification.objects.create(text='text', type='homework_info', education_plan=self.plan,
+                                    recipient=self.student)
+        response = self.get(url, etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(response.data), 1)
+
+    def test_activated_reminders_change_notification_etag(self):
+        self.user = self.user_student
+        url = reverse('notifications-list')
+        reminder, = Notification.objects.bulk_create([Notification(
+            text='text', type='repetition_reminder', education_plan=self.plan, recipient=self.student,
+            is_active=False)])
+        etag = self.get(url)['ETag']
+
+        with mock.patch('apps.notifications.tasks.send_notification_according_to_profile_settings'):
+            send_notifications([str(reminder.id)])
+
+        response = self.get(url, etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(response.data), 1)
@@ -0,0 +1,112 @@
+import io
+import os
+import shutil
+import tempfile
+from unittest import mock, skipUnless
+from django.contrib.auth import get_user_model
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import override_settings
+from django.urls import reverse
+from PIL import Image
+from rest_framework import status
+from rest_framework.test import APITestCase
+from apps.education_plan import previews
+from apps.education_plan.models import EducationPlan, Module, Blob, File
+from apps.education_plan.tasks import generate_file_previews
+
+User = get_user_model()
+
+MEDIA_ROOT = tempfile.mkdtemp()
+
+
+def make_image(format, size=(800, 400)):
+    output = io.BytesIO()
+    Image.new('RGB', size, (200, 30, 30)).save(output, format)
+    return output.getvalue()
+
+
+@override_settings(DEFAULT_FILE_STORAGE='django.core.files.storage.FileSystemStorage', MEDIA_ROOT=MEDIA_ROOT,
+                   FILE_THUMBNAIL_SIZE=320, FILE_PREVIEW_SIZE=640)
+class FilePreviewAPITestCase(APITestCase):
+    @classmethod
+    def tearDownClass(cls):
+        shutil.rmtree(MEDIA_ROOT, ignore_errors=True)
+        super().tearDownClass()
+
+    def setUp(self):
+        self.user_tutor = User.objects.create_user(email='testuser@gmail.com', password='testpassword',
+                                                   role='tutor', first_name='first_name', last_name='last_name')
+        self.tutor = self.user_tutor.userprofile
+        self.client.force_authenticate(user=self.user_tutor)
+
+    def upload(self, name, content):
+        with mock.patch('apps.education_plan.tasks.generate_file_previews.delay') as delay:
+            with self.captureOnCommitCallbacks(execute=True):
+                response = self.client.post(reverse('tutor-files'), {'file': SimpleUploadedFile(name, content),
+                                                                     'name': name}, format='multipart')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        return File.objects.get(pk=response.data['id']), delay
+
+    def test_bmp_previews(self):
+        content = make_image('BMP')
+        file, delay = self.upload('Схема.bmp', content)
+        delay.assert_called_once_with(file.blob_id, 'bmp')
+
+        self.assertEqual(generate_file_previews(file.blob_id, 'bmp'), ['compressed', 'thumbnail'])
+
+        data = self.client.get(reverse('tutor-files')).data[0]['previews']
+        self.assertEqual((data['thumbnail']['width'], data['thumbnail']['height']), (320, 160))
+        self.assertEqual((data['compressed']['width'], data['compressed']['height']), (800, 400))
+        self.assertLess(data['compressed']['size'], len(content) / 10)
+        compressed = Blob.objects.get().previews['compressed']
+        with Image.open(os.path.join(MEDIA_ROOT, compressed['key'])) as image:
+            self.assertEqual((image.format, image.size), ('WEBP', (800, 400)))
+        self.assertEqual(generate_file_previews(file.blob_id, 'bmp'), [])
+
+    def test_section_previews(self):
+        file, _ = self.upload('Рисунок.png', make_image('PNG'))
+        plan = EducationPlan.objects.create(tutor=self.tutor, student_first_name="John", student_last_name="Doe")
+        module = Module.objects.create(title="Test Module", plan=plan)
+        card_id = self.client.post(reverse('card-list'), {
+            'title': 'Card', 'module_id': str(module.id), 'labels': [],
+            'content': {'homework': {'text': 'Задание', 'files': [str(file.id)]}},
+        }, format='json').data['id']
+        url = reverse('card_content-detail', args=[card_id])
+        self.assertEqual(self.client.get(url).data['homework']['files'][0]['previews'], {})
+
+        with self.captureOnCommitCallbacks(execute=True):
+            generate_file_previews(file.blob_id, 'png')
+
+        previews = self.client.get(url).data['homework']['files'][0]['previews']
+        self.assertEqual(list(previews), ['thumbnail'])
+        self.assertTrue(previews['thumbnail']['url'].endswith('/thumbnail.webp'))
+
+    @skipUnless(previews.pypdfium2, 'pypdfium2 не установлен')
+    def test_pdf_preview(self):
+        file, delay = self.upload('Учебник.pdf', make_image('PDF', size=(595, 842)))
+        delay.assert_called_once_with(file.blob_id, 'pdf')
+
+        generate_file_previews(file.blob_id, 'pdf')
+
+        previews = Blob.objects.get().previews
+        self.assertEqual((previews['preview']['width'], previews['preview']['height']), (453, 640))
+        self.assertEqual((previews['thumbnail']['width'], previews['thumbnail']['height']), (226, 320))
+
+    def test_files_without_previews(self):
+        _, delay = self.upload('Конспект.docx', b'PK not an image')
+        delay.assert_not_called()
+        file, _ = self.upload('Битый.png', b'not an image')
+
+        self.assertEqual(generate_file_previews(file.blob_id, 'png'), [])
+        self.assertEqual(Blob.objects.get(pk=file.blob_id).previews, {})
+
+    def test_previews_are_deleted_with_blob(self):
+        file, _ = self.upload('Рисунок.jpg', make_image('JPEG'))
+        generate_file_previews(file.blob_id, 'jpg')
+        path = os.path.join(MEDIA_ROOT, Blob.objects.get().previews['thumbnail']['key'])
+        self.assertTrue(os.path.exists(path))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.delete(reverse('tutor-file-delete', args=[file.id]))
+
+        self.assertFalse(os.path.exists(path))
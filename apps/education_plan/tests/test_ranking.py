@@ -0,0 +1,143 @@
+from unittest import mock
+from django.test import SimpleTestCase, override_settings
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APITestCase
+from django.contrib.auth import get_user_model
+from apps.education_plan.models import EducationPlan, Module, Card
+from apps.education_plan.ranking import rank_between, initial_ranks
+from apps.education_plan.services import RankService
+
+User = get_user_model()
+
+
+class RankBetweenTestCase(SimpleTestCase):
+    def test_appended_keys_are_ordered_and_short(self):
+        ranks = [None]
+        for _ in range(1000):
+            ranks.append(rank_between(ranks[-1], None))
+        ranks = ranks[1:]
+
+        self.assertEqual(ranks, sorted(set(ranks)))
+        self.assertLessEqual(max(len(rank) for rank in ranks), 6)
+
+    def test_key_between_neighbours(self):
+        before, after = 'i', 'i1'
+        for _ in range(50):
+            rank = rank_between(before, after)
+            self.assertTrue(before < rank < after)
+            after = rank
+
+    def test_no_key_between_equal_or_swapped_keys(self):
+        for before, after in (('a', 'a'), ('b', 'a')):
+            with self.assertRaises(ValueError):
+                rank_between(before, after)
+
+    def test_initial_ranks(self):
+        ranks = initial_ranks(10000)
+
+        self.assertEqual(ranks, sorted(set(ranks)))
+        self.assertLessEqual(max(len(rank) for rank in ranks), 6)
+
+
+@override_settings(BOARD_ORDERING='rank')
+class RankOrderingAPITestCase(APITestCase):
+    def setUp(self):
+        self.user_tutor = User.objects.create_user(email='testuser@gmail.com', password='testpassword',
+                                                   role='tutor', first_name='first_name', last_name='last_name')
+        self.tutor = self.user_tutor.userprofile
+        self.client.force_authenticate(user=self.user_tutor)
+
+        self.plan = EducationPlan.objects.create(tutor=self.tutor, student_first_name="John", student_last_name="Doe")
+        self.module1 = Module.objects.create(title="Test Module1", plan=self.plan)
+        self.module2 = Module.objects.create(title="Test Module2", plan=self.plan)
+        self.cards = [Card.objects.create(title=f"Test Card{i}", module=self.module1) for i in range(4)]
+
+    def move(self, data):
+        response = self.client.post(reverse('move_element'), data, format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return response
+
+    def get_board(self):
+        return self.client.get(reverse('education_plan-detail', kwargs={'pk': self.plan.id})).json()
+
+    def test_created_cards_get_increasing_ranks(self):
+        ranks = [card.rank for card in self.cards]
+
+        self.assertEqual(ranks, sorted(set(ranks)))
+        self.assertTrue(all(card.index is None for card in self.cards))
+
+    def test_move_card_writes_only_moved_card(self):
+        ranks_before = dict(Card.objects.values_list('id', 'rank'))
+
+        response = self.move({'element_type': 'task', 'element_id': self.cards[3].id,
+                              'destination_id': self.module1.id, 'destination_index': 1})
+
+        self.assertEqual(response.data['index'], 1)
+        ranks_after = dict(Card.objects.values_list('id', 'rank'))
+        changed = [card_id for card_id, rank in ranks_after.items() if ranks_before[card_id] != rank]
+        self.assertEqual(changed, [self.cards[3].id])
+
+        cards = self.get_board()['modules'][0]['cards']
+        self.assertEqual([card['title'] for card in cards], ['Test Card0', 'Test Card3', 'Test Card1', 'Test Card2'])
+        self.assertEqual([card['index'] for card in cards], [0, 1, 2, 3])
+
+    def test_move_card_to_another_module(self):
+        self.move({'element_type': 'task', 'element_id': self.cards[0].id,
+                   'destination_id': self.module2.id, 'destination_index': 5})
+        self.move({'element_type': 'task', 'element_id': self.cards[1].id,
+                   'destination_id': self.module2.id, 'destination_index': 0})
+
+        modules = self.get_board()['modules']
+        self.assertEqual([card['title'] for card in modules[0]['cards']], ['Test Card2', 'Test Card3'])
+        self.assertEqual([card['title'] for card in modules[1]['cards']], ['Test Card1', 'Test Card0'])
+        self.assertEqual([card['index'] for card in modules[1]['cards']], [0, 1])
+
+    def test_move_module(self):
+        response = self.move({'element_type': 'board', 'element_id': self.module2.id, 'destination_index': 0})
+
+        self.assertEqual(response.data['index'], 0)
+        modules = self.get_board()['modules']
+        self.assertEqual([module['title'] for module in modules], ['Test Module2', 'Test Module1'])
+        self.assertEqual([module['index'] for module in modules], [0, 1])
+
+    def test_expanded_plans_number_modules_per_plan(self):
+        other_plan = EducationPlan.objects.create(tutor=self.tutor, student_first_name="Jane", student_last_name="Doe")
+        for title in ('Other Module1', 'Other Module2'):
+            Module.objects.create(title=title, plan=other_plan)
+
+        response = self.client.get(reverse('education_plan-list'), {'expand': f'{self.plan.id},{other_plan.id}'})
+
+        plans = {plan['id']: plan for plan in response.data['results']}
+        for plan in (self.plan, other_plan):
+            self.assertEqual([module['index'] for module in plans[str(plan.id)]['modules']], [0, 1])
+
+    def test_move_between_cards_with_equal_ranks(self):
+        Card.objects.filter(pk__in=[self.cards[1].pk, self.cards[2].pk]).update(rank=self.cards[1].rank)
+
+        self.move({'element_type': 'task', 'element_id': self.cards[0].id,
+                   'destination_id': self.module1.id, 'destination_index': 1})
+
+        ranks = list(Card.objects.filter(module=self.module1).order_by('rank').values_list('rank', flat=True))
+        self.assertEqual(ranks, sorted(set(ranks)))
+        cards = self.get_board()['modules'][0]['cards']
+        self.assertEqual(cards[1]['title'], 'Test Card0')
+
+    @override_settings(RANK_REBALANCE_LENGTH=6)
+    def test_long_keys_are_rebalanced(self):
+        with mock.patch('apps.education_plan.tasks.rebalance_ranks.delay') as delay:
+            with self.captureOnCommitCallbacks(execute=True):
+                for _ in range(10):
+                    self.move({'element_type': 'task', 'element_id': self.cards[3].id,
+                               'destination_id': self.module1.id, 'destination_index': 1})
+                    self.move({'element_type': 'task', 'element_id': self.cards[2].id,
+                               'destination_id': self.module1.id, 'destination_index': 1})
+
+        delay.assert_called_with('card', str(self.module1.id))
+
+        order = list(Card.objects.filter(module=self.module1).order_by('rank').values_list('id', flat=True))
+        RankService.rebalance_parent('card', self.module1.id)
+        cards = Card.objects.filter(module=self.module1).order_by('rank')
+        self.assertEqual([card.id for card in cards], order)
+        self.assertEqual([card.index for card in cards], [0, 1, 2, 3])
+        self.assertTrue(all(len(card.rank) <= 6 for card in cards))
@@ -0,0 +1,204 @@
+from datetime import timedelta
+from io import StringIO
+from unittest import mock
+from django.core.management import call_command
+from django.db import connection
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from django.urls import reverse
+from django.contrib.auth import get_user_model
+from rest_framework import status
+from rest_framework.test import APITestCase
+from apps.education_plan.models import EducationPlan, Module, Card, BoardChange
+from apps.education_plan.scheduling import LAPSE_QUALITY, get_qualities, next_repetition
+from apps.education_plan.tasks import sweep_due_repetitions
+from apps.notifications.models import Notification
+from apps.notifications.tasks import send_notifications
+
+User = get_user_model()
+
+
+@mock.patch('apps.notifications.tasks.send_notifications.delay')
+class RepetitionSweepTestCase(TestCase):
+    def setUp(self):
+        tutor = User.objects.create_user(email='testuser@gmail.com', password='testpassword', role='tutor',
+                                         first_name='first_name', last_name='last_name')
+        self.plan = EducationPlan.objects.create(tutor=tutor.userprofile, student_first_name="John",
+                                                 student_last_name="Doe")
+        User.objects.create_user(email='student@gmail.com', password='testpassword', role='student',
+                                 invite_code=self.plan.invite_code)
+        self.module = Module.objects.create(title="Test Module", plan=self.plan)
+
+    def create_due_cards(self, count):
+        cards = [Card.objects.create(title=f"Test Card{i}", module=self.module,
+                                     repetition_date=timezone.now() + timedelta(days=1)) for i in range(count)]
+        Card.objects.filter(pk__in=[card.pk for card in cards]).update(
+            repetition_date=timezone.now() - timedelta(minutes=1))
+        return cards
+
+    def test_future_date_is_queued(self, delay):
+        card = Card.objects.create(title="Test Card", module=self.module,
+                                   repetition_date=timezone.now() + timedelta(days=30))
+
+        self.assertTrue(card.repetition_pending)
+        self.assertEqual(sweep_due_repetitions(), 0)
+        delay.assert_not_called()
+
+    def test_past_date_is_not_queued(self, delay):
+        card = Card.objects.create(title="Test Card", module=self.module,
+                                   repetition_date=timezone.now() - timedelta(days=1))
+
+        self.assertFalse(card.repetition_pending)
+        self.assertEqual(sweep_due_repetitions(), 0)
+
+    def test_due_cards_are_swept_once(self, delay):
+        cards = self.create_due_cards(3)
+
+        self.assertEqual(sweep_due_repetitions(), 3)
+
+        self.assertEqual(set(Card.objects.values_list('status', 'repetition_pending')), {('to_repeat', False)})
+        self.assertEqual(Notification.objects.filter(type='repetition_reminder').count(), 3)
+        delay.assert_called_once()
+        self.assertEqual(len(delay.call_args.args[0]), 3)
+        self.assertEqual(BoardChange.objects.filter(plan=self.plan, op='update', object_type='card').count(), 3)
+
+        Card.objects.filter(pk=cards[0].pk).update(status='done')
+        self.assertEqual(sweep_due_repetitions(), 0)
+
+    def test_rescheduled_card_is_swept_at_new_date(self, delay):
+        card = self.create_due_cards(1)[0]
+        card.refresh_from_db()
+        card.repetition_date = timezone.now() + timedelta(days=1)
+        card.save()
+
+        self.assertEqual(sweep_due_repetitions(), 0)
+        self.assertEqual(Card.objects.get(pk=card.pk).status, 'not_started')
+
+    def test_batch_task_sends_reminders(self, delay):
+        self.create_due_cards(2)
+        sweep_due_repetitions()
+
+        with mock.patch('apps.notifications.tasks.send_notification_according_to_profile_settings') as send:
+            send_notifications(*delay.call_args.args)
+
+        self.assertEqual(send.call_count, 2)
+        self.assertFalse(Notification.objects.filter(is_active=False).exists())
+
+    @override_settings(REPETITION_SWEEP_BATCH_SIZE=2)
+    def test_one_update_per_batch(self, delay):
+        self.create_due_cards(5)
+
+        with CaptureQueriesContext(connection) as queries:
+            self.assertEqual(sweep_due_repetitions(), 5)
+
+        updates = [query['sql'] for query in queries.captured_queries
+                   if query['sql'].startswith('UPDATE "education_plan_card"')]
+        self.assertEqual(len(updates), 3)
+        self.assertEqual([len(call.args[0]) for call in delay.call_args_list], [2, 2, 1])
+
+
+class NextRepetitionTestCase(SimpleTestCase):
+    def test_intervals_grow(self):
+        count, interval, ease_factor = 0, 0, 2.5
+        intervals = []
+        for _ in range(4):
+            count, interval, ease_factor = next_repetition(4, count, interval, ease_factor)
+            intervals.append(interval)
+
+        self.assertEqual(intervals, [1, 6, 15, 38])
+        self.assertEqual(count, 4)
+
+    def test_lapse_resets_interval(self):
+        count, interval, ease_factor = next_repetition(LAPSE_QUALITY, 3, 15, 2.5)
+
+        self.assertEqual((count, interval), (0, 1))
+        self.assertLess(ease_factor, 2.5)
+        self.assertGreaterEqual(next_repetition(0, 0, 1, 1.3)[2], 1.3)
+
+    def test_qualities(self):
+        qualities = get_qualities(['done', 'done', 'to_repeat'], ['easy', 'hard', 'easy'],
+                                  [timedelta(hours=1), None, None], [timedelta(hours=2), None, None])
+
+        self.assertEqual(qualities, [4, 3, LAPSE_QUALITY])
+
+
+class ScheduleRepetitionsAPITestCase(APITestCase):
+    def setUp(self):
+        self.user_tutor = User.objects.create_user(email='testuser@gmail.com', password='testpassword', role='tutor',
+                                                   first_name='first_name', last_name='last_name')
+        self.client.force_authenticate(user=self.user_tutor)
+        self.plan = EducationPlan.objects.create(tutor=self.user_tutor.userprofile, student_first_name="John",
+                                                 student_last_name="Doe")
+        self.module1 = Module.objects.create(title="Test Module1", plan=self.plan)
+        self.module2 = Module.objects.create(title="Test Module2", plan=self.plan)
+        self.easy = Card.objects.create(title="Easy", module=self.module1, status='done', difficulty='easy')
+        self.hard = Card.objects.create(title="Hard", module=self.module2, status='done', difficulty='hard')
+        self.new = Card.objects.create(title="New", module=self.module1)
+        self.url = reverse('education_plan-schedule-repetitions', kwargs={'pk': self.plan.id})
+
+    def test_schedule_plan(self):
+        revision = EducationPlan.objects.get(pk=self.plan.pk).revision
+
+        response = self.client.post(self.url, format='json')
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['scheduled'], 2)
+        easy, hard, new = (Card.objects.get(pk=card.pk) for card in (self.easy, self.hard, self.new))
+        self.assertTrue(easy.repetition_pending and hard.repetition_pending)
+        self.assertEqual((easy.repetition_count, easy.repetition_interval), (1, 1))
+        self.assertGreater(easy.ease_factor, hard.ease_factor)
+        self.assertGreater(easy.repetition_date, timezone.now())
+        self.assertIsNone(new.repetition_date)
+
+        changes = self.client.get(reverse('education_plan-changes', kwargs={'pk': self.plan.id}),
+                                  {'since': revision})
+        self.assertEqual(changes.status_code, status.HTTP_410_GONE)
+
+    def test_repeated_call_keeps_schedule(self):
+        self.client.post(self.url, format='json')
+        dates = dict(Card.objects.values_list('id', 'repetition_date'))
+
+        response = self.client.post(self.url, format='json')
+
+        self.assertEqual(response.data['scheduled'], 0)
+        self.assertEqual(dict(Card.objects.values_list('id', 'repetition_date')), dates)
+
+    def test_pending_cards_are_rescheduled_on_request(self):
+        self.client.post(self.url, format='json')
+        Card.objects.update(repetition_date=timezone.now() + timedelta(days=30))
+        Card.objects.filter(pk=self.hard.pk).update(repetition_pending=False)
+
+        response = self.client.post(self.url, format='json')
+        self.assertEqual(response.data, {'scheduled': 1, 'rescheduled': 0, 'pending': 1})
+
+        response = self.client.post(self.url, {'reschedule_pending': True}, format='json')
+
+        self.assertEqual(response.data, {'scheduled': 0, 'rescheduled': 2, 'pending': 0})
+        easy = Card.objects.get(pk=self.easy.pk)
+        self.assertEqual((easy.repetition_count, easy.repetition_interval), (1, 1))
+        self.assertLess(easy.repetition_date, timezone.now() + timedelta(days=2))
+
+    def test_schedule_module(self):
+        response = self.client.post(self.url, {'module_id': str(self.module2.id)}, format='json')
+
+        self.assertEqual(response.data['scheduled'], 1)
+        self.assertFalse(Card.objects.get(pk=self.easy.pk).repetition_pending)
+
+    def test_swept_card_is_rescheduled(self):
+        self.client.post(self.url, format='json')
+        Card.objects.update(repetition_date=timezone.now() - timedelta(minutes=1))
+        with mock.patch('apps.notifications.tasks.send_notifications.delay'):
+            sweep_due_repetitions()
+        Card.objects.filter(pk=self.easy.pk).update(status='done')
+
+        self.assertEqual(self.client.post(self.url, format='json').data['scheduled'], 2)
+
+        easy, hard = Card.objects.get(pk=self.easy.pk), Card.objects.get(pk=self.hard.pk)
+        self.assertEqual((easy.repetition_count, easy.repetition_interval), (2, 6))
+        self.assertEqual((hard.repetition_count, hard.repetition_interval), (0, 1))
+
+    def test_command(self):
+        call_command('schedule_repetitions', plan=str(self.plan.id), stdout=StringIO())
+
+        self.assertEqual(Card.objects.filter(repetition_pending=True).count(), 2)
@@ -0,0 +1,155 @@
+from io import StringIO
+from django.core.management import call_command
+from django.db import connection
+from django.test import override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.contrib.auth import get_user_model
+from rest_framework import status
+from rest_framework.test import APITestCase
+from apps.education_plan.models import EducationPlan, Module, Card, Label, File
+
+User = get_user_model()
+
+
+@override_settings(DEFAULT_FILE_STORAGE='django.core.files.storage.FileSystemStorage')
+class SearchAPITestCase(APITestCase):
+    def setUp(self):
+        self.user_tutor = User.objects.create_user(email='testuser@gmail.com', password='testpassword',
+                                                   role='tutor', first_name='first_name', last_name='last_name')
+        self.tutor = self.user_tutor.userprofile
+        self.client.force_authenticate(user=self.user_tutor)
+
+        self.plan = EducationPlan.objects.create(tutor=self.tutor, student_first_name="John", student_last_name="Doe")
+        self.module = Module.objects.create(title="Алгебра", plan=self.plan)
+        self.label = Label.objects.create(title='Экзамен', color='#FF0000', tutor=self.tutor)
+        self.file = File.objects.create(file='uploads/parabola.pdf', name='Парабола.pdf', extension='pdf',
+                                        tutor=self.tutor)
+
+    def create_card(self, title, description='', text='', labels=(), files=()):
+        response = self.client.post(reverse('card-list'), {
+            'title': title, 'description': description, 'module_id': str(self.module.id),
+            'labels': [str(label.id) for label in labels],
+            'content': {'homework': {'text': text, 'files': [str(file.id) for file in files]}},
+        }, format='json')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        return Card.objects.get(pk=response.data['id'])
+
+    def search(self, query, **params):
+        response = self.client.get(reverse('search'), {'q': query, **params})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return response
+
+    def found(self, query):
+        return [card['title'] for card in self.search(query).data['results']]
+
+    def test_search_sources(self):
+        self.create_card('Квадратные уравнения', description='Дискриминант')
+        self.create_card('Домашнее задание 1', text='Решить квадратное уравнение')
+        self.create_card('Подготовка', labels=[self.label])
+        self.create_card('Графики', files=[self.file])
+        self.create_card('Тригонометрия')
+
+        self.assertEqual(self.found('квадратное уравнение'), ['Квадратные уравнения', 'Домашнее задание 1'])
+        self.assertEqual(self.found('дискриминантом'), ['Квадратные уравнения'])
+        self.assertEqual(self.found('экзамен'), ['Подготовка'])
+        self.assertEqual(self.found('парабола'), ['Графики'])
+        self.assertEqual(self.found('логарифм'), [])
+
+    def test_result_data(self):
+        card = self.create_card('Квадратные уравнения', labels=[self.label])
+
+        result = self.search('уравнения').data['results'][0]
+
+        self.assertEqual(result['id'], str(card.id))
+        self.assertEqual(result['module'], self.module.id)
+        self.assertEqual(result['plan'], self.plan.id)
+        self.assertEqual([label['title'] for label in result['labels']], ['Экзамен'])
+        self.assertGreater(result['relevance'], 0)
+
+    def test_changes_update_search(self):
+        card = self.create_card('Задание', text='Старый текст', labels=[self.label], files=[self.file])
+
+        card.title = 'Логарифмы'
+        card.save()
+        self.assertEqual(self.found('логарифм'), ['Логарифмы'])
+
+        self.client.patch(reverse('card_content-update-section', args=[card.id, 'homework']),
+                          {'text': 'Новое неравенство'}, format='json')
+        self.assertEqual(self.found('неравенство'), ['Логарифмы'])
+        self.assertEqual(self.found('старый'), [])
+
+        self.label.title = 'Олимпиада'
+        self.label.save()
+        self.assertEqual(self.found('олимпиада'), ['Логарифмы'])
+
+        card.labels.remove(self.label)
+        self.assertEqual(self.found('олимпиада'), [])
+
+        self.file.delete()
+        self.assertEqual(self.found('парабола'), [])
+
+    def test_copies_are_searchable(self):
+        card = self.create_card('Квадратные уравнения', text='Дискриминант')
+        response = self.client.post(reverse('card-create-template', args=[card.id]))
+        template_id = response.data['id']
+        self.client.post(reverse('card-create-card-from-template', args=[template_id]),
+                         {'module_id': str(self.module.id)}, format='json')
+        self.client.post(reverse('module-clone', args=[self.module.id]), {'plan_id': str(self.plan.id)},
+                         format='json')
+
+        self.assertEqual(len(self.found('дискриминант')), 5)
+
+    def test_search_scope(self):
+        self.create_card('Квадратные уравнения')
+        other_tutor = User.objects.create_user(email='another@gmail.com', password='testpassword', role='tutor')
+        self.client.force_authenticate(user=other_tutor)
+        self.assertEqual(self.found('уравнения'), [])
+
+        student = User.objects.create_user(email='student@gmail.com', password='testpassword', role='student',
+                                           invite_code=self.plan.invite_code)
+        self.plan.student = student.userprofile
+        self.plan.save()
+        self.client.force_authenticate(user=student)
+        self.assertEqual(self.found('уравнения'), ['Квадратные уравнения'])
+
+    def test_pagination_and_queries(self):
+        def count_queries():
+            with CaptureQueriesContext(connection) as context:
+                response = self.search('уравнение', page_size=2)
+            return response, len(context.captured_queries)
+
+        for i in range(2):
+            self.create_card(f'Уравнение {i}', labels=[self.label])
+        _, queries = count_queries()
+        for i in range(2, 5):
+            self.create_card(f'Уравнение {i}', labels=[self.label])
+
+        response, more_queries = count_queries()
+        self.assertEqual(more_queries, queries)
+        self.assertEqual(len(response.data['results']), 2)
+        self.assertIsNone(response.data['previous'])
+
+        titles = [card['title'] for card in response.data['results']]
+        while response.data['next']:
+            response = self.client.get(response.data['next'])
+            titles += [card['title'] for card in response.data['results']]
+        self.assertEqual(sorted(titles), [f'Уравнение {i}' for i in range(5)])
+        self.assertIsNotNone(response.data['previous'])
+        self.assertEqual(self.client.get(reverse('search'), {'q': 'уравнение', 'page': 0}).status_code,
+                         status.HTTP_404_NOT_FOUND)
+
+    def test_query_is_required(self):
+        response = self.client.get(reverse('search'), {'q': ' '})
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_update_search_vectors_command(self):
+        self.create_card('Квадратные уравнения')
+        Card.objects.update(search_vector=None)
+        out = StringIO()
+
+        call_command('update_search_vectors', stdout=out)
+
+        self.assertIn('1', out.getvalue())
+        self.assertEqual(self.found('уравнения'), ['Квадратные уравнения'])
@@ -0,0 +1,121 @@
+import random
+from django.contrib.auth import get_user_model
+from django.test import SimpleTestCase, override_settings
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APITestCase
+from apps.education_plan.deltas import make_delta, apply_delta
+from apps.education_plan.models import EducationPlan, Module, Card, SectionRevision
+
+User = get_user_model()
+
+
+class DeltaTestCase(SimpleTestCase):
+    def test_random_edits_round_trip(self):
+        rng = random.Random(0)
+        text = ''.join(rng.choice('абв где\n') for _ in range(500))
+        for _ in range(200):
+            start = rng.randrange(len(text) + 1)
+            end = min(len(text), start + rng.randrange(20))
+            new = text[:start] + ''.join(rng.choice('абв xyz') for _ in range(rng.randrange(20))) + text[end:]
+
+            self.assertEqual(apply_delta(text, make_delta(text, new)), new)
+            text = new
+
+    def test_delta_size_depends_on_change(self):
+        text = 'Решить задачи 1-10 из учебника. ' * 2000
+        new = text[:30000] + 'и 11 ' + text[30000:]
+
+        delta = make_delta(text, new)
+
+        self.assertEqual(delta, [[30000, 30000, 'и 11 ']])
+        self.assertEqual(make_delta(text, text), [])
+        self.assertEqual(apply_delta(text, make_delta(text, '')), '')
+
+
+@override_settings(SECTION_REVISION_SNAPSHOT_INTERVAL=3)
+class SectionHistoryAPITestCase(APITestCase):
+    def setUp(self):
+        self.user_tutor = User.objects.create_user(email='testuser@gmail.com', password='testpassword',
+                                                   role='tutor', first_name='first_name', last_name='last_name')
+        self.tutor = self.user_tutor.userprofile
+        self.client.force_authenticate(user=self.user_tutor)
+
+        self.plan = EducationPlan.objects.create(tutor=self.tutor, student_first_name="John", student_last_name="Doe")
+        self.module = Module.objects.create(title="Test Module", plan=self.plan)
+        self.card_id = self.create_card('Задание 1')
+
+    def create_card(self, text):
+        response = self.client.post(reverse('card-list'), {
+            'title': 'Card', 'module_id': str(self.module.id), 'labels': [],
+            'content': {'homework': {'text': text, 'files': []}},
+        }, format='json')
+        return response.data['id']
+
+    def edit(self, text, card_id=None):
+        response = self.client.patch(reverse('card_content-update-section', args=[card_id or self.card_id, 'homework']),
+                                     {'text': text}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    def get_text(self, number, card_id=None):
+        response = self.client.get(reverse('card_content-revision', args=[card_id or self.card_id, 'homework', number]))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return response.data['text']
+
+    def test_versions(self):
+        versions = ['Задание 1'] + [f'Задание 1, упражнения 1-{i}' for i in range(2, 9)]
+        for text in versions[1:]:
+            self.edit(text)
+        self.edit(versions[-1])
+
+        response = self.client.get(reverse('card_content-revisions', args=[self.card_id, 'homework']))
+
+        self.assertEqual([revision['number'] for revision in response.data], list(range(len(versions), 0, -1)))
+        self.assertEqual(response.data[0]['author'], self.tutor.id)
+        self.assertEqual(response.data[0]['length'], len(versions[-1]))
+        self.assertEqual([self.get_text(number) for number in range(1, len(versions) + 1)], versions)
+        snapshots = SectionRevision.objects.filter(snapshot__isnull=False).values_list('number', flat=True)
+        self.assertEqual(list(snapshots), [1, 4, 7])
+
+    def test_restore(self):
+        self.edit('Задание 2')
+        self.edit('Задание 3')
+
+        response = self.client.post(reverse('card_content-restore-revision', args=[self.card_id, 'homework', 1]))
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['text'], 'Задание 1')
+        content = self.client.get(reverse('card_content-detail', args=[self.card_id]))
+        self.assertEqual(content.data['homework']['text'], 'Задание 1')
+        self.assertEqual(self.get_text(4), 'Задание 1')
+        self.assertEqual(self.get_text(3), 'Задание 3')
+
+    def test_missing_revision(self):
+        self.assertEqual(self.client.get(reverse('card_content-revisions', args=[self.card_id, 'homework'])).data, [])
+        self.assertEqual(
+            self.client.get(reverse('card_content-revision', args=[self.card_id, 'homework', 1])).status_code,
+            status.HTTP_404_NOT_FOUND)
+        self.assertEqual(
+            self.client.post(reverse('card_content-restore-revision', args=[self.card_id, 'homework', 5])).status_code,
+            status.HTTP_404_NOT_FOUND)
+
+    def test_shared_section_history(self):
+        response = self.client.post(reverse('card-create-template', args=[self.card_id]))
+        template = Card.objects.get(pk=response.data['id'])
+        response = self.client.post(reverse('card-create-card-from-template', args=[template.id]),
+                                    {'module_id': str(self.module.id)}, format='json')
+        card_id = response.data['id']
+
+        self.edit('Задание 2', card_id=card_id)
+
+        self.assertEqual([self.get_text(number, card_id=card_id) for number in (1, 2)], ['Задание 1', 'Задание 2'])
+        self.assertEqual(template.content.homework.revisions.count(), 0)
+
+    def test_other_tutor(self):
+        self.edit('Задание 2')
+        another_tutor = User.objects.create_user(email='another@gmail.com', password='testpassword', role='tutor')
+        self.client.force_authenticate(user=another_tutor)
+
+        response = self.client.get(reverse('card_content-revisions', args=[self.card_id, 'homework']))
+
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
@@ -1,7 +1,10 @@
+from datetime import timedelta
+from django.db.models import Prefetch
 from django.test import TestCase
+from django.utils import timezone
 from django.contrib.auth import get_user_model
-from apps.education_plan.models import Label
-from apps.education_plan.serializers import LabelSerializer
+from apps.education_plan.models import Label, EducationPlan, Module, Card
+from apps.education_plan.serializers import LabelSerializer, ModulesInEducationPlanSerializer, BoardReadSerializer
 
 User = get_user_model()
 
@@ -26,3 +29,50 @@ class LabelSerializerTestCase(TestCase):
             }
         ]
         self.assertEqual(serialized_data, expected_data)
+
+
+class BoardReadSerializerTestCase(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(email='testuser@gmail.com', password='testpassword', role='tutor')
+        self.tutor = self.user.userprofile
+        self.plan = EducationPlan.objects.create(tutor=self.tutor, student_first_name="John", student_last_name="Doe")
+        self.labels = [Label.objects.create(title=f'Test Label {i}', color='#FF0000', tutor=self.tutor)
+                       for i in range(3)]
+        self.module1 = Module.objects.create(title="Test Module1", plan=self.plan)
+        self.module2 = Module.objects.create(title="Test Module2", plan=self.plan)
+
+    def create_cards(self, module, count):
+        for i in range(count):
+            card = Card.objects.create(title=f"Test Card{i}", module=module, plan_time=timedelta(minutes=30),
+                                       date_start=timezone.now())
+            card.labels.set(self.labels[:i % 3])
+
+    def get_expected_data(self):
+        plan = EducationPlan.objects.prefetch_related(
+            Prefetch('modules', queryset=Module.objects.order_by('index')),
+            Prefetch('modules__cards', queryset=Card.objects.order_by('index')),
+            Prefetch('modules__cards__labels', queryset=Label.objects.order_by('title')),
+        ).get(pk=self.plan.pk)
+        return ModulesInEducationPlanSerializer(plan).data
+
+    def test_output_matches_model_serializers(self):
+        self.create_cards(self.module1, 4)
+        self.create_cards(self.module2, 2)
+        plan = EducationPlan.objects.get(pk=self.plan.pk)
+
+        self.assertEqual(BoardReadSerializer().plans([plan]), [self.get_expected_data()])
+
+    def test_query_count_does_not_depend_on_cards(self):
+        plan = EducationPlan.objects.get(pk=self.plan.pk)
+        for cards_count in (5, 50):
+            self.create_cards(self.module1, cards_count)
+            with self.assertNumQueries(3):
+                BoardReadSerializer().plans([plan])
+
+    def test_cards_are_ordered_by_index(self):
+        Card.objects.create(title="Second", module=self.module1, index=1)
+        Card.objects.create(title="First", module=self.module1, index=0)
+        plan = EducationPlan.objects.get(pk=self.plan.pk)
+
+        cards = BoardReadSerializer().plans([plan])[0]['modules'][0]['cards']
+        self.assertEqual([card['title'] for card in cards], ['First', 'Second'])
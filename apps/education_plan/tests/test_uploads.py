@@ -0,0 +1,271 @@
+import os
+import uuid
+import shutil
+import tempfile
+from datetime import timedelta
+from unittest import mock
+from urllib.parse import urlparse, parse_qs
+from django.contrib.auth import get_user_model
+from django.core.files.storage import FileSystemStorage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import DatabaseError, transaction
+from django.test import override_settings
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.test import APITestCase
+from apps.education_plan.models import Blob, File, FileUpload
+from apps.education_plan.tasks import expire_file_uploads
+from apps.education_plan.uploads import S3DirectUpload
+
+User = get_user_model()
+
+MEDIA_ROOT = tempfile.mkdtemp()
+CHUNKED_UPLOAD_ROOT = tempfile.mkdtemp()
+
+
+def save_overwriting(storage, name, content, max_length=None):
+    """Сохранение как в S3Boto3Storage: объект с тем же ключом перезаписывается, а не получает новое имя."""
+    path = storage.path(name)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, 'wb') as output:
+        for chunk in content.chunks():
+            output.write(chunk)
+    return name
+
+
+@override_settings(DEFAULT_FILE_STORAGE='django.core.files.storage.FileSystemStorage', MEDIA_ROOT=MEDIA_ROOT,
+                   DIRECT_UPLOAD_BACKEND='local', CHUNKED_UPLOAD_ROOT=CHUNKED_UPLOAD_ROOT, CHUNKED_UPLOAD_CHUNK_SIZE=8)
+class DirectUploadAPITestCase(APITestCase):
+    content = b'%PDF-1.4 test content'
+
+    @classmethod
+    def tearDownClass(cls):
+        shutil.rmtree(MEDIA_ROOT, ignore_errors=True)
+        shutil.rmtree(CHUNKED_UPLOAD_ROOT, ignore_errors=True)
+        super().tearDownClass()
+
+    def setUp(self):
+        self.user_tutor = User.objects.create_user(email='testuser@gmail.com', password='testpassword',
+                                                   role='tutor', first_name='first_name', last_name='last_name')
+        self.tutor = self.user_tutor.userprofile
+        self.client.force_authenticate(user=self.user_tutor)
+
+    def request_upload(self, name='Конспект.pdf', size=None, chunked=False):
+        return self.client.post(reverse('file-uploads'), {'name': name, 'size': size or len(self.content),
+                                                          'chunked': chunked}, format='json')
+
+    def put(self, upload, content=None):
+        self.assertEqual(upload['method'], 'PUT')
+        return self.client.put(upload['url'], content or self.content, content_type='application/octet-stream')
+
+    def confirm(self, upload_id):
+        return self.client.post(reverse('file-upload-confirm', args=[upload_id]))
+
+    def test_upload_flow(self):
+        response = self.request_upload()
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        upload_id = response.data['id']
+        self.assertEqual(self.confirm(upload_id).status_code, status.HTTP_400_BAD_REQUEST)
+
+        self.client.force_authenticate(user=None)
+        self.assertEqual(self.put(response.data['upload']).status_code, status.HTTP_200_OK)
+        self.client.force_authenticate(user=self.user_tutor)
+        response = self.confirm(upload_id)
+
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual((response.data['name'], response.data['extension'], response.data['size']),
+                         ('Конспект.pdf', 'pdf', len(self.content)))
+        file = File.objects.get(pk=response.data['id'])
+        self.assertEqual(file.file.read(), self.content)
+        self.assertFalse(FileUpload.objects.exists())
+        files = self.client.get(reverse('tutor-files')).data
+        self.assertEqual([item['id'] for item in files], [str(file.id)])
+        self.assertEqual(self.confirm(upload_id).status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_restrictions_are_checked_before_upload(self):
+        response = self.request_upload(name='script.exe')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('file', response.data)
+
+        response = self.request_upload(size=11 * 1024 * 1024)
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertFalse(FileUpload.objects.exists())
+
+    def test_upload_link_is_checked(self):
+        upload = self.request_upload().data['upload']
+        url = urlparse(upload['url'])
+
+        response = self.client.put(f'{url.path}?token=invalid', self.content, content_type='application/octet-stream')
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+        self.assertEqual(self.put(upload, self.content + b'!').status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('token', parse_qs(url.query))
+
+    def test_other_tutor_cannot_confirm(self):
+        response = self.request_upload()
+        self.put(response.data['upload'])
+        other_tutor = User.objects.create_user(email='another@gmail.com', password='testpassword', role='tutor')
+        self.client.force_authenticate(user=other_tutor)
+
+        self.assertEqual(self.confirm(response.data['id']).status_code, status.HTTP_404_NOT_FOUND)
+        self.assertFalse(File.objects.exists())
+
+    @override_settings(DEFAULT_FILE_STORAGE='storages.backends.s3boto3.S3Boto3Storage', AWS_ACCESS_KEY_ID='key',
+                       AWS_SECRET_ACCESS_KEY='secret', AWS_STORAGE_BUCKET_NAME='bucket')
+    def test_s3_presigned_put(self):
+        upload = FileUpload.objects.create(key='uploads/2024/01/01/abc/file.pdf', name='file.pdf', extension='pdf',
+                                           size=100, tutor=self.tutor)
+
+        data = S3DirectUpload().get_upload(None, upload)
+
+        url = urlparse(data['url'])
+        self.assertEqual(data['method'], 'PUT')
+        self.assertTrue(url.path.endswith('/uploads/2024/01/01/abc/file.pdf'))
+        self.assertIn('X-Amz-Signature', parse_qs(url.query))
+        self.assertEqual(data['headers'], {'Content-Length': '100'})
+
+    def put_chunk(self, upload_id, number):
+        chunk = self.content[number * 8:(number + 1) * 8]
+        return self.client.put(reverse('file-upload-chunk', args=[upload_id, number]), chunk,
+                               content_type='application/octet-stream')
+
+    def test_chunked_upload_resumes(self):
+        response = self.request_upload(chunked=True)
+        self.assertEqual((response.data['chunk_size'], response.data['chunks']), (8, 3))
+        self.assertNotIn('upload', response.data)
+        upload_id = response.data['id']
+
+        self.assertEqual(self.put_chunk(upload_id, 2).status_code, status.HTTP_200_OK)
+        self.assertEqual(self.put_chunk(upload_id, 0).data['received'], [[0, 0], [2, 2]])
+        self.assertEqual(self.confirm(upload_id).status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(self.client.get(reverse('file-upload-chunks', args=[upload_id])).data['received'],
+                         [[0, 0], [2, 2]])
+
+        self.put_chunk(upload_id, 1)
+        self.put_chunk(upload_id, 1)
+        response = self.confirm(upload_id)
+
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(File.objects.get(pk=response.data['id']).file.read(), self.content)
+        self.assertFalse(os.path.exists(os.path.join(CHUNKED_UPLOAD_ROOT, upload_id)))
+
+    def test_invalid_chunks(self):
+        upload_id = self.request_upload(chunked=True).data['id']
+        url = reverse('file-upload-chunk', args=[upload_id, 0])
+
+        self.assertEqual(self.client.put(url, b'short', content_type='application/octet-stream').status_code,
+                         status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(self.put_chunk(upload_id, 3).status_code, status.HTTP_400_BAD_REQUEST)
+        direct_upload_id = self.request_upload().data['id']
+        self.assertEqual(self.put_chunk(direct_upload_id, 0).status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_malformed_content_length(self):
+        upload_id = self.request_upload(chunked=True).data['id']
+        response = self.client.put(reverse('file-upload-chunk', args=[upload_id, 0]), self.content[:8],
+                                   content_type='application/octet-stream', CONTENT_LENGTH='8 bytes')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+        upload = self.request_upload().data['upload']
+        response = self.client.put(upload['url'], self.content, content_type='application/octet-stream',
+                                   CONTENT_LENGTH='-1')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_abandoned_uploads_expire(self):
+        abandoned_id = self.request_upload(chunked=True).data['id']
+        self.put_chunk(abandoned_id, 0)
+        direct = self.request_upload().data
+        self.put(direct['upload'])
+        direct_key = FileUpload.objects.get(pk=direct['id']).key
+        active_id = self.request_upload(chunked=True).data['id']
+        FileUpload.objects.exclude(pk=active_id).update(updated_at=timezone.now() - timedelta(days=2))
+
+        self.assertEqual(expire_file_uploads(), 2)
+
+        self.assertEqual(list(FileUpload.objects.values_list('id', flat=True)), [uuid.UUID(active_id)])
+        self.assertFalse(os.path.exists(os.path.join(CHUNKED_UPLOAD_ROOT, abandoned_id)))
+        self.assertFalse(os.path.exists(os.path.join(MEDIA_ROOT, direct_key)))
+
+    def upload_multipart(self, name='Учебник.pdf'):
+        response = self.client.post(reverse('tutor-files'), {'file': SimpleUploadedFile(name, self.content),
+                                                             'name': name}, format='multipart')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        return File.objects.get(pk=response.data['id'])
+
+    def upload_chunked(self):
+        upload_id = self.request_upload(chunked=True).data['id']
+        for number in range(3):
+            self.put_chunk(upload_id, number)
+        return File.objects.get(pk=self.confirm(upload_id).data['id'])
+
+    def upload_direct(self):
+        response = self.request_upload()
+        self.put(response.data['upload'])
+        key = FileUpload.objects.get(pk=response.data['id']).key
+        return File.objects.get(pk=self.confirm(response.data['id']).data['id']), key
+
+    def test_identical_content_is_stored_once(self):
+        file = self.upload_multipart()
+        other_tutor = User.objects.create_user(email='another@gmail.com', password='testpassword', role='tutor')
+        self.client.force_authenticate(user=other_tutor)
+        chunked_file = self.upload_chunked()
+        direct_file, direct_key = self.upload_direct()
+
+        blob = Blob.objects.get()
+        self.assertEqual(blob.ref_count, 3)
+        self.assertEqual({file.file.name, chunked_file.file.name, direct_file.file.name}, {blob.key})
+        self.assertEqual(direct_file.tutor, other_tutor.userprofile)
+        self.assertEqual(direct_file.file.read(), self.content)
+        self.assertFalse(os.path.exists(os.path.join(MEDIA_ROOT, direct_key)))
+
+    def test_blob_is_deleted_with_last_reference(self):
+        file = self.upload_multipart()
+        direct_file, _ = self.upload_direct()
+        path = os.path.join(MEDIA_ROOT, Blob.objects.get().key)
+
+        self.assertEqual(self.client.delete(reverse('tutor-file-delete', args=[file.id])).status_code,
+                         status.HTTP_204_NO_CONTENT)
+        self.assertEqual(Blob.objects.get().ref_count, 1)
+        self.assertTrue(os.path.exists(path))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.delete(reverse('tutor-file-delete', args=[direct_file.id]))
+        self.assertFalse(Blob.objects.exists())
+        self.assertFalse(os.path.exists(path))
+
+    def test_content_uploaded_again_survives_pending_delete(self):
+        with mock.patch.object(FileSystemStorage, 'save', save_overwriting):
+            file = self.upload_multipart()
+        with self.captureOnCommitCallbacks() as callbacks:
+            self.client.delete(reverse('tutor-file-delete', args=[file.id]))
+        self.assertFalse(Blob.objects.exists())
+
+        with mock.patch.object(FileSystemStorage, 'save', save_overwriting):
+            new_file = self.upload_multipart()
+        for callback in callbacks:
+            callback()
+
+        self.assertFalse(os.path.exists(os.path.join(MEDIA_ROOT, file.file.name)))
+        self.assertEqual(Blob.objects.get().key, new_file.file.name)
+        self.assertEqual(new_file.file.read(), self.content)
+
+    def test_blob_is_kept_when_release_is_rolled_back(self):
+        file = self.upload_multipart()
+        path = os.path.join(MEDIA_ROOT, file.blob.key)
+
+        with self.assertRaises(DatabaseError), self.captureOnCommitCallbacks(execute=True) as callbacks:
+            with transaction.atomic():
+                file.delete()
+                raise DatabaseError
+        self.assertEqual(callbacks, [])
+        self.assertEqual(Blob.objects.get().ref_count, 1)
+        self.assertTrue(os.path.exists(path))
+
+    def test_new_content_is_stored_by_digest(self):
+        direct_file, direct_key = self.upload_direct()
+        self.content = self.content + b' v2'
+        file = self.upload_multipart()
+
+        self.assertEqual(direct_file.file.name, direct_key)
+        self.assertTrue(file.file.name.startswith('blobs/'))
+        self.assertEqual(Blob.objects.count(), 2)
+        self.assertEqual(file.file.read(), self.content)
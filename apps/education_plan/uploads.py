@@ -0,0 +1,93 @@
+import io
+import shutil
+from django.conf import settings
+from django.core import signing
+from django.core.files.storage import default_storage, FileSystemStorage
+from django.core.files.utils import validate_file_name
+from django.urls import reverse
+
+
+class S3DirectUpload:
+    """Presigned PUT прямо в бакет S3Boto3Storage: файл не проходит через воркер приложения.
+
+    Размер входит в подпись (ContentLength), поэтому хранилище не примет объект другого размера.
+    """
+    def get_upload(self, request, upload):
+        storage = default_storage
+        key = storage._normalize_name(validate_file_name(upload.key, allow_relative_path=True))
+        url = storage.connection.meta.client.generate_presigned_url(
+            'put_object', Params={'Bucket': storage.bucket_name, 'Key': key, 'ContentLength': upload.size},
+            ExpiresIn=settings.DIRECT_UPLOAD_EXPIRE, HttpMethod='PUT')
+        return {'method': 'PUT', 'url': url, 'headers': {'Content-Length': str(upload.size)}}
+
+
+class LocalDirectUpload:
+    """Замена presigned PUT для FileSystemStorage: подписанная ссылка на LocalUploadView самого приложения."""
+    salt = 'education_plan.direct_upload'
+
+    def get_upload(self, request, upload):
+        token = signing.dumps(str(upload.pk), salt=self.salt)
+        url = request.build_absolute_uri(f"{reverse('file-upload-content', args=[upload.pk])}?token={token}")
+        return {'method': 'PUT', 'url': url, 'headers': {'Content-Length': str(upload.size)}}
+
+    def check_token(self, upload, token):
+        try:
+            return signing.loads(token, salt=self.salt, max_age=settings.DIRECT_UPLOAD_EXPIRE) == str(upload.pk)
+        except signing.BadSignature:
+            return False
+
+
+DIRECT_UPLOAD_BACKENDS = {'s3': S3DirectUpload, 'local': LocalDirectUpload}
+
+
+def get_direct_upload():
+    return DIRECT_UPLOAD_BACKENDS[settings.DIRECT_UPLOAD_BACKEND]()
+
+
+def get_chunk_storage():
+    """Временное хранилище частей загрузок (settings.CHUNKED_UPLOAD_ROOT)."""
+    return FileSystemStorage(location=settings.CHUNKED_UPLOAD_ROOT)
+
+
+def get_chunk_name(upload, number):
+    return f'{upload.pk}/{number:06}'
+
+
+def delete_chunks(upload_id):
+    shutil.rmtree(get_chunk_storage().path(str(upload_id)), ignore_errors=True)
+
+
+class ChunksReader(io.RawIOBase):
+    """Части загрузки подряд как один поток: storage.save собирает файл, не держа его в памяти целиком."""
+    def __init__(self, storage, names):
+        self.storage = storage
+        self.names = iter(names)
+        self.current = None
+
+    def readable(self):
+        return True
+
+    def readinto(self, buffer):
+        while True:
+            if self.current is None:
+                name = next(self.names, None)
+                if name is None:
+                    return 0
+                self.current = self.storage.open(name, 'rb')
+            count = self.current.readinto(buffer)
+            if count:
+                return count
+            self.current.close()
+            self.current = None
+
+    def close(self):
+        if self.current is not None:
+            self.current.close()
+            self.current = None
+        super().close()
+
+
+def open_chunks(upload):
+    storage = get_chunk_storage()
+    return io.BufferedReader(ChunksReader(storage, (get_chunk_name(upload, number)
+                                                    for number in range(upload.chunk_count))))
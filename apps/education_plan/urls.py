@@ -1,7 +1,9 @@
 from django.urls import path, include
 from rest_framework import routers
 from apps.education_plan.views import GetInviteInfoByCode, EducationPlanViewSet, ModuleViewSet, TutorFilesView, \
-    CardViewSet, LabelViewSet, GetUsersData, AddStudentToTeacherByInviteCode, ChangeOrderOfElements, CardContentViewSet
+    CardViewSet, LabelViewSet, GetUsersData, AddStudentToTeacherByInviteCode, ChangeOrderOfElements, CardContentViewSet, \
+    ChangeOrderOfElementsBatch, CloneStatusView, SearchView, FileUploadsView, FileUploadConfirmView, LocalUploadView, \
+    FileUploadChunksView
 
 router = routers.DefaultRouter()
 router.register('module', ModuleViewSet, basename='module')
@@ -16,6 +18,15 @@ urlpatterns = [
     path('get_users_data', GetUsersData.as_view(), name='get_users_data'),
     path('invite_authorized_student', AddStudentToTeacherByInviteCode.as_view(), name='invite_authorized_student'),
     path('move_element', ChangeOrderOfElements.as_view(), name='move_element'),
+    path('move_elements', ChangeOrderOfElementsBatch.as_view(), name='move_elements'),
+    path('clone_status/<uuid:task_id>', CloneStatusView.as_view(), name='clone_status'),
+    path('search', SearchView.as_view(), name='search'),
     path('files', TutorFilesView.as_view(), name='tutor-files'),
     path('files/<uuid:file_id>/', TutorFilesView.as_view(), name='tutor-file-delete'),
+    path('files/uploads', FileUploadsView.as_view(), name='file-uploads'),
+    path('files/uploads/<uuid:upload_id>/confirm', FileUploadConfirmView.as_view(), name='file-upload-confirm'),
+    path('files/uploads/<uuid:upload_id>/content', LocalUploadView.as_view(), name='file-upload-content'),
+    path('files/uploads/<uuid:upload_id>/chunks', FileUploadChunksView.as_view(), name='file-upload-chunks'),
+    path('files/uploads/<uuid:upload_id>/chunks/<int:number>', FileUploadChunksView.as_view(),
+         name='file-upload-chunk'),
 ]
@@ -1,48 +1,216 @@
-from django.db.models import Q, F, Prefetch
+import uuid
+from itertools import islice
+from celery.result import AsyncResult
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Q, F, Prefetch, Exists, OuterRef
+from django.http import Http404, HttpResponse, StreamingHttpResponse
 from django.shortcuts import get_object_or_404
+from django.utils.decorators import method_decorator
+from django.views.decorators.http import condition
 from rest_framework import mixins, viewsets, status
-from rest_framework.permissions import IsAuthenticated
+from rest_framework.permissions import IsAuthenticated, AllowAny
+from rest_framework.renderers import JSONRenderer
 from rest_framework.response import Response
 from rest_framework.views import APIView
 from rest_framework.decorators import action
 from rest_framework.exceptions import ValidationError
+from TutorToolkit.etags import make_etag
 from TutorToolkit.permissions import IsTutor, IsStudent, IsTutorCreator
-from apps.education_plan.services import StudentInvitationService, MoveElementService
+import celery_app
+from apps.education_plan.services import StudentInvitationService, MoveElementService, BoardService, \
+    PlanRevisionService, BoardChangeService, RankService, VersionService, VersionConflict, RepetitionService, \
+    CardService, BoardCloneService, SearchService, SectionHistoryService, FileUploadService
+from apps.education_plan.tasks import clone_modules
+from apps.education_plan.ranking import rank_ordering_enabled
 from apps.account.serializers import ProfileSerializer
 from apps.notifications.services import NotificationService
-from apps.education_plan.models import EducationPlan, Module, Card, Label, File, CardContent, SectionContent
+from apps.education_plan.models import EducationPlan, Module, Card, Label, File, CardContent, SectionRevision, \
+    FileUpload
+from apps.education_plan.uploads import get_direct_upload, LocalDirectUpload
+from apps.education_plan.pagination import EducationPlanCursorPagination, TemplateCursorPagination, SearchPagination
 
 from apps.education_plan.serializers import (
     EducationPlanSerializer,
     ModuleSerializer,
     ModulesInEducationPlanSerializer,
+    EducationPlanSummarySerializer,
     CardSerializer,
     LabelSerializer,
     EducationPlanForStudentSerializer,
     EducationPlanForTutorSerializer,
     MoveElementSerializer,
+    MoveElementsSerializer,
+    InstantiateTemplateSerializer,
+    ModuleCloneSerializer,
     FileSerializer,
+    FileUploadSerializer,
     CardContentSerializer,
-    SectionContentSerializer
+    SectionContentSerializer,
+    SectionRevisionSerializer,
+    BoardChangeSerializer,
+    BoardReadSerializer
 )
 
 
+def get_content_length(request):
+    """Длина тела из заголовка Content-Length; None, если заголовка нет или он некорректен."""
+    try:
+        length = int(request.META.get('CONTENT_LENGTH', ''))
+    except ValueError:
+        return None
+    return length if length >= 0 else None
+
+
+def get_expanded_plan_ids(request):
+    """Идентификаторы планов из параметра expand, для которых нужно загрузить модули и карточки."""
+    expanded_ids = set()
+    for plan_id in request.query_params.get('expand', '').split(','):
+        try:
+            expanded_ids.add(str(uuid.UUID(plan_id.strip())))
+        except ValueError:
+            continue
+    return expanded_ids
+
+
+def get_expected_version(request, default):
+    """Ожидаемая клиентом версия из поля version запроса."""
+    version = request.data.get('version')
+    if version is None:
+        return default
+    try:
+        return int(version)
+    except (TypeError, ValueError):
+        raise ValidationError({'version': 'Версия должна быть целым числом.'})
+
+
+def start_clone(module_ids, plan_id, tutor_id, data):
+    """Копирование модулей в план сразу (201) или задачей clone_modules, если карточек больше
+    BOARD_CLONE_ASYNC_CARDS (202 с task_id для clone_status преподавателя tutor_id)."""
+    if BoardCloneService.count_cards(module_ids) > settings.BOARD_CLONE_ASYNC_CARDS:
+        task_args = ([str(module_id) for module_id in module_ids], str(plan_id), str(tutor_id))
+        task_id = str(uuid.uuid4())
+        transaction.on_commit(lambda: clone_modules.apply_async(task_args, task_id=task_id))
+        return Response({**data, 'task_id': task_id}, status=status.HTTP_202_ACCEPTED)
+
+    return Response({**data, 'modules': BoardCloneService.clone_modules(module_ids, plan_id)},
+                    status=status.HTTP_201_CREATED)
+
+
+def board_etag(request, pk=None, **kwargs):
+    revision = BoardService.get_plan_revision(pk, request.user.userprofile)
+    if revision is None:
+        return None
+    return make_etag(request, 'board', pk, revision)
+
+
+def plan_list_etag(request, *args, **kwargs):
+    profile = request.user.userprofile
+    expanded_ids = get_expanded_plan_ids(request)
+    expanded_revisions = PlanRevisionService.get_revisions(expanded_ids, profile) if expanded_ids else []
+    return make_etag(request, 'plans', profile.id, profile.revision, request.GET.urlencode(), expanded_revisions)
+
+
+def users_data_etag(request, *args, **kwargs):
+    profile = request.user.userprofile
+    return make_etag(request, 'users_data', profile.id, profile.revision)
+
+
+@method_decorator(condition(etag_func=plan_list_etag), name='list')
+@method_decorator(condition(etag_func=board_etag), name='retrieve')
 class EducationPlanViewSet(mixins.ListModelMixin,
                            mixins.CreateModelMixin,
                            mixins.RetrieveModelMixin,
                            viewsets.GenericViewSet):
     serializer_class = EducationPlanSerializer
     permission_classes = (IsAuthenticated,)
+    pagination_class = EducationPlanCursorPagination
 
     def get_queryset(self):
         user = self.request.user
         profile = user.userprofile
         profile_field = profile.role
-        queryset = EducationPlan.objects.filter(
-            Q(**{f'{profile_field}': profile})
-        ).prefetch_related('modules', 'modules__cards', 'modules__cards__labels')
+        queryset = EducationPlan.objects.filter(Q(**{f'{profile_field}': profile}))
         return queryset
 
+    def list(self, request, *args, **kwargs):
+        """Страница планов без модулей; модули и карточки загружаются только для планов из параметра expand."""
+        queryset = self.filter_queryset(self.get_queryset())
+        page = self.paginate_queryset(queryset)
+
+        expanded_ids = get_expanded_plan_ids(request)
+        expanded_plans = [plan for plan in page if str(plan.id) in expanded_ids]
+        boards = {board['id']: board for board in BoardReadSerializer().plans(expanded_plans)}
+
+        data = [
+            boards[str(plan.id)] if str(plan.id) in boards else EducationPlanSummarySerializer(plan).data
+            for plan in page
+        ]
+        return self.get_paginated_response(data)
+
+    def retrieve(self, request, *args, **kwargs):
+        """Доска плана отдается из кэша по текущей ревизии, без обращения к карточкам."""
+        plan_id = kwargs[self.lookup_field]
+        revision = BoardService.get_plan_revision(plan_id, request.user.userprofile)
+        if revision is None:
+            raise Http404
+
+        content = BoardService.get_rendered_board(plan_id, revision)
+        return HttpResponse(content, content_type='application/json')
+
+    @action(detail=True, methods=['get'])
+    def changes(self, request, pk=None):
+        """Изменения доски после ревизии since; 410, если журнал обрезан и доску нужно загрузить заново."""
+        try:
+            since = int(request.query_params.get('since', ''))
+        except ValueError:
+            since = -1
+        if since < 0:
+            return Response({'since': ['Требуется неотрицательное целое число.']}, status=status.HTTP_400_BAD_REQUEST)
+
+        revision = BoardService.get_plan_revision(pk, request.user.userprofile)
+        if revision is None:
+            raise Http404
+
+        changes = BoardChangeService.get_changes(pk, since) if since <= revision else None
+        if changes is None:
+            return Response({'detail': 'Журнал изменений обрезан, требуется полная загрузка доски.',
+                             'full_refetch': True, 'revision': revision}, status=status.HTTP_410_GONE)
+
+        revision = max([revision, *(change.revision for change in changes)])
+        return Response({'revision': revision, 'full_refetch': False,
+                         'changes': BoardChangeSerializer(changes, many=True).data})
+
+    @action(detail=True, methods=['post'])
+    def clone(self, request, pk=None):
+        """Новый план (поля как при создании) с копией всех модулей и карточек плана."""
+        source = self.get_object()
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        with transaction.atomic():
+            self.perform_create(serializer)
+            return start_clone(list(source.modules.values_list('id', flat=True)), serializer.instance.id,
+                               serializer.instance.tutor_id, serializer.data)
+
+    @action(detail=True, methods=['post'], url_path='schedule-repetitions')
+    def schedule_repetitions(self, request, pk=None):
+        """Пересчет дат повторения карточек плана (или модуля module_id этого плана) по SM-2.
+
+        Ответ: scheduled - запланированные карточки; карточки, уже ожидающие повторения, остаются как есть
+        (pending), а с reschedule_pending=true их дата отсчитывается заново от текущего момента (rescheduled).
+        """
+        plan = self.get_object()
+        cards = Card.objects.filter(module__plan=plan, is_template=False)
+        module_id = request.data.get('module_id')
+        if module_id:
+            try:
+                cards = cards.filter(module_id=uuid.UUID(str(module_id)))
+            except ValueError:
+                return Response({'module_id': ['Некорректный идентификатор.']}, status=status.HTTP_400_BAD_REQUEST)
+
+        reschedule_pending = str(request.data.get('reschedule_pending', '')).lower() in ('true', '1')
+        return Response(RepetitionService.schedule(cards, reschedule_pending=reschedule_pending))
+
     def create(self, request, *args, **kwargs):
         response = super().create(request, *args, **kwargs)
         email = request.data.get('email')
@@ -61,14 +229,16 @@ class EducationPlanViewSet(mixins.ListModelMixin,
             NotificationService.handle_invite(plan, email)
 
     def get_permissions(self):
-        if self.action == 'create':
+        if self.action in ['create', 'clone', 'schedule_repetitions']:
             return [IsAuthenticated(), IsTutor()]
         if self.action in ['update', 'partial_update', 'destroy']:
             return [IsAuthenticated(), IsTutorCreator()]
         return super().get_permissions()
 
     def get_serializer_class(self):
-        if self.action in ['list', 'retrieve']:
+        if self.action == 'list':
+            return EducationPlanSummarySerializer
+        if self.action == 'retrieve':
             return ModulesInEducationPlanSerializer
         return EducationPlanSerializer
 
@@ -90,6 +260,15 @@ class ModuleViewSet(mixins.CreateModelMixin,
         education_plan = get_object_or_404(EducationPlan, pk=plan_id)
         serializer.save(plan=education_plan)
 
+    @action(detail=True, methods=['post'])
+    def clone(self, request, pk=None):
+        """Копия модуля с карточками в конце плана plan_id того же преподавателя."""
+        module = self.get_object()
+        serializer = ModuleCloneSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        plan = get_object_or_404(EducationPlan, pk=serializer.validated_data['plan_id'], tutor__user=request.user)
+        return start_clone([module.id], plan.id, plan.tutor_id, {'plan_id': plan.id})
+
 
 class CardViewSet(mixins.CreateModelMixin,
                   mixins.UpdateModelMixin,
@@ -102,51 +281,150 @@ class CardViewSet(mixins.CreateModelMixin,
 
     def get_queryset(self):
         user = self.request.user
-        queryset = Card.objects.filter(module__plan__tutor__user=user, is_template=False)
+        queryset = Card.objects.filter(module__plan__tutor__user=user, is_template=False).select_related('module')
         return queryset
 
     def perform_create(self, serializer):
         module_id = self.request.data.get('module_id')
         module = get_object_or_404(Module, pk=module_id)
-        card = serializer.save(module=module)
-        CardContent.objects.create(card=card)
+        serializer.save(module=module)
+
+    def update(self, request, *args, **kwargs):
+        """Изменение карточки с проверкой версии модуля (поле version, по умолчанию - прочитанная с карточкой)."""
+        partial = kwargs.pop('partial', False)
+        card = self.get_object()
+        serializer = self.get_serializer(card, data=request.data, partial=partial)
+        serializer.is_valid(raise_exception=True)
+        version = get_expected_version(request, card.module.version)
+
+        try:
+            with transaction.atomic():
+                # Версия без новой ревизии плана разошлась бы с кэшем доски, поэтому пустое изменение ее не увеличивает.
+                if serializer.has_changes():
+                    module_version = VersionService.check_and_bump(Module, card.module_id, version)
+                else:
+                    module_version = VersionService.check(Module, card.module_id, version)
+                serializer.save()
+        except VersionConflict as error:
+            return Response(error.data, status=status.HTTP_409_CONFLICT)
+
+        return Response({**serializer.data, 'module_version': module_version})
+
+    def get_template(self, pk):
+        """Шаблон или карточка текущего преподавателя (не шаблон отклоняется вызывающим методом)."""
+        profile = self.request.user.userprofile
+        return get_object_or_404(Card.objects.filter(Q(owner=profile) | Q(module__plan__tutor=profile)), pk=pk)
 
     @action(detail=True, methods=['post'])
     def create_template(self, request, pk=None):
-        card = get_object_or_404(Card, pk=pk)
-        template = card.create_template()
+        card = self.get_object()
+        template = card.create_template(owner=request.user.userprofile)
         return Response(CardSerializer(template).data, status=status.HTTP_201_CREATED)
 
     @action(detail=False, methods=['get'])
     def templates(self, request):
-        templates = Card.objects.filter(is_template=True)
-        serializer = self.get_serializer(templates, many=True)
-        return Response(serializer.data)
+        """Шаблоны преподавателя по названию; фильтры: title - начало названия, label - id метки (можно несколько)."""
+        templates = Card.objects.filter(owner=request.user.userprofile, is_template=True)
+        title = request.query_params.get('title')
+        if title:
+            templates = templates.filter(title__istartswith=title)
+        label_ids = request.query_params.getlist('label')
+        if label_ids:
+            try:
+                label_ids = [uuid.UUID(label_id) for label_id in label_ids]
+            except ValueError:
+                return Response({'label': ['Некорректный идентификатор.']}, status=status.HTTP_400_BAD_REQUEST)
+            templates = templates.filter(Exists(Card.labels.through.objects.filter(card_id=OuterRef('pk'),
+                                                                                 label_id__in=label_ids)))
+
+        paginator = TemplateCursorPagination()
+        page = paginator.paginate_queryset(templates.only('id', 'title'), request, view=self)
+        cards = Card.objects.filter(pk__in=[template.pk for template in page]).order_by(*paginator.ordering)
+        return paginator.get_paginated_response(BoardReadSerializer().cards(cards))
 
     @action(detail=True, methods=['post'])
     def create_card_from_template(self, request, pk=None):
-        template = get_object_or_404(Card, pk=pk)
+        template = self.get_template(pk)
         if not template.is_template:
             return Response({"detail": "Только шаблон может использоваться для создания карточки."},
                             status=status.HTTP_400_BAD_REQUEST)
 
         module_id = request.data.get('module_id')
-        module = get_object_or_404(Module, pk=module_id)
+        module = get_object_or_404(Module, pk=module_id, plan__tutor=request.user.userprofile)
         new_card = template.create_card_from_template(module)
         return Response(CardSerializer(new_card).data, status=status.HTTP_201_CREATED)
 
+    @action(detail=True, methods=['post'])
+    def instantiate(self, request, pk=None):
+        """Карточки из шаблона сразу в нескольких модулях (module_ids), за фиксированное число запросов."""
+        template = self.get_template(pk)
+        if not template.is_template:
+            return Response({"detail": "Только шаблон может использоваться для создания карточки."},
+                            status=status.HTTP_400_BAD_REQUEST)
+
+        serializer = InstantiateTemplateSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        module_ids = serializer.validated_data['module_ids']
+        modules = {module.pk: module for module in Module.objects.filter(pk__in=module_ids,
+                                                                         plan__tutor=request.user.userprofile)}
+        if len(modules) != len(module_ids):
+            return Response({"detail": "Модуль не найден."}, status=status.HTTP_404_NOT_FOUND)
+
+        _, data = CardService.clone(template, [modules[module_id] for module_id in module_ids])
+        return Response(data, status=status.HTTP_201_CREATED)
+
 
 class CardContentViewSet(mixins.RetrieveModelMixin,
                          mixins.UpdateModelMixin,
                          viewsets.GenericViewSet):
     serializer_class = CardContentSerializer
     permission_classes = (IsAuthenticated,)
+    stream_chunk_size = 100
+    max_card_ids = 500
+
+    def list(self, request):
+        """Содержимое всех карточек модуля (module_id) или списка карточек (card_ids через запятую).
+
+        Ответ - JSON-массив, который отдается потоком по stream_chunk_size карточек: содержимое читается
+        одним запросом через курсор, файлы разделов - одним запросом на каждую порцию.
+        """
+        module_id = request.query_params.get('module_id')
+        card_ids = request.query_params.get('card_ids')
+        if bool(module_id) == bool(card_ids):
+            return Response({"detail": "Укажите module_id или card_ids."}, status=status.HTTP_400_BAD_REQUEST)
+        try:
+            if module_id:
+                lookup = {'card__module_id': uuid.UUID(module_id)}
+            else:
+                lookup = {'card_id__in': {uuid.UUID(card_id.strip()) for card_id in card_ids.split(',')}}
+        except ValueError:
+            return Response({"detail": "Некорректный идентификатор."}, status=status.HTTP_400_BAD_REQUEST)
+        if len(lookup.get('card_id__in', ())) > self.max_card_ids:
+            return Response({"detail": f"Не более {self.max_card_ids} карточек за запрос."},
+                            status=status.HTTP_400_BAD_REQUEST)
+
+        ordering = 'card__rank' if rank_ordering_enabled() else 'card__index'
+        queryset = self.get_queryset().filter(**lookup).order_by('card__module_id', ordering, 'card_id')
+        return StreamingHttpResponse(self.stream(queryset), content_type='application/json')
+
+    def stream(self, queryset):
+        serializer = self.get_serializer()
+        renderer = JSONRenderer()
+        contents = queryset.iterator(chunk_size=self.stream_chunk_size)
+        yield b'['
+        separator = b''
+        while chunk := list(islice(contents, self.stream_chunk_size)):
+            for representation in serializer.represent_many(chunk):
+                yield separator + renderer.render(representation)
+                separator = b','
+        yield b']'
 
     def get_queryset(self):
         user_profile = self.request.user.userprofile
+        queryset = CardContent.objects.select_related('card', 'homework', 'lesson', 'repetition')
         if user_profile.role == 'tutor':
-            return CardContent.objects.filter(card__module__plan__tutor=user_profile)
-        return CardContent.objects.filter(card__module__plan__student=user_profile)
+            return queryset.filter(Q(card__module__plan__tutor=user_profile) | Q(card__owner=user_profile))
+        return queryset.filter(card__module__plan__student=user_profile)
 
     def perform_create(self, serializer):
         card_id = self.request.data.get('card_id')
@@ -160,19 +438,45 @@ class CardContentViewSet(mixins.RetrieveModelMixin,
 
     @action(detail=True, methods=['patch'], url_path='update-section/(?P<section_type>homework|lesson|repetition)')
     def update_section(self, request, pk=None, section_type=None):
+        """Изменение раздела; общий с шаблоном или другими карточками раздел сначала копируется."""
         card_content = self.get_object()
-        section_content = getattr(card_content, section_type)
-
-        if section_content is None:
-            section_content = SectionContent.objects.create(text="")
-            setattr(card_content, section_type, section_content)
-            card_content.save()
+        serializer = SectionContentSerializer(getattr(card_content, section_type), data=request.data, partial=True)
+        if not serializer.is_valid():
+            return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+
+        with transaction.atomic():
+            serializer.instance = CardService.get_own_section(card_content, section_type)
+            previous_text = serializer.instance.text
+            section = serializer.save()
+            SectionHistoryService.record(section, previous_text, request.user.userprofile)
+        return Response(serializer.data, status=status.HTTP_200_OK)
 
-        serializer = SectionContentSerializer(section_content, data=request.data, partial=True)
-        if serializer.is_valid():
-            serializer.save()
-            return Response(serializer.data, status=status.HTTP_200_OK)
-        return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+    @action(detail=True, methods=['get'], url_path='revisions/(?P<section_type>homework|lesson|repetition)')
+    def revisions(self, request, pk=None, section_type=None):
+        """Версии текста раздела от последней к первой, без самого текста."""
+        section = getattr(self.get_object(), section_type)
+        revisions = SectionRevision.objects.filter(section=section).order_by('-number') if section else []
+        return Response(SectionRevisionSerializer(revisions, many=True).data, status=status.HTTP_200_OK)
+
+    @action(detail=True, methods=['get'],
+            url_path=r'revisions/(?P<section_type>homework|lesson|repetition)/(?P<number>\d+)')
+    def revision(self, request, pk=None, section_type=None, number=None):
+        """Текст версии раздела, собранный из ближайшего полного текста и дельт."""
+        section = getattr(self.get_object(), section_type)
+        if section is None:
+            raise Http404
+        revision = get_object_or_404(SectionRevision, section=section, number=number)
+        text = SectionHistoryService.get_text(section, revision.number)
+        return Response({**SectionRevisionSerializer(revision).data, 'text': text}, status=status.HTTP_200_OK)
+
+    @action(detail=True, methods=['post'],
+            url_path=r'revisions/(?P<section_type>homework|lesson|repetition)/(?P<number>\d+)/restore')
+    def restore_revision(self, request, pk=None, section_type=None, number=None):
+        """Возврат раздела к версии number; восстановление сохраняется как новая версия."""
+        section = SectionHistoryService.restore(self.get_object(), section_type, int(number), request.user.userprofile)
+        if section is None:
+            return Response({"detail": "Версия не найдена."}, status=status.HTTP_404_NOT_FOUND)
+        return Response(SectionContentSerializer(section).data, status=status.HTTP_200_OK)
 
 
 class LabelViewSet(mixins.ListModelMixin,
@@ -212,6 +516,7 @@ class GetInviteInfoByCode(APIView):
 class GetUsersData(APIView):
     permission_classes = [IsAuthenticated]
 
+    @method_decorator(condition(etag_func=users_data_etag))
     def get(self, request):
         """Получение информации по текущему пользователю и всем прикрепленным к нему ученикам/учителям."""
         user = self.request.user
@@ -276,21 +581,88 @@ class ChangeOrderOfElements(APIView):
             destination_index = validated_data.get('destination_index')
             destination_id = validated_data.get('destination_id', None)
 
-            if element_type == 'task':
-                card = get_object_or_404(Card, id=element_id, module__plan__tutor=profile)
-                module = get_object_or_404(Module, id=destination_id, plan__tutor=profile)
-                MoveElementService.move_card(card, destination_index, module)
-                serializer = CardSerializer(card)
-            else:
-                module = get_object_or_404(Module, id=element_id, plan__tutor=profile)
-                MoveElementService.move_module(module, destination_index)
-                serializer = ModuleSerializer(module)
+            version = validated_data.get('version')
+
+            try:
+                if element_type == 'task':
+                    # Карточка загружается вместе с модулем, чтобы ее index и версия модуля были согласованы.
+                    card = get_object_or_404(Card.objects.select_related('module'), id=element_id,
+                                             module__plan__tutor=profile)
+                    module = get_object_or_404(Module, id=destination_id, plan__tutor=profile)
+                    MoveElementService.move_card(card, destination_index, module, version)
+                    data = {**CardSerializer(card).data, 'module_version': module.version}
+                else:
+                    module = get_object_or_404(Module.objects.select_related('plan'), id=element_id,
+                                               plan__tutor=profile)
+                    MoveElementService.move_module(module, destination_index, version)
+                    data = BoardReadSerializer().modules(Module.objects.filter(pk=module.pk))[0]
+                    if rank_ordering_enabled():
+                        data['index'] = RankService.get_index(module)
+                    data['plan_version'] = module.plan.version
+            except VersionConflict as error:
+                return Response(error.data, status=status.HTTP_409_CONFLICT)
+
+            return Response(data, status=status.HTTP_200_OK)
 
-            return Response(serializer.data, status=status.HTTP_200_OK)
+        return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+
+
+class ChangeOrderOfElementsBatch(APIView):
+    permission_classes = [IsAuthenticated, IsTutor]
+
+    def post(self, request):
+        """Изменение порядка нескольких элементов (модулей, карточек) одним запросом."""
+        user = self.request.user
+        profile = user.userprofile
+
+        serializer = MoveElementsSerializer(data=request.data)
+        if serializer.is_valid():
+            try:
+                data, status_code = MoveElementService.move_elements(
+                    serializer.validated_data['moves'], profile, serializer.validated_data.get('versions'))
+            except VersionConflict as error:
+                return Response(error.data, status=status.HTTP_409_CONFLICT)
+            return Response(data, status=status_code)
 
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
 
+class CloneStatusView(APIView):
+    permission_classes = (IsTutor,)
+
+    def get(self, request, task_id):
+        """Состояние задачи копирования: PROGRESS с done/total, SUCCESS с новыми модулями или FAILURE.
+
+        Данные задачи другого преподавателя не отдаются (404).
+        """
+        result = AsyncResult(str(task_id), app=celery_app.app)
+        data = {'state': result.state}
+        if result.state in ('PROGRESS', 'SUCCESS') and isinstance(result.info, dict):
+            info = dict(result.info)
+            if info.pop('tutor_id', None) != str(request.user.userprofile.id):
+                raise Http404
+            data.update(info)
+        return Response(data)
+
+
+class SearchView(APIView):
+    permission_classes = (IsAuthenticated,)
+
+    def get(self, request):
+        """Поиск карточек по названию, описанию, тексту разделов, меткам и именам файлов (параметр q)."""
+        query = request.query_params.get('q', '').strip()
+        if not query:
+            return Response({'q': ['Обязательный параметр.']}, status=status.HTTP_400_BAD_REQUEST)
+
+        paginator = SearchPagination()
+        page = paginator.paginate_queryset(SearchService.search(request.user.userprofile, query).only('id'),
+                                           request, view=self)
+        cards = {card['id']: card for card in BoardReadSerializer().cards(
+            Card.objects.filter(pk__in=[card.pk for card in page]))}
+        results = [{**cards[str(card.pk)], 'plan': card.plan_id, 'relevance': card.relevance} for card in page]
+        return paginator.get_paginated_response(results)
+
+
 class TutorFilesView(APIView):
     permission_classes = [IsAuthenticated, IsTutor]
 
@@ -298,7 +670,7 @@ class TutorFilesView(APIView):
         """Получение списка файлов, загруженных учителем."""
         user = self.request.user
         profile = user.userprofile
-        files = profile.files.all()
+        files = profile.files.select_related('blob')
         serializer = FileSerializer(files, many=True)
         return Response(serializer.data, status=status.HTTP_200_OK)
 
@@ -319,3 +691,81 @@ class TutorFilesView(APIView):
         file = get_object_or_404(File, id=file_id, tutor=profile)
         file.delete()
         return Response(status=status.HTTP_204_NO_CONTENT)
+
+
+class FileUploadsView(APIView):
+    permission_classes = [IsAuthenticated, IsTutor]
+
+    def post(self, request):
+        """Ссылка на загрузку файла напрямую в хранилище (name, size); файл проверяется до загрузки."""
+        serializer = FileUploadSerializer(data=request.data)
+        if not serializer.is_valid():
+            return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+        upload = FileUploadService.create_upload(request.user.userprofile, **serializer.validated_data)
+        data = FileUploadSerializer(upload).data
+        if not upload.chunk_size:
+            data['upload'] = get_direct_upload().get_upload(request, upload)
+        return Response(data, status=status.HTTP_201_CREATED)
+
+
+class FileUploadChunksView(APIView):
+    permission_classes = [IsAuthenticated, IsTutor]
+
+    def get_upload(self, request, upload_id):
+        return get_object_or_404(FileUpload, pk=upload_id, tutor=request.user.userprofile)
+
+    def get_status(self, upload):
+        received = FileUploadService.get_received(upload)
+        return {'chunk_size': upload.chunk_size, 'chunks': upload.chunk_count, 'received': received}
+
+    def get(self, request, upload_id):
+        """Принятые части загрузки отрезками [первая, последняя] - с чего продолжать прерванную загрузку."""
+        return Response(self.get_status(self.get_upload(request, upload_id)), status=status.HTTP_200_OK)
+
+    def put(self, request, upload_id, number):
+        """Часть number загрузки в теле запроса; части можно отправлять в любом порядке и повторно."""
+        upload = self.get_upload(request, upload_id)
+        length = get_content_length(request)
+        if length is None:
+            return Response({"detail": "Некорректный заголовок Content-Length."}, status=status.HTTP_400_BAD_REQUEST)
+        error_response, status_code = FileUploadService.save_chunk(upload, number, request.stream, length)
+        if error_response:
+            return Response(error_response, status=status_code)
+        return Response(self.get_status(upload), status=status.HTTP_200_OK)
+
+
+class FileUploadConfirmView(APIView):
+    permission_classes = [IsAuthenticated, IsTutor]
+
+    def post(self, request, upload_id):
+        """Подтверждение загрузки: файл появляется в списке файлов преподавателя."""
+        file, error_response, status_code = FileUploadService.confirm(request.user.userprofile, upload_id)
+        if error_response:
+            return Response(error_response, status=status_code)
+        return Response(FileSerializer(file).data, status=status.HTTP_201_CREATED)
+
+
+class LocalUploadView(APIView):
+    """Прием файла по ссылке LocalDirectUpload вместо хранилища; доступ дает подпись в ссылке."""
+    authentication_classes = ()
+    permission_classes = (AllowAny,)
+
+    def put(self, request, upload_id):
+        backend = get_direct_upload()
+        upload = FileUpload.objects.filter(pk=upload_id).first()
+        if not isinstance(backend, LocalDirectUpload) or upload is None:
+            raise Http404
+        if not backend.check_token(upload, request.query_params.get('token', '')):
+            return Response({"detail": "Ссылка недействительна."}, status=status.HTTP_403_FORBIDDEN)
+        length = get_content_length(request)
+        if length is None:
+            return Response({"detail": "Некорректный заголовок Content-Length."}, status=status.HTTP_400_BAD_REQUEST)
+        if length != upload.size:
+            return Response({"detail": "Размер файла не совпадает с заявленным."}, status=status.HTTP_400_BAD_REQUEST)
+
+        # Тело пишется в хранилище потоком, не загружаясь в память целиком.
+        storage = File._meta.get_field('file').storage
+        if storage.exists(upload.key):
+            storage.delete(upload.key)
+        storage.save(upload.key, request.stream)
+        return Response(status=status.HTTP_200_OK)
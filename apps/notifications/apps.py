@@ -3,4 +3,7 @@ from django.apps import AppConfig
 
 class NotificationsConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
-    name = 'apps.notifications'
\ No newline at end of file
+    name = 'apps.notifications'
+
+    def ready(self):
+        from apps.notifications import signals  # noqa: F401
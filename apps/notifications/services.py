@@ -2,7 +2,7 @@ from datetime import timedelta
 from django.utils import timezone
 from apps.notifications.models import Notification
 from apps.education_plan.services import StudentInvitationService
-from apps.notifications.tasks import send_notification
+from apps.notifications.tasks import send_notification, send_notifications
 import celery_app
 
 
@@ -108,6 +108,23 @@ class NotificationService:
         text, content = NotificationContentProvider.get_repetition_reminder_content(card)
         NotificationService.create_notification(plan, 'repetition_reminder', text, content)
 
+    @staticmethod
+    def handle_repetition_reminders(cards):
+        """Напоминания о повторении для пачки карточек (с загруженными module__plan) одной вставкой."""
+        notifications = []
+        for card in cards:
+            plan = card.module.plan if card.module_id else None
+            if plan is None or plan.student_id is None:
+                continue
+            text, content = NotificationContentProvider.get_repetition_reminder_content(card)
+            notifications.append(Notification(text=text, content=content, type='repetition_reminder',
+                                              education_plan=plan, recipient_id=plan.student_id, is_active=False))
+        Notification.objects.bulk_create(notifications)
+
+        if notifications:
+            send_notifications.delay([str(notification.id) for notification in notifications])
+        return notifications
+
     @staticmethod
     def handle_canceling(plan, lesson):
         NotificationService.cancel_lesson_reminder_notification(lesson)
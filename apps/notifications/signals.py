@@ -0,0 +1,9 @@
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+from apps.account.services import ProfileRevisionService
+from apps.notifications.models import Notification
+
+
+@receiver([post_save, post_delete], sender=Notification)
+def bump_profile_on_notification_change(sender, instance, **kwargs):
+    ProfileRevisionService.bump_profiles([instance.recipient_id])
@@ -1,6 +1,7 @@
 from celery import shared_task
 from .utils import send_notification_according_to_profile_settings
 from apps.account.models import UserProfile
+from apps.account.services import ProfileRevisionService
 from apps.schedule.models import Lesson
 from apps.notifications.models import Notification
 
@@ -21,3 +22,18 @@ def send_notification(profile_id, message, notification_id, lesson_id=None):
 
     if profile:
         send_notification_according_to_profile_settings(profile, message)
+
+
+@shared_task
+def send_notifications(notification_ids):
+    """Пачка уведомлений без урока (напоминания о повторении) одной задачей вместо задачи на уведомление."""
+    notifications = Notification.objects.filter(id__in=notification_ids)
+    messages = list(notifications.values_list('recipient_id', 'text'))
+    notifications.update(is_active=True)
+    # update() не вызывает сигналы: ревизия получателей увеличивается здесь, иначе ETag списка не изменится.
+    profile_ids = {profile_id for profile_id, _ in messages}
+    ProfileRevisionService.bump_profiles(profile_ids)
+    profiles = UserProfile.objects.select_related('user').in_bulk(profile_ids)
+    for profile_id, text in messages:
+        if profile_id in profiles:
+            send_notification_according_to_profile_settings(profiles[profile_id], text)
@@ -1,10 +1,21 @@
+from django.utils.decorators import method_decorator
+from django.views.decorators.http import condition
 from rest_framework.permissions import IsAuthenticated
 from rest_framework import mixins, viewsets, status
 from rest_framework.response import Response
 from apps.notifications.models import Notification
 from apps.notifications.serializers import NotificationSerializer
+from apps.education_plan.services import PlanRevisionService
+from TutorToolkit.etags import make_etag
 
 
+def notification_list_etag(request, *args, **kwargs):
+    profile = request.user.userprofile
+    return make_etag(request, 'notifications', profile.id, profile.revision,
+                     PlanRevisionService.get_total_revision(profile))
+
+
+@method_decorator(condition(etag_func=notification_list_etag), name='list')
 class NotificationViewSet(mixins.ListModelMixin,
                           mixins.DestroyModelMixin,
                           viewsets.GenericViewSet):
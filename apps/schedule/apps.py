@@ -4,3 +4,6 @@ from django.apps import AppConfig
 class ScheduleConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'apps.schedule'
+
+    def ready(self):
+        from apps.schedule import signals  # noqa: F401
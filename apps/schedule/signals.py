@@ -0,0 +1,9 @@
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+from apps.account.services import ProfileRevisionService
+from apps.schedule.models import Lesson
+
+
+@receiver([post_save, post_delete], sender=Lesson)
+def bump_profiles_on_lesson_change(sender, instance, **kwargs):
+    ProfileRevisionService.bump_plan_members(instance.education_plan)
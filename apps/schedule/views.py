@@ -1,13 +1,23 @@
 from django.db.models import Q
+from django.utils.decorators import method_decorator
+from django.views.decorators.http import condition
 from rest_framework import mixins, viewsets
 from rest_framework.permissions import IsAuthenticated
 from apps.notifications.services import NotificationService
 from apps.schedule.models import Lesson
 from apps.education_plan.models import EducationPlan
 from apps.schedule.serializers import LessonSerializerForTutorSerializer, LessonSerializerForStudentSerializer
+from apps.education_plan.services import PlanRevisionService
+from TutorToolkit.etags import make_etag
 from TutorToolkit.permissions import IsTutor, IsTutorCreator
 
 
+def lesson_list_etag(request, *args, **kwargs):
+    profile = request.user.userprofile
+    return make_etag(request, 'lessons', profile.id, profile.revision, PlanRevisionService.get_total_revision(profile))
+
+
+@method_decorator(condition(etag_func=lesson_list_etag), name='list')
 class LessonViewSet(mixins.ListModelMixin,
                     mixins.CreateModelMixin,
                     mixins.UpdateModelMixin,